@@ -0,0 +1,100 @@
+"""Сравнение формата ответа: полная перезапись файла против правок search/replace.
+
+Для каждого файла (по умолчанию — модули самого агента) строит ответ модели
+с однострочной правкой в двух форматах и считает выходные токены. Время
+генерации оценивается по скорости вывода модели (`--tps`, токенов в секунду):
+выходные токены — самая медленная часть ответа. Отдельно замеряется время
+локального применения правок.
+
+    python benchmarks/bench_edits.py --tps 80
+    python benchmarks/bench_edits.py --model gpt-4o src/coding_agent/server.py
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from coding_agent.context.packing import approx_tokens  # noqa: E402
+from coding_agent.edits import apply_edits  # noqa: E402
+from coding_agent.llm.schemas import CodeGenerationResult, Edit, FileChange  # noqa: E402
+
+DEFAULT_FILES = [
+    "src/coding_agent/agents/code_agent.py",
+    "src/coding_agent/context/collector.py",
+    "src/coding_agent/llm/client.py",
+    "src/coding_agent/server.py",
+]
+
+
+def token_counter(model: str | None):
+    if not model:
+        return approx_tokens
+    import litellm
+
+    return lambda text: litellm.token_counter(model=model, text=text)
+
+
+def one_line_change(text: str) -> Edit:
+    """Правка одной строки из середины файла — типичное исправление по ревью."""
+    lines = text.splitlines(keepends=True)
+    for line in lines[len(lines) // 2:] + lines:
+        if line.strip() and text.count(line) == 1:
+            return Edit(search=line, replace=line.rstrip("\n") + "  # fixed\n")
+    raise ValueError("нет уникальной строки")
+
+
+def response(file_change: FileChange) -> str:
+    result = CodeGenerationResult(
+        analysis="Исправил замечание из ревью",
+        files=[file_change],
+        commit_message="fix: review feedback",
+    )
+    return json.dumps(result.model_dump(exclude_defaults=True), ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    parser.add_argument("--model", help="считать токены токенизатором модели (нужен litellm)")
+    parser.add_argument("--tps", type=float, default=60.0, help="скорость вывода, токенов/с")
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    count = token_counter(args.model)
+
+    print(
+        f"{'файл':<42} {'строк':>6} {'full':>7} {'edit':>6} "
+        f"{'full, с':>8} {'edit, с':>8} {'apply, мкс':>11}"
+    )
+    totals = [0, 0]
+    for name in args.files:
+        text = (ROOT / name).read_text(encoding="utf-8")
+        edit = one_line_change(text)
+        full = response(FileChange(path=name, action="modify", content=apply_edits(text, [edit])))
+        edited = response(FileChange(path=name, action="edit", edits=[edit]))
+        full_tokens, edit_tokens = count(full), count(edited)
+        totals[0] += full_tokens
+        totals[1] += edit_tokens
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            apply_edits(text, [edit])
+        apply_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+        print(
+            f"{name:<42} {len(text.splitlines()):>6} {full_tokens:>7} {edit_tokens:>6} "
+            f"{full_tokens / args.tps:>8.1f} {edit_tokens / args.tps:>8.1f} {apply_us:>11.1f}"
+        )
+
+    print(
+        f"итого выходных токенов: full {totals[0]}, edit {totals[1]} "
+        f"(в {totals[0] / max(totals[1], 1):.1f} раза меньше)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Сколько запросов к GitHub API делает один цикл ревью.
+
+Поднимает локальную заглушку GitHub API с PR на `--files` файлов и прогоняет
+типичный цикл ревью (PR, Issue, diff, CI, ревью, комментарий, метка) двумя
+способами: как раньше (PR заново на каждый вызов, diff постранично по
+файлам, CI через список коммитов) и через текущий `GitHubClient`.
+
+    python benchmarks/bench_github_requests.py --files 120
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from coding_agent.github.client import GitHubClient, _format_patches  # noqa: E402
+
+REPO = "octo/demo"
+HEAD_SHA = "a" * 40
+
+
+class StubGitHub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    files = 0
+    requests: Counter = Counter()
+
+    @property
+    def base(self) -> str:
+        return f"http://{self.headers['Host']}"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.count(url.path)
+        prefix = f"/repos/{REPO}"
+
+        if url.path == f"{prefix}/pulls/1":
+            if "diff" in self.headers.get("Accept", ""):
+                return self.send(200, self.diff(), "text/plain")
+            return self.send(200, self.pull())
+        if url.path == f"{prefix}/issues/7":
+            return self.send(200, {"number": 7, "title": "Issue", "body": "text"})
+        if url.path == f"{prefix}/pulls/1/files":
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["30"])[0])
+            start = (page - 1) * per_page
+            items = [self.file(i) for i in range(start, min(start + per_page, self.files))]
+            link = None
+            if start + per_page < self.files:
+                link = f'<{self.base}{url.path}?page={page + 1}&per_page={per_page}>; rel="next"'
+            return self.send(200, items, link=link)
+        if url.path == f"{prefix}/pulls/1/commits":
+            commit_url = f"{self.base}{prefix}/commits/{HEAD_SHA}"
+            return self.send(200, [{"sha": HEAD_SHA, "url": commit_url}])
+        if re.fullmatch(rf"{prefix}/commits/\w+/check-runs", url.path):
+            runs = [{"id": 1, "name": "tests", "status": "completed", "conclusion": "success"}]
+            return self.send(200, {"total_count": 1, "check_runs": runs})
+        self.send(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.count(urlparse(self.path).path)
+        self.send(200, {"id": 1})
+
+    def count(self, path: str):
+        StubGitHub.requests[f"{self.command} {path}"] += 1
+
+    def pull(self) -> dict:
+        url = f"{self.base}/repos/{REPO}/pulls/1"
+        return {
+            "number": 1,
+            "title": "PR",
+            "body": "Closes #7",
+            "url": url,
+            "issue_url": f"{self.base}/repos/{REPO}/issues/1",
+            "commits_url": f"{url}/commits",
+            "head": {"sha": HEAD_SHA, "ref": "agent/issue-7"},
+        }
+
+    def file(self, i: int) -> dict:
+        return {"filename": f"src/module_{i}.py", "patch": f"@@ -1 +1 @@\n-old {i}\n+new {i}"}
+
+    def diff(self) -> str:
+        return "".join(
+            f"diff --git a/src/module_{i}.py b/src/module_{i}.py\n"
+            f"--- a/src/module_{i}.py\n+++ b/src/module_{i}.py\n@@ -1 +1 @@\n-old {i}\n+new {i}\n"
+            for i in range(self.files)
+        )
+
+    def send(self, status: int, payload, content_type="application/json", link=None):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if link:
+            self.send_header("Link", link)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LegacyClient(GitHubClient):
+    """Поведение до кеша PR и запроса diff одним вызовом."""
+
+    def get_pr(self, number):
+        return self.repo.get_pull(number)
+
+    def get_issue(self, number):
+        return self.repo.get_issue(number)
+
+    def get_pr_diff(self, pr_number):
+        return _format_patches(self.get_pr(pr_number).get_files())
+
+    def get_ci_status(self, pr_number):
+        commit = self.get_pr(pr_number).get_commits().reversed[0]
+        return [run.conclusion for run in commit.get_check_runs()]
+
+
+def review_cycle(client: GitHubClient):
+    pr = client.get_pr(1)
+    client.get_issue(7)
+    client.get_pr_diff(pr.number)
+    client.get_ci_status(pr.number)
+    client.create_review(pr.number, "ok", approve=True)
+    client.add_comment(pr.number, "done")
+    client.add_label(pr.number, "reviewed")
+
+
+def run(label: str, client: GitHubClient):
+    StubGitHub.requests.clear()
+    review_cycle(client)
+    total = sum(StubGitHub.requests.values())
+    print(f"{label:<14} запросов: {total}")
+    for key, count in sorted(StubGitHub.requests.items()):
+        print(f"    {count:>3}  {key}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=120)
+    args = parser.parse_args()
+    StubGitHub.files = args.files
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGitHub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"PR на {args.files} файлов")
+
+    run("как раньше", LegacyClient("token", REPO, base_url))
+    run("GitHubClient", GitHubClient("token", REPO, base_url))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Сравнение нового соединения на каждый запрос с общим пулом соединений.
+
+Поднимает локальный HTTP-сервер (HTTPS с самоподписанным сертификатом, если
+установлен `cryptography`) в роли GitHub API и делает N POST-запросов:
+сначала как раньше делал `GitHubAppAuth` (`httpx.post` без клиента), затем
+через один долгоживущий клиент с пулом, как в `coding_agent.github.transport`.
+
+    python benchmarks/bench_transport.py --requests 200
+"""
+
+import argparse
+import datetime
+import os
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    connections_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.connections_lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"token": "ghs_stub", "expires_at": "2030-01-01T00:00:00Z"}'
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_tls_context() -> ssl.SSLContext | None:
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+    except ImportError:
+        return None
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    tmpdir = tempfile.mkdtemp(prefix="bench-tls-")
+    cert_path = os.path.join(tmpdir, "cert.pem")
+    key_path = os.path.join(tmpdir, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def run(label: str, n: int, send) -> None:
+    StubHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        send()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<24} {elapsed * 1000:8.1f} ms  "
+        f"{elapsed / n * 1000:6.2f} ms/req  соединений: {StubHandler.connections}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    tls = make_tls_context()
+    if tls:
+        server.socket = tls.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    scheme = "https" if tls else "http"
+    url = f"{scheme}://127.0.0.1:{server.server_address[1]}/app/installations/1/access_tokens"
+    print(f"{args.requests} запросов к {scheme}-заглушке")
+
+    run("httpx.post (без пула)", args.requests, lambda: httpx.post(url, verify=False))
+
+    client = httpx.Client(verify=False, limits=httpx.Limits(max_keepalive_connections=20))
+    run("общий httpx.Client", args.requests, lambda: client.post(url))
+    client.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
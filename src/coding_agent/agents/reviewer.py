@@ -1,43 +1,60 @@
+import asyncio
 import re
 
 from rich.console import Console
 
 from coding_agent.config import Settings
-from coding_agent.github import GitHubClient
-from coding_agent.llm import LLMClient
+from coding_agent.diffs import parse_diff, split_diff
+from coding_agent.github import GitHubClient, PRContext
+from coding_agent.github.client import bot_login
+from coding_agent.llm import LLMClient, ReviewResult
+from coding_agent.llm.prompts import REVIEW_CHUNK_NOTE, REVIEW_INCREMENTAL_NOTE
 
 console = Console()
 
+REVIEWED_HEAD_PATTERN = re.compile(r"<!-- REVIEWER: head=([0-9a-f]{7,40}) -->")
+
+# Сколько символов прошлых замечаний передавать в повторное ревью
+MAX_PREVIOUS_COMMENTS = 3000
+
 
 class ReviewerAgent:
     def __init__(self, settings: Settings):
         self.settings = settings
         self.llm = LLMClient(settings)
-        self.github = GitHubClient(settings.github_token, settings.github_repository)
+        self.github = GitHubClient(
+            settings.github_token, settings.github_repository, graphql=settings.github_graphql
+        )
 
     def review(self, pr_number: int) -> bool:
         """Проверить PR и оставить ревью. Возвращает True если одобрено."""
 
         # 1. Получаем PR и связанный Issue
         console.print(f"[blue]Читаю PR #{pr_number}...[/blue]")
-        pr = self.github.get_pr(pr_number)
-        issue_number = self._extract_issue_number(pr.body or "")
+        pr = self.github.load_pr_context(pr_number)
+        issue_number = self._extract_issue_number(pr.body)
 
         if issue_number:
-            issue = self.github.get_issue(issue_number)
+            # Через GraphQL Issue уже загружен вместе с PR, если PR закрывает именно его
+            if pr.issue and pr.issue.number == issue_number:
+                issue = pr.issue
+            else:
+                issue = self.github.get_issue(issue_number)
             issue_title = issue.title
             issue_body = issue.body or ""
         else:
             issue_title = pr.title
-            issue_body = pr.body or ""
+            issue_body = pr.body
+        if pr.ci_status:
+            console.print(f"[dim]CI: {pr.ci_status.summary}[/dim]")
 
         # 2. Получаем diff
         console.print("[blue]Получаю diff...[/blue]")
-        diff = self.github.get_pr_diff(pr_number)
+        diff, preface = self._diff_since_last_review(pr)
 
         # 3. Генерируем ревью через LLM
         console.print("[blue]Анализирую код...[/blue]")
-        result = self.llm.generate_review(diff, issue_title, issue_body)
+        result = self._review_diff(diff, issue_title, issue_body, preface)
 
         # 5. Публикуем ревью
         console.print("[blue]Публикую ревью...[/blue]")
@@ -47,6 +64,7 @@ class ReviewerAgent:
             for c in result.comments:
                 location = f"{c.file}:{c.line}" if c.line else c.file
                 review_body += f"- **{location}**: {c.problem}\n  - {c.suggestion}\n\n"
+        review_body += f"<!-- REVIEWER: head={pr.head_sha} -->\n"
 
         self.github.create_review(pr_number, review_body, approve=result.approved)
 
@@ -57,6 +75,77 @@ class ReviewerAgent:
 
         return result.approved
 
+    def _diff_since_last_review(self, pr: PRContext) -> tuple[str, str]:
+        """Diff для ревью и вступление к промпту.
+
+        Если PR уже ревьюился и его коммит остался в истории, берём только
+        изменения после него; после force-push — полный diff.
+        """
+        last_review = self._last_review(pr)
+        if last_review:
+            reviewed_head, body = last_review
+            diff = self.github.get_compare_diff(reviewed_head, pr.head_sha)
+            if diff:
+                console.print(f"[blue]Проверяю изменения после {reviewed_head[:7]}[/blue]")
+                preface = REVIEW_INCREMENTAL_NOTE.format(
+                    base=reviewed_head[:7], comments=_previous_comments(body)
+                )
+                return diff, preface
+            console.print("[yellow]Нет инкрементального diff — полное ревью[/yellow]")
+        return self.github.get_pr_diff(pr.number), ""
+
+    def _last_review(self, pr: PRContext) -> tuple[str, str] | None:
+        """Head SHA и текст последнего ревью агента.
+
+        Метку принимаем только из ревью самого агента: иначе любой участник
+        мог бы вписать её и вывести часть изменений из-под ревью.
+        """
+        login = self.settings.github_bot_login or self.github.get_login()
+        if not login:
+            console.print("[yellow]Логин агента неизвестен — полное ревью[/yellow]")
+            return None
+        login = bot_login(login)
+        for review in reversed(pr.reviews):
+            if review.author is None or bot_login(review.author) != login:
+                continue
+            match = REVIEWED_HEAD_PATTERN.search(review.body)
+            if match:
+                return match.group(1), review.body
+        return None
+
+    def _review_diff(
+        self, diff: str, issue_title: str, issue_body: str, preface: str = ""
+    ) -> ReviewResult:
+        """Ревью одним запросом, а если diff больше бюджета — по частям параллельно."""
+        budget = self.settings.review_chunk_tokens
+        if self.llm.count_tokens(diff) <= budget:
+            return self.llm.generate_review(preface + diff, issue_title, issue_body)
+
+        chunks = split_diff(diff, budget, self.llm.count_tokens)
+        if len(chunks) == 1:
+            return self.llm.generate_review(preface + diff, issue_title, issue_body)
+
+        console.print(f"[blue]Большой diff: проверяю {len(chunks)} частей...[/blue]")
+        files = "\n".join(f"- {f.path}" for f in parse_diff(diff) if f.path)
+        results = asyncio.run(
+            self._review_chunks(chunks, files, issue_title, issue_body, preface)
+        )
+        return merge_reviews(results)
+
+    async def _review_chunks(
+        self, chunks: list[str], files: str, issue_title: str, issue_body: str, preface: str
+    ) -> list[ReviewResult]:
+        semaphore = asyncio.Semaphore(self.settings.review_concurrency)
+
+        async def review(part: int, chunk: str) -> ReviewResult:
+            note = REVIEW_CHUNK_NOTE.format(part=part, total=len(chunks), files=files)
+            async with semaphore:
+                return await self.llm.agenerate_review(
+                    preface + note + chunk, issue_title, issue_body
+                )
+
+        return await asyncio.gather(*(review(i, c) for i, c in enumerate(chunks, 1)))
+
     def _extract_issue_number(self, text: str) -> int | None:
         match = re.search(r'(?:closes|fixes|resolves)\s*#(\d+)', text, re.IGNORECASE)
         if match:
@@ -67,3 +156,35 @@ class ReviewerAgent:
             return int(match.group(1))
 
         return None
+
+
+def _previous_comments(review_body: str) -> str:
+    """Раздел замечаний из прошлого ревью, без метки и с ограничением длины."""
+    _, found, comments = review_body.partition("## Замечания")
+    comments = REVIEWED_HEAD_PATTERN.sub("", comments).strip() if found else ""
+    if not comments:
+        return "нет"
+    if len(comments) > MAX_PREVIOUS_COMMENTS:
+        comments = comments[:MAX_PREVIOUS_COMMENTS] + "\n..."
+    return comments
+
+
+def merge_reviews(results: list[ReviewResult]) -> ReviewResult:
+    """Свести ревью частей diff в одно: одобрено, только если одобрены все части."""
+    comments = []
+    seen = set()
+    for result in results:
+        for comment in result.comments:
+            key = (comment.file, comment.line, " ".join(comment.problem.lower().split()))
+            if key not in seen:
+                seen.add(key)
+                comments.append(comment)
+
+    summary = "\n\n".join(
+        f"**Часть {i}/{len(results)}.** {result.summary}" for i, result in enumerate(results, 1)
+    )
+    return ReviewResult(
+        approved=all(result.approved for result in results),
+        summary=summary,
+        comments=comments,
+    )
@@ -0,0 +1,142 @@
+import hashlib
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from coding_agent.llm import CodeGenerationResult
+
+
+@dataclass
+class Checkpoint:
+    """Результаты пройденных этапов одной попытки: генерация, пуш, PR.
+
+    Ключ — (repo, target, head_sha, iteration); head_sha — коммит, от
+    которого начата попытка, target — "issue#N" или "pr#N".
+    """
+
+    repo: str
+    target: str
+    head_sha: str
+    iteration: int
+    context_digest: str | None = None
+    result: CodeGenerationResult | None = None
+    # Коммит уже в удалённой ветке
+    commit_sha: str | None = None
+    pr_url: str | None = None
+
+
+@dataclass
+class IterationState:
+    """Цикл исправлений PR агента: какой Issue, сколько итераций сделано и сколько можно."""
+
+    issue: int
+    iteration: int
+    max_iterations: int
+
+
+class CheckpointStore:
+    """Контрольные точки задач в SQLite.
+
+    Повторный запуск задачи (ретрай, повторная доставка webhook) продолжает
+    с последнего пройденного этапа и не вызывает LLM заново.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " repo TEXT NOT NULL, target TEXT NOT NULL, head_sha TEXT NOT NULL,"
+                " iteration INTEGER NOT NULL, context_digest TEXT, result TEXT,"
+                " commit_sha TEXT, pr_url TEXT, updated_at REAL NOT NULL,"
+                " PRIMARY KEY (repo, target, head_sha, iteration))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS iterations ("
+                " repo TEXT NOT NULL, pr_number INTEGER NOT NULL, issue INTEGER NOT NULL,"
+                " iteration INTEGER NOT NULL, max_iterations INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL, PRIMARY KEY (repo, pr_number))"
+            )
+
+    @staticmethod
+    def digest(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def load(self, repo: str, target: str, iteration: int, head_sha: str) -> Checkpoint | None:
+        """Попытка, начатая от head_sha или уже запушившая коммит head_sha."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT head_sha, context_digest, result, commit_sha, pr_url FROM checkpoints"
+                " WHERE repo = ? AND target = ? AND iteration = ?"
+                " AND (head_sha = ? OR commit_sha = ?)"
+                " ORDER BY updated_at DESC LIMIT 1",
+                (repo, target, iteration, head_sha, head_sha),
+            ).fetchone()
+        if row is None:
+            return None
+        start_sha, context_digest, result, commit_sha, pr_url = row
+        return Checkpoint(
+            repo=repo,
+            target=target,
+            head_sha=start_sha,
+            iteration=iteration,
+            context_digest=context_digest,
+            result=CodeGenerationResult.model_validate_json(result) if result else None,
+            commit_sha=commit_sha,
+            pr_url=pr_url,
+        )
+
+    def save(self, checkpoint: Checkpoint):
+        result = checkpoint.result.model_dump_json() if checkpoint.result else None
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    checkpoint.repo,
+                    checkpoint.target,
+                    checkpoint.head_sha,
+                    checkpoint.iteration,
+                    checkpoint.context_digest,
+                    result,
+                    checkpoint.commit_sha,
+                    checkpoint.pr_url,
+                    time.time(),
+                ),
+            )
+
+    def get_iteration(self, repo: str, pr_number: int) -> IterationState | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT issue, iteration, max_iterations FROM iterations"
+                " WHERE repo = ? AND pr_number = ?",
+                (repo, pr_number),
+            ).fetchone()
+        return IterationState(*row) if row else None
+
+    def set_iteration(self, repo: str, pr_number: int, state: IterationState):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO iterations VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    repo,
+                    pr_number,
+                    state.issue,
+                    state.iteration,
+                    state.max_iterations,
+                    time.time(),
+                ),
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Своё соединение на операцию: хранилище общее для потоков и процессов
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
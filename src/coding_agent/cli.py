@@ -13,7 +13,6 @@ app = typer.Typer(
     add_completion=False,
 )
 console = Console()
-repo_manager = RepoManager()
 
 
 @app.command()
@@ -28,6 +27,7 @@ def run(
     if token:
         settings.github_token = token
 
+    repo_manager = RepoManager(settings.repo_cache_dir, settings.repo_cache_max_size)
     repo_url = f"https://github.com/{repo}.git"
     repo_path = repo_manager.clone(repo_url, settings.github_token)
     console.print(f"[dim]Склонировано в {repo_path}[/dim]")
@@ -83,6 +83,7 @@ def fix(
     if token:
         settings.github_token = token
 
+    repo_manager = RepoManager(settings.repo_cache_dir, settings.repo_cache_max_size)
     repo_url = f"https://github.com/{repo}.git"
     repo_path = repo_manager.clone(repo_url, settings.github_token)
     console.print(f"[dim]Склонировано в {repo_path}[/dim]")
@@ -10,6 +10,60 @@ class Settings(BaseSettings):
     github_private_key: str | None = None
     github_webhook_secret: str | None = None
     max_iterations: int = 2
+    github_pool_size: int = 20
+    github_timeout: float = 30.0
+    # Кеш GET-ответов GitHub по ETag; с github_cache_dir переживает перезапуск CLI
+    github_cache_size: int = 50 * 1024**2
+    github_cache_dir: str | None = None
+    # Ниже этой доли квоты чтения замедляются; дольше max_wait запросы не ждут
+    github_rate_limit_reserve: float = 0.1
+    github_rate_limit_max_wait: float = 900.0
+    # PR, Issue, ревью и CI одним GraphQL-запросом вместо нескольких REST
+    github_graphql: bool = False
+    # Логин, от имени которого агент пишет ревью (пусто — владелец токена);
+    # метку проверенного коммита принимаем только из его ревью
+    github_bot_login: str | None = None
+
+    repo_cache_dir: str | None = None
+    repo_cache_max_size: int = 5 * 1024**3
+    context_cache_dir: str | None = None
+    context_token_budget: int = 12_000
+    # Проверка изменений до пуша: команды проекта (пусто — предложенные LLM, но только
+    # из списка разрешённых), лимиты на команду и число попыток исправить по выводу
+    validation: bool = False
+    validation_commands: list[str] = []
+    validation_timeout: float = 300.0
+    validation_memory_limit: int = 2 * 1024**3
+    validation_attempts: int = 3
+    validation_feedback_chars: int = 8_000
+    # Best-of-N: столько вариантов кода генерируется и проверяется параллельно (1 — выключено,
+    # без validation тоже: выбирать не по чему); модели и температуры берутся по кругу,
+    # температура передаётся, только если задана
+    candidate_count: int = 1
+    candidate_models: list[str] = []
+    candidate_temperatures: list[float] = []
+    # Контрольные точки задач: повтор продолжает с последнего этапа, без нового вызова LLM
+    checkpoint_dir: str | None = None
+
+    worker_count: int = 4
+    # Столько секунд задача из webhook ждёт запуска; более новая того же вида её заменяет
+    webhook_coalesce_window: float = 10.0
+    # Справедливость между установками App: одновременных задач на установку,
+    # веса (installation id -> вес) и квота токенов LLM в час (0 — без лимитов)
+    tenant_max_concurrency: int = 2
+    tenant_weights: dict[str, float] = {}
+    tenant_token_quota: int = 0
+    # Сверх max_queued_jobs ждущих задач webhook отвечает 503 с Retry-After (0 — без лимита)
+    max_queued_jobs: int = 100
+    webhook_retry_after: int = 60
+    # Сколько секунд после SIGTERM сервер ещё отвечает (/health — draining), чтобы
+    # балансировщик успел убрать его, и сколько затем ждать выполняющиеся задачи
+    shutdown_delay: float = 5.0
+    shutdown_timeout: float = 300.0
+
+    # Diff больше review_chunk_tokens ревьюится по частям, до review_concurrency одновременно
+    review_chunk_tokens: int = 30_000
+    review_concurrency: int = 4
 
     llm_model: str = "gemini/gemini-2.5-flash"
     gemini_api_key: str | None = None
@@ -17,6 +71,18 @@ class Settings(BaseSettings):
     anthropic_api_key: str | None = None
     xai_api_key: str | None = None
 
+    llm_timeout: float = 300.0
+    llm_max_retries: int = 3
+    llm_max_concurrency: int = 8
+    llm_provider_concurrency: int = 4
+    llm_stream: bool = False
+
+    # Кеш ответов LLM: включается заданием llm_cache_dir, типы вызовов — code/review/fix
+    llm_cache_dir: str | None = None
+    llm_cache_kinds: list[str] = ["review", "code"]
+    llm_cache_max_size: int = 200 * 1024**2
+    llm_cache_ttl: float = 7 * 24 * 3600
+
 
 def get_settings() -> Settings:
     return Settings()
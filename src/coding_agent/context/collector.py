@@ -1,89 +1,124 @@
 from pathlib import Path
 
-IGNORE_DIRS = {
-    ".git", ".venv", "venv", "node_modules", "__pycache__",
-    ".idea", ".vscode", "dist", "build", ".eggs", "*.egg-info",
-}
+from coding_agent.context.index import FileIndex
+from coding_agent.context.packing import (
+    Candidate,
+    PackingReport,
+    TokenCounter,
+    approx_tokens,
+    pack,
+)
+from coding_agent.context.search import SearchIndex
+from coding_agent.context.store import IndexStore
 
 # Файлы с описанием проекта читаем в первую очередь
 PROJECT_FILES = ["README.md", "pyproject.toml", "package.json", "setup.py"]
 
-MAX_FILE_SIZE = 10_000
+DEFAULT_TOKEN_BUDGET = 12_000
 
-MAX_CONTEXT_SIZE = 50_000
+# Файлы больше этого (сгенерированные, данные) в контекст не читаем вовсе
+MAX_FILE_SIZE = 1024**2
+
+# Сколько лучших по поиску файлов рассматривать как кандидатов
+MAX_RELEVANT_FILES = 20
+
+# Оценки кандидатов: явно упомянутые в Issue файлы важнее найденных поиском,
+# найденные поиском нормируются в (0, 1], описания проекта — фон
+MENTIONED_SCORE = 2.0
+PROJECT_FILE_SCORE = 0.3
+
+# Дерево проекта не должно съедать больше этой доли бюджета
+MAX_TREE_SHARE = 0.2
 
 
 class ContextCollector:
-    def __init__(self, repo_path: str | Path):
+    def __init__(
+        self,
+        repo_path: str | Path,
+        repo_id: str | None = None,
+        cache_dir: str | Path | None = None,
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        count_tokens: TokenCounter = approx_tokens,
+    ):
         self.repo_path = Path(repo_path)
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.last_report: PackingReport | None = None
+        # С cache_dir индексы переиспользуются между задачами по (repo_id, коммит)
+        self.store = IndexStore(cache_dir) if cache_dir and repo_id else None
+        self.repo_id = repo_id
+        self._index: FileIndex | None = None
+        self._search: SearchIndex | None = None
+
+    @property
+    def index(self) -> FileIndex:
+        """Индекс файлов рабочей копии, строится один раз на коллектор."""
+        if self._index is None:
+            if self.store:
+                self._index, self._search = self.store.load_or_build(self.repo_id, self.repo_path)
+            else:
+                self._index = FileIndex.build(self.repo_path)
+        return self._index
+
+    @property
+    def search(self) -> SearchIndex:
+        """Полнотекстовый индекс по содержимому, строится один раз на коллектор."""
+        if self._search is None:
+            index = self.index
+            if self._search is None:
+                self._search = SearchIndex.from_files(index)
+        return self._search
 
     def collect(self, issue_text: str) -> str:
-        """Собрать контекст репозитория для LLM."""
-        parts = []
+        """Собрать контекст репозитория для LLM в пределах бюджета токенов.
+
+        Отчёт о том, что вошло и что отброшено, остаётся в `last_report`.
+        """
+        # 1. Структура директорий — всегда, при необходимости менее глубокая
+        for depth in (3, 2, 1):
+            tree_part = f"## Структура проекта\n```\n{self._build_tree(depth)}\n```"
+            tree_tokens = self.count_tokens(tree_part)
+            if tree_tokens <= self.token_budget * MAX_TREE_SHARE:
+                break
 
-        # 1. Структура директорий
-        tree = self._build_tree()
-        parts.append(f"## Структура проекта\n```\n{tree}\n```")
+        # 2. Кандидаты: файлы из Issue, найденные по содержимому, описания проекта
+        candidates = self._collect_candidates(issue_text)
+        parts, report = pack(
+            candidates, issue_text, max(0, self.token_budget - tree_tokens), self.count_tokens
+        )
+        report.budget = self.token_budget
+        report.used += tree_tokens
+        self.last_report = report
+
+        sections = [tree_part, *(part.text for part in parts)]
+        if report.dropped:
+            sections.append(f"[не вошли в контекст: {', '.join(report.dropped)}]")
+        return "\n\n".join(sections)
+
+    def _collect_candidates(self, issue_text: str) -> list[Candidate]:
+        candidates: dict[str, Candidate] = {}
+
+        for path, score in self._find_relevant_files(issue_text):
+            content = self._read_file(path)
+            if content:
+                candidates[path] = Candidate(path, content, score)
 
-        # 2. Ключевые файлы проекта
         for filename in PROJECT_FILES:
+            if filename in candidates:
+                continue
             content = self._read_file(filename)
             if content:
-                parts.append(f"## {filename}\n```\n{content}\n```")
+                candidates[filename] = Candidate(filename, content, PROJECT_FILE_SCORE)
 
-        # 3. Файлы упомянутые в Issue
-        keywords = self._extract_keywords(issue_text)
-        relevant_files = self._find_relevant_files(keywords)
-        for filepath in relevant_files:
-            content = self._read_file(filepath)
-            if content:
-                parts.append(f"## {filepath}\n```\n{content}\n```")
-
-        context = "\n\n".join(parts)
-        if len(context) > MAX_CONTEXT_SIZE:
-            context = context[:MAX_CONTEXT_SIZE] + "\n\n[...контекст обрезан...]"
-
-        return context
+        return list(candidates.values())
 
     def _build_tree(self, max_depth: int = 3) -> str:
         """Построить дерево директорий."""
-        lines = []
-        self._walk_tree(self.repo_path, "", lines, 0, max_depth)
-        return "\n".join(lines)
-
-    def _walk_tree(self, path: Path, prefix: str, lines: list, depth: int, max_depth: int):
-        if depth >= max_depth:
-            return
-
-        try:
-            entries = sorted(path.iterdir(), key=lambda x: (x.is_file(), x.name))
-        except PermissionError:
-            return
-
-        entries = [e for e in entries if e.name not in IGNORE_DIRS]
-
-        for i, entry in enumerate(entries):
-            is_last = i == len(entries) - 1
-            connector = "└── " if is_last else "├── "
-            lines.append(f"{prefix}{connector}{entry.name}")
-
-            if entry.is_dir():
-                extension = "    " if is_last else "│   "
-                self._walk_tree(entry, prefix + extension, lines, depth + 1, max_depth)
+        return self.index.render_tree(max_depth)
 
     def _read_file(self, filepath: str | Path) -> str | None:
-        """Прочитать файл если он существует и не слишком большой."""
-        full_path = self.repo_path / filepath
-        if not full_path.exists() or not full_path.is_file():
-            return None
-
-        try:
-            content = full_path.read_text(encoding="utf-8")
-            if len(content) > MAX_FILE_SIZE:
-                content = content[:MAX_FILE_SIZE] + "\n\n[...файл обрезан...]"
-            return content
-        except (UnicodeDecodeError, PermissionError):
-            return None
+        """Прочитать файл если он есть в индексе и не слишком большой."""
+        return self.index.read(filepath, MAX_FILE_SIZE)
 
     def _extract_keywords(self, text: str) -> list[str]:
         """Извлечь потенциальные имена файлов/классов/функций из текста."""
@@ -105,25 +140,23 @@ class ContextCollector:
 
         return list(set(keywords))
 
-    def _find_relevant_files(self, keywords: list[str], max_files: int = 5) -> list[Path]:
-        """Найти файлы которые могут быть релевантны по ключевым словам."""
-        if not keywords:
-            return []
-
-        relevant = []
-        for filepath in self.repo_path.rglob("*.py"):
-            if any(ignored in filepath.parts for ignored in IGNORE_DIRS):
-                continue
-
-            filename = filepath.name
-            rel_path = filepath.relative_to(self.repo_path)
-
-            for keyword in keywords:
-                if keyword.lower() in filename.lower() or keyword.lower() in str(rel_path).lower():
-                    relevant.append(rel_path)
-                    break
-
-            if len(relevant) >= max_files:
-                break
-
-        return relevant
+    def _find_relevant_files(
+        self, text: str, max_files: int = MAX_RELEVANT_FILES
+    ) -> list[tuple[str, float]]:
+        """Найти файлы релевантные тексту задачи, с оценками.
+
+        Явно упомянутые пути получают MENTIONED_SCORE, остальные — BM25,
+        нормированный на лучший результат.
+        """
+        keywords = self._extract_keywords(text)
+        mentioned = [k for k in keywords if "." in k]
+        relevant = {
+            p.as_posix(): MENTIONED_SCORE for p in self.index.find(mentioned, max_files=max_files)
+        }
+
+        query = " ".join([text, *keywords])
+        results = self.search.search(query, limit=max_files)
+        top = results[0][1] if results else 1.0
+        for path, score in results:
+            relevant.setdefault(path, score / top)
+        return list(relevant.items())
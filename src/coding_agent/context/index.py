@@ -0,0 +1,136 @@
+import os
+import subprocess
+from fnmatch import fnmatch
+from pathlib import Path
+
+IGNORE_DIRS = {
+    ".git", ".venv", "venv", "node_modules", "__pycache__",
+    ".idea", ".vscode", "dist", "build", ".eggs", "*.egg-info",
+}
+
+
+def is_ignored(name: str) -> bool:
+    return any(fnmatch(name, pattern) for pattern in IGNORE_DIRS)
+
+
+class FileIndex:
+    """Список файлов рабочей копии, собранный за один проход.
+
+    Для git-репозитория берётся из `git ls-files` (индекс git + неотслеживаемые
+    файлы с учётом `.gitignore`), без обхода файловой системы. Для каталога
+    без git — один `os.walk`.
+    """
+
+    def __init__(self, root: str | Path, paths: list[str]):
+        self.root = Path(root)
+        self.paths = sorted(
+            p for p in paths if not any(is_ignored(part) for part in p.split("/"))
+        )
+        self._path_set = set(self.paths)
+
+    @classmethod
+    def build(cls, root: str | Path) -> "FileIndex":
+        root = Path(root)
+        paths = cls._git_paths(root)
+        if paths is None:
+            paths = cls._walk_paths(root)
+        return cls(root, paths)
+
+    @staticmethod
+    def _git_paths(root: Path) -> list[str] | None:
+        if not (root / ".git").exists():
+            return None
+        # Не даём git подняться выше root и найти чужой репозиторий
+        env = {**os.environ, "GIT_CEILING_DIRECTORIES": str(root.resolve().parent)}
+        try:
+            result = subprocess.run(
+                ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                cwd=root,
+                env=env,
+                capture_output=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        output = result.stdout.decode("utf-8", errors="surrogateescape")
+        # --cached и --others не пересекаются, но конфликтующие файлы идут по разу на стадию
+        return list(dict.fromkeys(p for p in output.split("\0") if p))
+
+    @staticmethod
+    def _walk_paths(root: Path) -> list[str]:
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not is_ignored(d)]
+            rel_dir = os.path.relpath(dirpath, root)
+            for name in filenames:
+                rel = name if rel_dir == "." else f"{rel_dir}/{name}"
+                paths.append(rel.replace(os.sep, "/"))
+        return paths
+
+    def __contains__(self, path: str | Path) -> bool:
+        return Path(path).as_posix() in self._path_set
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def render_tree(self, max_depth: int = 3) -> str:
+        """Дерево каталогов: сначала папки, потом файлы, не глубже max_depth."""
+        tree: dict = {}
+        for path in self.paths:
+            node = tree
+            parts = path.split("/")
+            for part in parts[:-1]:
+                child = node.setdefault(part, {})
+                if child is None:
+                    # Путь одновременно файл и каталог (gitlink) — считаем каталогом
+                    child = node[part] = {}
+                node = child
+            node.setdefault(parts[-1], None)
+
+        lines: list[str] = []
+        self._render(tree, "", lines, 0, max_depth)
+        return "\n".join(lines)
+
+    def _render(self, node: dict, prefix: str, lines: list, depth: int, max_depth: int):
+        if depth >= max_depth:
+            return
+
+        entries = sorted(node.items(), key=lambda item: (item[1] is None, item[0]))
+        for i, (name, child) in enumerate(entries):
+            is_last = i == len(entries) - 1
+            connector = "└── " if is_last else "├── "
+            lines.append(f"{prefix}{connector}{name}")
+
+            if child is not None:
+                extension = "    " if is_last else "│   "
+                self._render(child, prefix + extension, lines, depth + 1, max_depth)
+
+    def find(self, keywords: list[str], suffixes: tuple[str, ...] | None = None,
+             max_files: int = 5) -> list[Path]:
+        """Файлы, в пути которых встречается одно из ключевых слов."""
+        if not keywords:
+            return []
+
+        lowered = [k.lower() for k in keywords]
+        relevant = []
+        for path in self.paths:
+            if suffixes and not path.endswith(suffixes):
+                continue
+            lower_path = path.lower()
+            if any(keyword in lower_path for keyword in lowered):
+                relevant.append(Path(path))
+                if len(relevant) >= max_files:
+                    break
+        return relevant
+
+    def read(self, path: str | Path, max_size: int | None = None) -> str | None:
+        """Прочитать файл из индекса. Файлы вне индекса и больше `max_size` байт не читаются."""
+        if path not in self:
+            return None
+        try:
+            filepath = self.root / path
+            if max_size is not None and filepath.stat().st_size > max_size:
+                return None
+            return filepath.read_text(encoding="utf-8")
+        except (UnicodeDecodeError, OSError):
+            return None
@@ -0,0 +1,137 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from coding_agent.context.search import tokenize
+
+# Сколько строк вокруг совпадения брать во фрагмент
+SPAN_WINDOW = 3
+
+# Фрагменты файла ценнее пустоты, но уступают файлу целиком
+SPAN_VALUE = 0.6
+
+# Больше символов на токен не даёт ни один токенизатор: текст длиннее
+# budget * MAX_CHARS_PER_TOKEN заведомо не влезет, и его не токенизируем
+MAX_CHARS_PER_TOKEN = 10
+
+TokenCounter = Callable[[str], int]
+
+
+def approx_tokens(text: str) -> int:
+    """Грубая оценка, если токенизатор модели не передан: ~4 символа на токен."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Candidate:
+    """Файл-кандидат в контекст с оценкой релевантности."""
+
+    path: str
+    content: str
+    score: float
+
+
+@dataclass
+class PackedPart:
+    path: str
+    text: str
+    tokens: int
+    partial: bool
+
+
+@dataclass
+class PackingReport:
+    """Что вошло в контекст, а что нет."""
+
+    budget: int
+    used: int = 0
+    included: list[PackedPart] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+
+    @property
+    def partial(self) -> list[str]:
+        return [p.path for p in self.included if p.partial]
+
+
+def extract_spans(content: str, query: str, window: int = SPAN_WINDOW) -> str | None:
+    """Оставить только строки с терминами запроса и окрестность вокруг них."""
+    terms = set(tokenize(query))
+    lines = content.splitlines()
+    hits = [i for i, line in enumerate(lines) if terms.intersection(tokenize(line))]
+    if not hits:
+        return None
+
+    ranges: list[list[int]] = []
+    for i in hits:
+        start, end = max(0, i - window), min(len(lines), i + window + 1)
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    chunks = []
+    for start, end in ranges:
+        header = f"# строки {start + 1}-{end}"
+        chunks.append("\n".join([header, *lines[start:end]]))
+    return "\n...\n".join(chunks)
+
+
+def render_part(path: str, text: str) -> str:
+    return f"## {path}\n```\n{text}\n```"
+
+
+def pack(
+    candidates: list[Candidate],
+    query: str,
+    budget: int,
+    count_tokens: TokenCounter = approx_tokens,
+) -> tuple[list[PackedPart], PackingReport]:
+    """Выбрать файлы или их фрагменты под бюджет токенов.
+
+    Каждый файл даёт до двух вариантов: целиком и фрагменты вокруг совпадений
+    с запросом (фрагменты ценятся в SPAN_VALUE от файла). Варианты берутся
+    жадно по релевантности на токен, не больше одного на файл, затем на
+    остаток бюджета фрагменты заменяются целыми файлами. Порядок в
+    результате — по убыванию релевантности файла.
+    """
+    report = PackingReport(budget=budget)
+    max_chars = max(0, budget) * MAX_CHARS_PER_TOKEN
+    items = []
+    for order, candidate in enumerate(candidates):
+        full = render_part(candidate.path, candidate.content)
+        full_tokens = None
+        if len(full) <= max_chars:
+            full_tokens = count_tokens(full)
+            items.append((candidate.score / max(1, full_tokens), order, full, full_tokens, False))
+
+        spans = extract_spans(candidate.content, query)
+        if spans is not None:
+            text = render_part(candidate.path, spans)
+            if len(text) > max_chars:
+                continue
+            tokens = count_tokens(text)
+            if full_tokens is None or tokens < full_tokens:
+                value = candidate.score * SPAN_VALUE
+                items.append((value / max(1, tokens), order, text, tokens, True))
+
+    chosen: dict[int, PackedPart] = {}
+    for _, order, text, tokens, partial in sorted(items, key=lambda item: -item[0]):
+        if order in chosen or report.used + tokens > budget:
+            continue
+        chosen[order] = PackedPart(candidates[order].path, text, tokens, partial)
+        report.used += tokens
+
+    # Оставшийся бюджет тратим на замену фрагментов целыми файлами
+    full_items = {order: (text, tokens) for _, order, text, tokens, partial in items if not partial}
+    ranked = sorted(range(len(candidates)), key=lambda i: -candidates[i].score)
+    for order in ranked:
+        part = chosen.get(order)
+        if part is None or not part.partial or order not in full_items:
+            continue
+        text, tokens = full_items[order]
+        if report.used - part.tokens + tokens <= budget:
+            report.used += tokens - part.tokens
+            chosen[order] = PackedPart(part.path, text, tokens, False)
+
+    report.included = [chosen[i] for i in ranked if i in chosen]
+    report.dropped = [candidates[i].path for i in ranked if i not in chosen]
+    return report.included, report
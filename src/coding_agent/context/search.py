@@ -0,0 +1,132 @@
+import math
+import re
+from collections import Counter
+
+from coding_agent.context.index import FileIndex
+
+WORD_RE = re.compile(r"\w+")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Файлы больше этого размера (сгенерированные, минифицированные) не индексируем
+MAX_INDEX_FILE_SIZE = 200_000
+
+# Совпадение в пути весит как несколько совпадений в тексте
+PATH_WEIGHT = 3
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def split_identifier(word: str) -> list[str]:
+    """UserService -> [user, service], user_service -> [user, service]."""
+    parts = []
+    for piece in word.split("_"):
+        if not piece:
+            continue
+        if piece.isascii():
+            parts.extend(CAMEL_RE.findall(piece) or [piece])
+        else:
+            parts.append(piece)
+    return [p.lower() for p in parts]
+
+
+def tokenize(text: str) -> list[str]:
+    """Токены для поиска: части идентификаторов и сам идентификатор целиком."""
+    tokens = []
+    for word in WORD_RE.findall(text):
+        parts = split_identifier(word)
+        tokens.extend(p for p in parts if len(p) > 1)
+        if len(parts) > 1:
+            tokens.append(word.lower().replace("_", ""))
+    return tokens
+
+
+class SearchIndex:
+    """Инвертированный индекс по содержимому файлов с ранжированием BM25."""
+
+    def __init__(self):
+        # термин -> {документ: частота}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_terms: dict[str, Counter] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self._total_length = 0
+
+    @classmethod
+    def from_files(cls, index: FileIndex) -> "SearchIndex":
+        search = cls()
+        for path in index.paths:
+            search.add_file(index, path)
+        return search
+
+    @classmethod
+    def from_dict(cls, data: dict[str, dict[str, int]]) -> "SearchIndex":
+        """Восстановить индекс из `to_dict`, пересобрав списки вхождений."""
+        search = cls()
+        for doc_id, terms in data.items():
+            search._add_terms(doc_id, Counter(terms))
+        return search
+
+    def to_dict(self) -> dict[str, dict[str, int]]:
+        return {doc_id: dict(terms) for doc_id, terms in self.doc_terms.items()}
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, doc_id: str, content: str):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+
+        terms = Counter(tokenize(content))
+        for term in tokenize(doc_id):
+            terms[term] += PATH_WEIGHT
+        self._add_terms(doc_id, terms)
+
+    def _add_terms(self, doc_id: str, terms: Counter):
+        if not terms:
+            return
+
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self._total_length += length
+        for term, freq in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = freq
+
+    def add_file(self, index: FileIndex, path: str):
+        """Проиндексировать файл из рабочей копии; большие файлы — только по пути."""
+        # Сгенерированные и vendored-файлы не читаются в память целиком
+        content = index.read(path, max_size=MAX_INDEX_FILE_SIZE)
+        self.add(path, content or "")
+
+    def remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self.doc_lengths.pop(doc_id)
+        for term in terms:
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[str, float]]:
+        """Документы по убыванию BM25-оценки запроса."""
+        if not self.doc_terms:
+            return []
+
+        n_docs = len(self.doc_terms)
+        avg_length = self._total_length / n_docs
+        scores: dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, freq in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                score = idf * freq * (BM25_K1 + 1) / (freq + norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
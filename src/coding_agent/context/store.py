@@ -0,0 +1,149 @@
+import gzip
+import json
+import os
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+
+from coding_agent.context.index import FileIndex
+from coding_agent.context.search import SearchIndex
+
+# Сколько проиндексированных коммитов хранить на репозиторий
+MAX_COMMITS_PER_REPO = 5
+
+FORMAT_VERSION = 1
+
+
+class IndexStore:
+    """Индексы контекста на диске, по одному на (репозиторий, коммит).
+
+    Для нового коммита берётся ближайший уже проиндексированный и
+    переиндексируются только изменившиеся файлы: по `git diff --name-status`,
+    если базовый коммит есть локально, иначе по сравнению blob-хешей файлов
+    (нужно для shallow-клонов без истории).
+    """
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+
+    def load_or_build(self, repo_id: str, root: str | Path) -> tuple[FileIndex, SearchIndex]:
+        root = Path(root)
+        head = _git(root, "rev-parse", "HEAD")
+        # Индекс по коммиту верен только для чистой рабочей копии
+        if head is None or _git(root, "status", "--porcelain") != "":
+            index = FileIndex.build(root)
+            return index, SearchIndex.from_files(index)
+
+        repo_dir = self.cache_dir / re.sub(r"[^\w.-]", "__", repo_id)
+        digests = _blob_digests(root)
+
+        entry = self._read(repo_dir / f"{head}.json.gz")
+        if entry is not None:
+            return FileIndex(root, list(entry["digests"])), SearchIndex.from_dict(entry["docs"])
+
+        base = self._nearest_entry(repo_dir, root)
+        index = FileIndex(root, list(digests))
+        if base is None:
+            search = SearchIndex.from_files(index)
+        else:
+            search = SearchIndex.from_dict(base["docs"])
+            changed, removed = self._changed_paths(root, base, digests)
+            for path in removed:
+                search.remove(path)
+            for path in changed:
+                if path in index:
+                    search.add_file(index, path)
+
+        self._write(repo_dir, head, {"digests": digests, "docs": search.to_dict()})
+        return index, search
+
+    def _nearest_entry(self, repo_dir: Path, root: Path) -> dict | None:
+        """Ближайший проиндексированный предок HEAD, иначе самый свежий индекс."""
+        if not repo_dir.exists():
+            return None
+        entries = _entries_by_recency(repo_dir)
+
+        best, best_distance = None, None
+        for path in entries:
+            sha = path.name.removesuffix(".json.gz")
+            count = _git(root, "rev-list", "--count", f"{sha}..HEAD")
+            if count is None or _git(root, "merge-base", "--is-ancestor", sha, "HEAD") is None:
+                continue
+            if best_distance is None or int(count) < best_distance:
+                best, best_distance = path, int(count)
+
+        for path in ([best] if best else entries):
+            entry = self._read(path)
+            if entry is not None:
+                return entry
+        return None
+
+    def _changed_paths(
+        self, root: Path, base: dict, digests: dict[str, str]
+    ) -> tuple[list[str], list[str]]:
+        """Изменённые/добавленные и удалённые файлы относительно базового индекса."""
+        output = _git(root, "diff", "--name-status", "-z", "--no-renames", base["commit"], "HEAD")
+        if output is None:
+            old = base["digests"]
+            changed = [p for p, sha in digests.items() if old.get(p) != sha]
+            removed = [p for p in old if p not in digests]
+            return changed, removed
+
+        changed, removed = [], []
+        fields = output.split("\0")
+        for status, path in zip(fields[::2], fields[1::2]):
+            (removed if status == "D" else changed).append(path)
+        return changed, removed
+
+    def _read(self, path: Path) -> dict | None:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != FORMAT_VERSION:
+            return None
+        # Отметка использования для вытеснения старых индексов
+        os.utime(path)
+        return entry
+
+    def _write(self, repo_dir: Path, commit: str, entry: dict):
+        repo_dir.mkdir(parents=True, exist_ok=True)
+        entry = {"version": FORMAT_VERSION, "commit": commit, **entry}
+        fd, tmp = tempfile.mkstemp(dir=repo_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, repo_dir / f"{commit}.json.gz")
+
+        for old in _entries_by_recency(repo_dir)[MAX_COMMITS_PER_REPO:]:
+            old.unlink(missing_ok=True)
+
+
+def _git(root: Path, *args: str) -> str | None:
+    env = {**os.environ, "GIT_CEILING_DIRECTORIES": str(root.resolve().parent)}
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=root, env=env, capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode("utf-8", errors="surrogateescape").strip()
+
+
+def _entries_by_recency(repo_dir: Path) -> list[Path]:
+    return sorted(repo_dir.glob("*.json.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+
+def _blob_digests(root: Path) -> dict[str, str]:
+    """Путь -> blob SHA из индекса git, без чтения файлов."""
+    output = _git(root, "ls-files", "-s", "-z") or ""
+    digests = {}
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        digests[path] = meta.split()[1]
+    # Те же правила игнорирования, что и у FileIndex
+    allowed = set(FileIndex(root, list(digests)).paths)
+    return {p: sha for p, sha in digests.items() if p in allowed}
@@ -0,0 +1,129 @@
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+TokenCounter = Callable[[str], int]
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
+
+
+@dataclass
+class FileDiff:
+    """Изменения одного файла: заголовок (---/+++) и ханки."""
+
+    path: str
+    header: str
+    hunks: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return self.header + "".join(self.hunks)
+
+
+def parse_diff(diff: str) -> list[FileDiff]:
+    """Разбить unified diff (git или `--- file`/`+++ file` из GitHub) на файлы."""
+    files: list[FileDiff] = []
+    lines = diff.splitlines(keepends=True)
+    old_left = new_left = 0
+
+    for i, line in enumerate(lines):
+        current = files[-1] if files else None
+        if old_left > 0 or new_left > 0:
+            # Строка внутри ханка, даже если похожа на заголовок
+            if line.startswith("-"):
+                old_left -= 1
+            elif line.startswith("+"):
+                new_left -= 1
+            elif not line.startswith("\\"):
+                old_left -= 1
+                new_left -= 1
+            current.hunks[-1] += line
+            continue
+
+        match = _HUNK_HEADER.match(line)
+        if match and current:
+            old_left = int(match.group(1) or 1)
+            new_left = int(match.group(2) or 1)
+            current.hunks.append(line)
+        elif line.startswith("diff --git ") or _starts_plain_header(lines, i, current):
+            files.append(FileDiff(path=_path_from_header(line), header=line))
+        elif current and not current.hunks:
+            current.header += line
+            if line.startswith("+++ ") and "/dev/null" not in line:
+                current.path = _strip_prefix(line[4:].strip())
+        elif current:
+            current.hunks[-1] += line
+        else:
+            files.append(FileDiff(path="", header=line))
+    return files
+
+
+def split_diff(diff: str, budget: int, count_tokens: TokenCounter) -> list[str]:
+    """Разбить diff на части не больше `budget` токенов.
+
+    Файлы целиком собираются в части по порядку; файл, который сам не
+    влезает, режется по группам ханков с повтором заголовка файла. Ханк
+    больше бюджета остаётся отдельной частью как есть.
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    used = 0
+
+    for file_diff in parse_diff(diff):
+        text = file_diff.text
+        pieces = [text] if count_tokens(text) <= budget else _split_hunks(
+            file_diff, budget, count_tokens
+        )
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and used + tokens > budget:
+                chunks.append("".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _split_hunks(file_diff: FileDiff, budget: int, count_tokens: TokenCounter) -> list[str]:
+    pieces: list[str] = []
+    group: list[str] = []
+    header_tokens = count_tokens(file_diff.header)
+    used = header_tokens
+
+    for hunk in file_diff.hunks:
+        tokens = count_tokens(hunk)
+        if group and used + tokens > budget:
+            pieces.append(file_diff.header + "".join(group))
+            group, used = [], header_tokens
+        group.append(hunk)
+        used += tokens
+
+    if group or not pieces:
+        pieces.append(file_diff.header + "".join(group))
+    return pieces
+
+
+def _starts_plain_header(lines: list[str], i: int, current: FileDiff | None) -> bool:
+    """`--- a` + `+++ b` без `diff --git`, как в патчах GitHub API."""
+    if not lines[i].startswith("--- ") or i + 1 >= len(lines):
+        return False
+    if not lines[i + 1].startswith("+++ "):
+        return False
+    # Для `diff --git` строка --- — часть уже начатого заголовка
+    return not (current and not current.hunks and current.header.startswith("diff --git "))
+
+
+def _path_from_header(line: str) -> str:
+    if line.startswith("diff --git "):
+        _, _, path = line.rstrip("\n").partition(" b/")
+        return path
+    return _strip_prefix(line[4:].strip())
+
+
+def _strip_prefix(path: str) -> str:
+    if path.startswith(("a/", "b/")):
+        return path[2:]
+    return path
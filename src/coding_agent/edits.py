@@ -0,0 +1,34 @@
+from collections.abc import Iterable
+
+from coding_agent.llm.schemas import Edit
+
+
+class EditError(Exception):
+    """Правку нельзя применить однозначно."""
+
+
+def apply_edits(text: str, edits: Iterable[Edit]) -> str:
+    """Применить правки search/replace по порядку.
+
+    Каждый фрагмент `search` должен встречаться в текущем тексте ровно один
+    раз: иначе непонятно, что именно менять, и правка отклоняется целиком.
+    """
+    for number, edit in enumerate(edits, 1):
+        if not edit.search:
+            raise EditError(f"правка {number}: пустой search")
+        count = text.count(edit.search)
+        if count == 0:
+            raise EditError(f"правка {number}: фрагмент не найден:\n{_preview(edit.search)}")
+        if count > 1:
+            raise EditError(
+                f"правка {number}: фрагмент встречается {count} раз:\n{_preview(edit.search)}"
+            )
+        text = text.replace(edit.search, edit.replace, 1)
+    return text
+
+
+def _preview(fragment: str, max_lines: int = 5) -> str:
+    lines = fragment.splitlines()
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + ["..."]
+    return "\n".join(lines)
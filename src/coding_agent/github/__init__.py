@@ -1,3 +1,3 @@
-from coding_agent.github.client import CIStatus, GitHubClient
+from coding_agent.github.client import CIStatus, GitHubClient, PRContext
 
-__all__ = ["GitHubClient", "CIStatus"]
+__all__ = ["GitHubClient", "CIStatus", "PRContext"]
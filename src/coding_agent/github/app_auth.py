@@ -1,22 +1,83 @@
+import threading
 import time
+from datetime import datetime
 
-import httpx
 import jwt
 
+from coding_agent.github.transport import get_http_client, get_rate_limiter
+
+JWT_LIFETIME = 600
+
+# Обновляем токены заранее, чтобы задача не получила токен, истекающий на лету
+JWT_REFRESH_MARGIN = 60
+TOKEN_REFRESH_MARGIN = 300
+
 
 class GitHubAppAuth:
     def __init__(self, app_id: str, private_key: str):
         self.app_id = app_id
         self.private_key = private_key
+        self._jwt: tuple[str, float] | None = None
+        self._jwt_lock = threading.Lock()
+        # installation_id -> (токен, expires_at в unix time)
+        self._tokens: dict[int, tuple[str, float]] = {}
+        # Один lock на установку: параллельные запросы ждут один и тот же fetch
+        self._token_locks: dict[int, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._bot_login: str | None = None
 
     def get_jwt(self) -> str:
-        now = int(time.time())
-        payload = {"iat": now - 60, "exp": now + 600, "iss": self.app_id}
-        return jwt.encode(payload, self.private_key, algorithm="RS256")
+        with self._jwt_lock:
+            if self._jwt and self._jwt[1] - JWT_REFRESH_MARGIN > time.time():
+                return self._jwt[0]
+            now = int(time.time())
+            payload = {"iat": now - 60, "exp": now + JWT_LIFETIME, "iss": self.app_id}
+            token = jwt.encode(payload, self.private_key, algorithm="RS256")
+            self._jwt = (token, now + JWT_LIFETIME)
+            return token
 
     def get_installation_token(self, installation_id: int) -> str:
+        cached = self._cached_token(installation_id)
+        if cached:
+            return cached
+
+        with self._locks_guard:
+            lock = self._token_locks.setdefault(installation_id, threading.Lock())
+
+        with lock:
+            # Пока ждали lock, токен мог получить другой поток
+            cached = self._cached_token(installation_id)
+            if cached:
+                return cached
+
+            token, expires_at = self._fetch_installation_token(installation_id)
+            self._tokens[installation_id] = (token, expires_at)
+            get_rate_limiter().register(token, installation_key(installation_id))
+            return token
+
+    def get_bot_login(self) -> str:
+        """Логин бота App ("slug[bot]"), от имени которого пишут токены установок."""
+        if self._bot_login is None:
+            resp = get_http_client().get(
+                "https://api.github.com/app",
+                headers={
+                    "Authorization": f"Bearer {self.get_jwt()}",
+                    "Accept": "application/vnd.github+json",
+                },
+            )
+            resp.raise_for_status()
+            self._bot_login = f"{resp.json()['slug']}[bot]"
+        return self._bot_login
+
+    def _cached_token(self, installation_id: int) -> str | None:
+        cached = self._tokens.get(installation_id)
+        if cached and cached[1] - TOKEN_REFRESH_MARGIN > time.time():
+            return cached[0]
+        return None
+
+    def _fetch_installation_token(self, installation_id: int) -> tuple[str, float]:
         jwt_token = self.get_jwt()
-        resp = httpx.post(
+        resp = get_http_client().post(
             f"https://api.github.com/app/installations/{installation_id}/access_tokens",
             headers={
                 "Authorization": f"Bearer {jwt_token}",
@@ -24,4 +85,12 @@ class GitHubAppAuth:
             },
         )
         resp.raise_for_status()
-        return resp.json()["token"]
+        data = resp.json()
+        # Формат expires_at: 2016-07-11T22:14:10Z
+        expires_at = datetime.fromisoformat(data["expires_at"]).timestamp()
+        return data["token"], expires_at
+
+
+def installation_key(installation_id: int) -> str:
+    """Ключ квоты установки в учёте лимитов."""
+    return f"installation:{installation_id}"
@@ -1,10 +1,48 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from github import Github
+from github import Auth, Consts, Github, GithubException
 from github.Issue import Issue
 from github.PullRequest import PullRequest
 from github.Repository import Repository
 
+from coding_agent.github import transport
+
+DIFF_MEDIA_TYPE = "application/vnd.github.diff"
+
+# Всё, что нужно ревьюеру и исправлениям, одним запросом
+PR_CONTEXT_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      number
+      title
+      body
+      headRefName
+      headRefOid
+      closingIssuesReferences(first: 1) { nodes { number title body } }
+      reviews(last: 30) {
+        nodes {
+          state
+          body
+          author { login }
+          commit { oid }
+          comments(first: 50) { nodes { path line body } }
+        }
+      }
+      commits(last: 1) {
+        nodes {
+          commit {
+            checkSuites(first: 20) {
+              nodes { checkRuns(first: 50) { nodes { name conclusion } } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
 
 @dataclass
 class CIStatus:
@@ -12,40 +50,211 @@ class CIStatus:
     summary: str
 
 
+@dataclass
+class IssueInfo:
+    number: int
+    title: str
+    body: str
+
+
+@dataclass
+class ReviewInfo:
+    state: str
+    body: str
+    commit_sha: str | None = None
+    # Комментарии к строкам: "путь:строка: текст"
+    comments: list[str] = field(default_factory=list)
+    # Логин автора; у ботов без суффикса "[bot]"
+    author: str | None = None
+
+
+@dataclass
+class PRContext:
+    """Данные PR для ревью и исправлений."""
+
+    number: int
+    title: str
+    body: str
+    head_sha: str
+    head_ref: str
+    # Связанный Issue и CI известны только при загрузке через GraphQL
+    issue: IssueInfo | None = None
+    reviews: list[ReviewInfo] = field(default_factory=list)
+    check_runs: list[tuple[str, str | None]] | None = None
+
+    @property
+    def ci_status(self) -> CIStatus | None:
+        if self.check_runs is None:
+            return None
+        return _ci_status(self.check_runs)
+
+
 class GitHubClient:
-    def __init__(self, token: str, repo_name: str):
-        self.github = Github(token)
-        self.repo: Repository = self.github.get_repo(repo_name)
+    def __init__(
+        self,
+        token: str,
+        repo_name: str,
+        base_url: str = Consts.DEFAULT_BASE_URL,
+        graphql: bool = False,
+    ):
+        transport.install()
+        self.token = token
+        self.repo_name = repo_name
+        self.base_url = base_url.rstrip("/")
+        self.graphql = graphql
+        self.github = Github(auth=Auth.Token(token), base_url=self.base_url)
+        # lazy: репозиторий догрузится только если понадобятся его поля
+        self.repo: Repository = self.github.get_repo(repo_name, lazy=True)
+        # Клиент живёт одну задачу, поэтому PR и Issue достаточно получить один раз
+        self._prs: dict[int, PullRequest] = {}
+        self._issues: dict[int, Issue] = {}
+        self._login: str | None = None
+
+    def get_login(self) -> str | None:
+        """Логин владельца токена; None, если GitHub его не отдаёт (токен установки App)."""
+        if self._login is None:
+            try:
+                self._login = self.github.get_user().login
+            except GithubException:
+                return None
+        return self._login
 
     def get_default_branch(self) -> str:
         return self.repo.default_branch
 
     def get_issue(self, number: int) -> Issue:
-        return self.repo.get_issue(number)
+        if number not in self._issues:
+            self._issues[number] = self.repo.get_issue(number)
+        return self._issues[number]
 
     def create_pr(self, title: str, body: str, branch: str, base: str | None = None) -> PullRequest:
         if base is None:
             base = self.get_default_branch()
-        return self.repo.create_pull(
+        pr = self.repo.create_pull(
             title=title,
             body=body,
             head=branch,
             base=base,
         )
+        self._prs[pr.number] = pr
+        return pr
 
     def get_pr(self, number: int) -> PullRequest:
-        return self.repo.get_pull(number)
+        if number not in self._prs:
+            self._prs[number] = self.repo.get_pull(number)
+        return self._prs[number]
 
     def get_pr_diff(self, pr_number: int) -> str:
+        """Unified diff PR одним запросом; для слишком больших PR — по файлам."""
+        response = transport.get_http_client().get(
+            f"{self.base_url}/repos/{self.repo_name}/pulls/{pr_number}",
+            headers={"Accept": DIFF_MEDIA_TYPE, "Authorization": f"Bearer {self.token}"},
+        )
+        if response.status_code == 200:
+            return response.text
+        # 406: GitHub не отдаёт diff целиком для очень больших PR
+        if response.status_code not in (406, 422):
+            response.raise_for_status()
         pr = self.get_pr(pr_number)
-        files = pr.get_files()
-        diff_parts = []
-        for f in files:
-            diff_parts.append(f"--- {f.filename}")
-            diff_parts.append(f"+++ {f.filename}")
-            if f.patch:
-                diff_parts.append(f.patch)
-        return "\n".join(diff_parts)
+        return _format_patches(pr.get_files())
+
+    def load_pr_context(self, pr_number: int) -> PRContext:
+        """PR вместе с ревью; через GraphQL — ещё Issue и CI, всё одним запросом."""
+        if self.graphql:
+            return self._load_pr_context_graphql(pr_number)
+
+        pr = self.get_pr(pr_number)
+        reviews = [
+            ReviewInfo(
+                state=r.state,
+                body=r.body or "",
+                commit_sha=r.commit_id,
+                author=bot_login(r.user.login) if r.user else None,
+            )
+            for r in pr.get_reviews()
+        ]
+        return PRContext(
+            number=pr.number,
+            title=pr.title,
+            body=pr.body or "",
+            head_sha=pr.head.sha,
+            head_ref=pr.head.ref,
+            reviews=reviews,
+        )
+
+    def _load_pr_context_graphql(self, pr_number: int) -> PRContext:
+        owner, name = self.repo_name.split("/", 1)
+        data = self._graphql(PR_CONTEXT_QUERY, owner=owner, name=name, number=pr_number)
+        pr = data["repository"]["pullRequest"]
+        if pr is None:
+            raise GithubException(404, {"message": f"PR #{pr_number} not found"})
+
+        issues = pr["closingIssuesReferences"]["nodes"]
+        issue = None
+        if issues:
+            issue = IssueInfo(issues[0]["number"], issues[0]["title"], issues[0]["body"] or "")
+
+        reviews = []
+        for node in pr["reviews"]["nodes"]:
+            comments = []
+            for c in node["comments"]["nodes"]:
+                location = f"{c['path']}:{c['line']}" if c["line"] else c["path"]
+                comments.append(f"{location}: {c['body']}")
+            commit = node["commit"] or {}
+            author = node["author"] or {}
+            reviews.append(
+                ReviewInfo(
+                    node["state"], node["body"] or "", commit.get("oid"), comments,
+                    author.get("login"),
+                )
+            )
+
+        check_runs = []
+        for commit in pr["commits"]["nodes"]:
+            for suite in commit["commit"]["checkSuites"]["nodes"]:
+                for run in suite["checkRuns"]["nodes"]:
+                    conclusion = run["conclusion"].lower() if run["conclusion"] else None
+                    check_runs.append((run["name"], conclusion))
+
+        return PRContext(
+            number=pr["number"],
+            title=pr["title"],
+            body=pr["body"] or "",
+            head_sha=pr["headRefOid"],
+            head_ref=pr["headRefName"],
+            issue=issue,
+            reviews=reviews,
+            check_runs=check_runs,
+        )
+
+    def _graphql(self, query: str, **variables) -> dict:
+        # REST на .../api/v3 у GitHub Enterprise, GraphQL — на .../api/graphql
+        if self.base_url.endswith("/api/v3"):
+            url = self.base_url[: -len("/v3")] + "/graphql"
+        else:
+            url = f"{self.base_url}/graphql"
+        response = transport.get_http_client().post(
+            url,
+            json={"query": query, "variables": variables},
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        # Тело ошибки (502 от прокси, 401) бывает не JSON — сначала статус
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("errors"):
+            raise GithubException(response.status_code, payload, dict(response.headers))
+        return payload["data"]
+
+    def get_compare_diff(self, base: str, head: str) -> str | None:
+        """Diff от base до head, если head — потомок base (иначе история переписана)."""
+        try:
+            comparison = self.repo.compare(base, head)
+        except GithubException:
+            # base не найден — например, удалён force-push'ем
+            return None
+        if comparison.status != "ahead":
+            return None
+        return _format_patches(comparison.files)
 
     def create_review(self, pr_number: int, body: str, approve: bool) -> None:
         pr = self.get_pr(pr_number)
@@ -58,31 +267,49 @@ class GitHubClient:
 
     def get_ci_status(self, pr_number: int) -> CIStatus:
         pr = self.get_pr(pr_number)
-        commit = pr.get_commits().reversed[0]
-        check_runs = commit.get_check_runs()
-
-        total = 0
-        passed = 0
-        failed_names = []
-
-        for run in check_runs:
-            total += 1
-            if run.conclusion == "success":
-                passed += 1
-            elif run.conclusion in ("failure", "cancelled"):
-                failed_names.append(run.name)
-
-        if total == 0:
-            return CIStatus(success=True, summary="Нет проверок")
-
-        if failed_names:
-            return CIStatus(
-                success=False,
-                summary=f"{passed}/{total} прошло, упали: {', '.join(failed_names)}"
-            )
-
-        return CIStatus(success=True, summary=f"{passed}/{total} прошло")
+        # get_commit ленивый: запрос только за check-runs
+        check_runs = self.repo.get_commit(pr.head.sha).get_check_runs()
+        return _ci_status([(run.name, run.conclusion) for run in check_runs])
 
     def add_label(self, pr_number: int, label: str) -> None:
         pr = self.get_pr(pr_number)
         pr.add_to_labels(label)
+
+
+def bot_login(login: str) -> str:
+    """Логин без суффикса "[bot]": REST отдаёт логин App с ним, GraphQL — без."""
+    return login.removesuffix("[bot]")
+
+
+def _ci_status(check_runs: list[tuple[str, str | None]]) -> CIStatus:
+    total = 0
+    passed = 0
+    failed_names = []
+
+    for name, conclusion in check_runs:
+        total += 1
+        if conclusion == "success":
+            passed += 1
+        elif conclusion in ("failure", "cancelled"):
+            failed_names.append(name)
+
+    if total == 0:
+        return CIStatus(success=True, summary="Нет проверок")
+
+    if failed_names:
+        return CIStatus(
+            success=False,
+            summary=f"{passed}/{total} прошло, упали: {', '.join(failed_names)}"
+        )
+
+    return CIStatus(success=True, summary=f"{passed}/{total} прошло")
+
+
+def _format_patches(files) -> str:
+    diff_parts = []
+    for f in files:
+        diff_parts.append(f"--- {f.filename}")
+        diff_parts.append(f"+++ {f.filename}")
+        if f.patch:
+            diff_parts.append(f.patch)
+    return "\n".join(diff_parts)
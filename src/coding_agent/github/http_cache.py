@@ -0,0 +1,211 @@
+"""Кеш условных GET-запросов к GitHub (ETag / Last-Modified).
+
+Повторное чтение того же URL уходит с `If-None-Match`/`If-Modified-Since`;
+ответ 304 отдаётся из кеша и у GitHub не расходует лимит запросов.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+DEFAULT_MAX_SIZE = 50 * 1024**2
+
+# Заголовки, которые описывают передачу, а не содержимое ответа
+_TRANSFER_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection"}
+
+
+@dataclass
+class CachedResponse:
+    etag: str | None
+    last_modified: str | None
+    headers: list[tuple[str, str]]
+    content: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def to_dict(self) -> dict:
+        return {
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "headers": self.headers,
+            "content": self.content.decode("latin-1"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CachedResponse":
+        return cls(
+            etag=data["etag"],
+            last_modified=data["last_modified"],
+            headers=[tuple(h) for h in data["headers"]],
+            content=data["content"].encode("latin-1"),
+        )
+
+
+class ConditionalCache:
+    """LRU в памяти с ограничением по размеру и необязательной копией на диске."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, cache_dir: str | Path | None = None):
+        self.max_size = max_size
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(request: httpx.Request, principal: str) -> str:
+        # Ответ зависит от того, чей токен (видимость репозиториев), и от формата (json/diff)
+        parts = [str(request.url), request.headers.get("accept", ""), principal]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if entry.size > self.max_size:
+            return
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size": self._size,
+            }
+
+    def _remember(self, key: str, entry: CachedResponse):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self.max_size and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def _read_disk(self, key: str) -> CachedResponse | None:
+        if not self.cache_dir:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # mtime — время последнего использования для вытеснения
+        path.touch()
+        return CachedResponse.from_dict(data)
+
+    def _write_disk(self, key: str, entry: CachedResponse):
+        if not self.cache_dir:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry.to_dict(), f)
+        os.replace(tmp, self.cache_dir / f"{key}.json")
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class CachingTransport(httpx.BaseTransport):
+    """Обёртка над транспортом httpx: условные GET и ответы 304 из кеша."""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        cache: ConditionalCache,
+        key_for: Callable[[str], str] | None = None,
+    ):
+        self.transport = transport
+        self.cache = cache
+        # Authorization -> владелец токена. Токены установки App меняются каждый час,
+        # а кеш с ключом по самому токену после смены был бы пуст
+        self.key_for = key_for
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return self.transport.handle_request(request)
+
+        authorization = request.headers.get("authorization", "")
+        principal = self.key_for(authorization) if self.key_for else authorization
+        key = self.cache.make_key(request, principal)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if cached.etag and "if-none-match" not in request.headers:
+                request.headers["If-None-Match"] = cached.etag
+            if cached.last_modified and "if-modified-since" not in request.headers:
+                request.headers["If-Modified-Since"] = cached.last_modified
+
+        response = self.transport.handle_request(request)
+
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            self.cache.record(hit=True)
+            # Свежие заголовки (лимиты запросов) поверх сохранённых
+            headers = dict(cached.headers)
+            headers.update(
+                (k, v) for k, v in response.headers.items() if k not in _TRANSFER_HEADERS
+            )
+            return httpx.Response(200, headers=headers, content=cached.content, request=request)
+
+        self.cache.record(hit=False)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if response.status_code == 200 and (etag or last_modified):
+            content = response.read()
+            response.close()
+            headers = [
+                (k, v) for k, v in response.headers.items() if k not in _TRANSFER_HEADERS
+            ]
+            self.cache.put(key, CachedResponse(etag, last_modified, headers, content))
+            return httpx.Response(200, headers=headers, content=content, request=request)
+        return response
+
+    def close(self):
+        self.transport.close()
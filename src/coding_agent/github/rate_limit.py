@@ -0,0 +1,166 @@
+"""Учёт лимитов GitHub API по заголовкам ответов.
+
+Квота считается на установку App (или на токен в CLI) и на ресурс
+(core/graphql/search): остаток и время сброса берутся из `X-RateLimit-*`.
+Когда квоты мало, чтения растягиваются до сброса, запись идёт без
+задержки; вторичные лимиты (403/429 с Retry-After) пережидаются.
+"""
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+import httpx
+from rich.console import Console
+
+console = Console()
+
+# Ожидание после вторичного лимита, если GitHub не прислал Retry-After
+SECONDARY_LIMIT_WAIT = 60.0
+MAX_LIMIT_RETRIES = 2
+
+
+@dataclass
+class Quota:
+    limit: int | None = None
+    remaining: int | None = None
+    reset: float = 0.0
+    blocked_until: float = 0.0
+
+    def delay(self, now: float, urgent: bool, reserve: float) -> float:
+        """Сколько подождать перед запросом."""
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.remaining is None or self.reset <= now:
+            return 0.0
+        if self.remaining <= 0:
+            return self.reset - now
+        if urgent or not self.limit or self.remaining > self.limit * reserve:
+            return 0.0
+        # Квоты мало: растягиваем остаток до сброса
+        return (self.reset - now) / self.remaining
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": max(0.0, round(self.reset - now, 1)),
+            "blocked_for": max(0.0, round(self.blocked_until - now, 1)),
+        }
+
+
+class RateLimiter:
+    def __init__(self, reserve: float = 0.1, max_wait: float = 900.0):
+        # Доля квоты, ниже которой несрочные запросы замедляются
+        self.reserve = reserve
+        # Дольше этого не ждём: пусть запрос упадёт, чем зависнет задача
+        self.max_wait = max_wait
+        self._quotas: dict[tuple[str, str], Quota] = {}
+        self._labels: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, token: str, label: str):
+        """Связать токен с установкой: токены одной установки делят квоту."""
+        with self._lock:
+            self._labels[_digest(token)] = label
+
+    def key_for(self, authorization: str) -> str:
+        if not authorization:
+            return "anonymous"
+        digest = _digest(authorization.split()[-1])
+        with self._lock:
+            return self._labels.get(digest, f"token:{digest}")
+
+    def wait(self, key: str, resource: str, urgent: bool):
+        with self._lock:
+            quota = self._quotas.get((key, resource))
+            delay = quota.delay(time.time(), urgent, self.reserve) if quota else 0.0
+        if 0 < delay <= self.max_wait:
+            time.sleep(delay)
+
+    def update(self, key: str, resource: str, response: httpx.Response) -> float | None:
+        """Обновить квоту по ответу. Для отказа по лимиту — сколько ждать до повтора."""
+        headers = response.headers
+        resource = headers.get("x-ratelimit-resource", resource)
+        now = time.time()
+        with self._lock:
+            quota = self._quotas.setdefault((key, resource), Quota())
+            if "x-ratelimit-remaining" in headers:
+                quota.remaining = int(headers["x-ratelimit-remaining"])
+                quota.limit = int(headers.get("x-ratelimit-limit", quota.limit or 0)) or None
+                quota.reset = float(headers.get("x-ratelimit-reset", quota.reset))
+
+            if response.status_code not in (403, 429):
+                return None
+            retry_after = headers.get("retry-after")
+            if retry_after is not None:
+                quota.blocked_until = now + float(retry_after)
+            elif quota.remaining == 0 and "x-ratelimit-remaining" in headers:
+                quota.blocked_until = quota.reset
+            elif response.status_code == 429:
+                quota.blocked_until = now + SECONDARY_LIMIT_WAIT
+            else:
+                # Обычный 403 — нет прав, а не лимит
+                return None
+            return quota.blocked_until - now
+
+    def job_delay(self, key: str, cost: int) -> float:
+        """Через сколько секунд у установки хватит квоты на задачу стоимостью `cost` запросов."""
+        now = time.time()
+        with self._lock:
+            quota = self._quotas.get((key, "core"))
+            if quota is None:
+                return 0.0
+            if quota.blocked_until > now:
+                return quota.blocked_until - now
+            if quota.remaining is not None and quota.reset > now and quota.remaining < cost:
+                return quota.reset - now
+            return 0.0
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self._lock:
+            result: dict[str, dict] = {}
+            for (key, resource), quota in self._quotas.items():
+                result.setdefault(key, {})[resource] = quota.to_dict(now)
+            return result
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Обёртка над транспортом httpx: ожидание квоты и повтор после отказа по лимиту."""
+
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = self.limiter.key_for(request.headers.get("authorization", ""))
+        resource = _resource(request.url.path)
+        urgent = request.method != "GET"
+
+        attempt = 0
+        while True:
+            self.limiter.wait(key, resource, urgent)
+            response = self.transport.handle_request(request)
+            delay = self.limiter.update(key, resource, response)
+            if delay is None or attempt >= MAX_LIMIT_RETRIES or delay > self.limiter.max_wait:
+                return response
+            response.close()
+            console.print(f"[yellow]Лимит GitHub API ({key}), повтор через {delay:.0f} с[/yellow]")
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+
+def _resource(path: str) -> str:
+    if path.endswith("/graphql"):
+        return "graphql"
+    if "/search/" in path:
+        return "search"
+    return "core"
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
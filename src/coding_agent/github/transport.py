@@ -0,0 +1,165 @@
+"""Общий HTTP-транспорт для всех запросов к GitHub.
+
+Один `httpx.Client` на процесс: keep-alive, пул соединений, HTTP/2 (если
+установлен `h2`), кеш условных GET-запросов и учёт лимитов API. Через него ходят и авторизация
+GitHub App, и PyGithub — для последнего подменяется класс соединения в
+`Requester`.
+"""
+
+import threading
+
+import httpx
+from github.Requester import Requester
+
+from coding_agent.config import get_settings
+from coding_agent.github.http_cache import CachingTransport, ConditionalCache
+from coding_agent.github.rate_limit import RateLimitedTransport, RateLimiter
+
+_client: httpx.Client | None = None
+_cache: ConditionalCache | None = None
+_rate_limiter: RateLimiter | None = None
+_lock = threading.Lock()
+_installed = False
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.Client:
+    """Вернуть общий клиент, создав его при первом обращении."""
+    global _client, _cache, _rate_limiter
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            settings = get_settings()
+            pool = httpx.HTTPTransport(
+                http2=_http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.github_pool_size,
+                    max_keepalive_connections=settings.github_pool_size,
+                ),
+            )
+            _cache = ConditionalCache(settings.github_cache_size, settings.github_cache_dir)
+            _rate_limiter = RateLimiter(
+                settings.github_rate_limit_reserve, settings.github_rate_limit_max_wait
+            )
+            # Ответ 304 из кеша тоже несёт заголовки лимитов, поэтому учёт — ближе к сети
+            _client = httpx.Client(
+                transport=CachingTransport(
+                    RateLimitedTransport(pool, _rate_limiter), _cache, _rate_limiter.key_for
+                ),
+                timeout=httpx.Timeout(settings.github_timeout),
+            )
+    return _client
+
+
+def get_rate_limiter() -> RateLimiter:
+    get_http_client()
+    # Создаётся вместе с клиентом, но клиент могли подменить (тесты)
+    if _rate_limiter is None:
+        raise RuntimeError("Учёт лимитов GitHub не инициализирован")
+    return _rate_limiter
+
+
+def cache_stats() -> dict:
+    return _cache.stats() if _cache else {}
+
+
+def rate_limit_stats() -> dict:
+    return _rate_limiter.snapshot() if _rate_limiter else {}
+
+
+def close():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def install():
+    """Направить запросы PyGithub через общий клиент. Повторный вызов ничего не делает."""
+    global _installed
+    with _lock:
+        if not _installed:
+            Requester.injectConnectionClasses(PooledHTTPConnection, PooledConnection)
+            _installed = True
+
+
+class _PooledResponse:
+    """Ответ в том виде, который ожидает `Requester`."""
+
+    def __init__(self, response: httpx.Response):
+        self.status = response.status_code
+        self.headers = response.headers
+        self._response = response
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def getheaders(self):
+        return self.headers.multi_items()
+
+    def read(self) -> str:
+        return self.text
+
+    def iter_content(self, chunk_size: int = 1024):
+        # Байты как есть: архивы и прочие бинарные ответы не проходят через декодирование
+        data = self._response.content
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+
+class PooledConnection:
+    """Соединение PyGithub поверх общего `httpx.Client`.
+
+    `Requester` создаёт такой объект на каждый запрос, поэтому он не держит
+    сокетов сам — соединения живут в пуле клиента.
+    """
+
+    protocol = "https"
+
+    def __init__(self, host: str, port: int | None = None, **kwargs):
+        self.host = host
+        self.port = port
+        self.timeout = kwargs.get("timeout")
+        self.verb = ""
+        self.url = ""
+        self.input = None
+        self.headers: dict = {}
+
+    def request(self, verb: str, url: str, input, headers: dict, stream: bool = False):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self) -> _PooledResponse:
+        if self.url.startswith(("http://", "https://")):
+            url = self.url
+        else:
+            port = f":{self.port}" if self.port else ""
+            url = f"{self.protocol}://{self.host}{port}{self.url}"
+
+        kwargs = {}
+        if self.timeout is not None:
+            kwargs["timeout"] = self.timeout
+        response = get_http_client().request(
+            self.verb, url, headers=self.headers, content=self.input, **kwargs
+        )
+        return _PooledResponse(response)
+
+    def close(self):
+        # Соединение возвращается в пул клиентом, закрывать нечего
+        pass
+
+
+class PooledHTTPConnection(PooledConnection):
+    protocol = "http"
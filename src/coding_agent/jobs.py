@@ -0,0 +1,387 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from enum import Enum
+
+from rich.console import Console
+
+console = Console()
+
+# Сколько последних X-GitHub-Delivery помнить для защиты от повторной доставки
+DELIVERY_HISTORY_SIZE = 1000
+
+# Ревью короткие и блокируют людей — они идут раньше генерации кода
+KIND_PRIORITY = {"review": 0}
+DEFAULT_PRIORITY = 1
+
+# Условная стоимость задачи для справедливой очереди между установками
+KIND_COST = {"review": 1.0}
+DEFAULT_COST = 3.0
+
+# Как часто перепроверять квоту токенов LLM у ждущих установок
+QUOTA_RECHECK_INTERVAL = 30.0
+
+
+class JobDeferred(Exception):
+    """Задачу рано запускать: вернуть в очередь и повторить через `delay` секунд."""
+
+    def __init__(self, delay: float, reason: str = ""):
+        super().__init__(reason)
+        self.delay = delay
+        self.reason = reason
+
+
+class JobRejected(Exception):
+    """Очередь не принимает задачу: переполнена или сервер останавливается."""
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # Заменена более новой задачей того же вида до запуска
+    SUPERSEDED = "superseded"
+    # Снята без запуска при остановке сервера
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class Job:
+    """Задача, поставленная в очередь из webhook."""
+
+    kind: str
+    key: str
+    func: Callable[[], object]
+    delivery_id: str | None = None
+    # Установка GitHub App, чьи квоты и очередь расходует задача
+    tenant: str = ""
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: JobState = JobState.QUEUED
+    created_at: float = field(default_factory=time.time)
+    # Отложенная задача не запускается раньше этого времени
+    not_before: float = 0.0
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    superseded_by: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "key": self.key,
+            "tenant": self.tenant,
+            "state": self.state.value,
+            "created_at": self.created_at,
+            "not_before": self.not_before or None,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "delivery_id": self.delivery_id,
+            "superseded_by": self.superseded_by,
+        }
+
+
+@dataclass
+class TenantStats:
+    running: int = 0
+    started: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    # Виртуальное время справедливой очереди: сколько обслужено с учётом веса
+    virtual_time: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "running": self.running,
+            "started": self.started,
+            "queue_wait_avg": round(self.wait_total / self.started, 3) if self.started else 0,
+            "queue_wait_max": round(self.wait_max, 3),
+        }
+
+
+class JobQueue:
+    """Пул рабочих потоков для задач агентов.
+
+    Задачи с одинаковым `key` (репозиторий + Issue/PR) выполняются строго
+    по очереди, разные ключи — параллельно, до `workers` одновременно.
+
+    Между установками (`tenant`) очередь взвешенно-справедливая: следующей
+    берётся задача установки, обслуженной меньше всех с учётом веса, так
+    что массовая разметка Issue в одной организации не задерживает других.
+    Ревью идут раньше генерации. У установки есть лимит одновременных задач
+    и квота токенов LLM (`token_usage` — расход установки за последний час).
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        history_size: int = 100,
+        tenant_concurrency: int = 0,
+        tenant_weights: dict[str, float] | None = None,
+        token_quota: int = 0,
+        token_usage: Callable[[str], int] | None = None,
+        max_pending: int = 0,
+    ):
+        self.workers = workers
+        # Сколько задач может ждать в очереди; сверх этого submit отказывает
+        self.max_pending = max_pending
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_weights = tenant_weights or {}
+        self.token_quota = token_quota
+        self.token_usage = token_usage
+        self._tenants: dict[str, TenantStats] = {}
+        self._virtual_clock = 0.0
+        self._pending: list[Job] = []
+        self._running: dict[str, Job] = {}
+        self._history: deque[Job] = deque(maxlen=history_size)
+        self._deliveries: OrderedDict[str, Job] = OrderedDict()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        self._draining = False
+
+    def start(self):
+        self._stopping = False
+        self._draining = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def begin_drain(self):
+        """Перестать принимать задачи; очередь продолжает выполняться до drain()."""
+        with self._cond:
+            self._draining = True
+
+    def drain(self, timeout: float) -> list[Job]:
+        """Плавная остановка: новые задачи не принимаются, ждущие снимаются,
+        выполняющиеся получают `timeout` секунд на завершение.
+
+        Возвращает задачи, которые не успели завершиться.
+        """
+        with self._cond:
+            self._draining = True
+            now = time.time()
+            for job in self._pending:
+                job.state = JobState.CANCELLED
+                job.finished_at = now
+                self._history.append(job)
+            if self._pending:
+                console.print(f"[yellow]Снято задач из очереди: {len(self._pending)}[/yellow]")
+            self._pending.clear()
+            self._stopping = True
+            self._cond.notify_all()
+
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = [t for t in self._threads if t.is_alive()]
+        with self._cond:
+            return list(self._running.values())
+
+    def load(self) -> dict:
+        """Загрузка очереди для health-check."""
+        with self._cond:
+            pending = len(self._pending)
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": pending,
+                "max_queued": self.max_pending or None,
+                "saturated": bool(self.max_pending) and pending >= self.max_pending,
+                "draining": self._draining,
+            }
+
+    def submit(
+        self,
+        kind: str,
+        key: str,
+        func: Callable[[], object],
+        delivery_id: str | None = None,
+        coalesce: float = 0.0,
+        tenant: str = "",
+    ) -> Job:
+        """Поставить задачу в очередь.
+
+        Повторная доставка с тем же `delivery_id` возвращает уже созданную
+        задачу. С окном `coalesce` задача стартует не раньше чем через
+        столько секунд, а ещё не начатые задачи того же вида и ключа
+        снимаются: выполнится только последняя.
+        """
+        with self._cond:
+            if delivery_id and delivery_id in self._deliveries:
+                return self._deliveries[delivery_id]
+            if self._draining:
+                raise JobRejected("сервер останавливается")
+
+            job = Job(kind=kind, key=key, func=func, delivery_id=delivery_id, tenant=tenant)
+            if coalesce:
+                job.not_before = job.created_at + coalesce
+                for old in [j for j in self._pending if j.key == key and j.kind == kind]:
+                    self._pending.remove(old)
+                    old.state = JobState.SUPERSEDED
+                    old.superseded_by = job.id
+                    old.finished_at = job.created_at
+                    self._history.append(old)
+            if self.max_pending and len(self._pending) >= self.max_pending:
+                raise JobRejected(f"очередь заполнена ({len(self._pending)} задач)")
+            self._pending.append(job)
+
+            if delivery_id:
+                self._deliveries[delivery_id] = job
+                while len(self._deliveries) > DELIVERY_HISTORY_SIZE:
+                    self._deliveries.popitem(last=False)
+            self._cond.notify()
+        return job
+
+    def get_delivery(self, delivery_id: str | None) -> Job | None:
+        """Задача, уже созданная по этой доставке webhook."""
+        if not delivery_id:
+            return None
+        with self._cond:
+            return self._deliveries.get(delivery_id)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queued": len(self._pending),
+                "running": len(self._running),
+                "jobs": [j.to_dict() for j in [*self._running.values(), *self._pending]],
+                "history": [j.to_dict() for j in reversed(self._history)],
+                "tenants": {
+                    tenant: {
+                        **stats.to_dict(),
+                        "queued": sum(1 for j in self._pending if j.tenant == tenant),
+                    }
+                    for tenant, stats in self._tenants.items()
+                },
+            }
+
+    def _next_job(self) -> Job | None:
+        """Следующая задача: по приоритету вида, затем справедливо между установками.
+
+        Из задач одного ключа доступна только первая в очереди, чтобы не
+        нарушить их порядок.
+        """
+        now = time.time()
+        seen_keys = set()
+        candidates = []
+        for job in self._pending:
+            if job.key in seen_keys:
+                continue
+            seen_keys.add(job.key)
+            if job.key in self._running or job.not_before > now:
+                continue
+            if self._tenant_available(job.tenant):
+                candidates.append(job)
+        if not candidates:
+            return None
+
+        job = min(
+            candidates,
+            key=lambda j: (
+                KIND_PRIORITY.get(j.kind, DEFAULT_PRIORITY),
+                self._tenant(j.tenant).virtual_time,
+                j.created_at,
+            ),
+        )
+        self._pending.remove(job)
+        return job
+
+    def _tenant(self, tenant: str) -> TenantStats:
+        return self._tenants.setdefault(tenant, TenantStats())
+
+    def _tenant_available(self, tenant: str) -> bool:
+        stats = self._tenant(tenant)
+        if self.tenant_concurrency and stats.running >= self.tenant_concurrency:
+            return False
+        if self.token_quota and self.token_usage and tenant:
+            return self.token_usage(tenant) < self.token_quota
+        return True
+
+    def _start(self, job: Job):
+        stats = self._tenant(job.tenant)
+        # Установка, долго простаивавшая, не копит право обогнать остальных
+        stats.virtual_time = max(stats.virtual_time, self._virtual_clock)
+        self._virtual_clock = stats.virtual_time
+        weight = self.tenant_weights.get(job.tenant, 1.0)
+        stats.virtual_time += KIND_COST.get(job.kind, DEFAULT_COST) / weight
+
+        wait = time.time() - max(job.created_at, job.not_before)
+        stats.running += 1
+        stats.started += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+
+        job.state = JobState.RUNNING
+        job.started_at = time.time()
+        self._running[job.key] = job
+
+    def _wait_timeout(self) -> float | None:
+        """Когда наступит срок ближайшей отложенной задачи или пора перепроверить квоты."""
+        now = time.time()
+        timeouts = [max(0.0, job.not_before - now) for job in self._pending if job.not_before]
+        if self.token_quota and self._pending:
+            timeouts.append(QUOTA_RECHECK_INTERVAL)
+        return min(timeouts) if timeouts else None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._stopping:
+                        return
+                    self._cond.wait(self._wait_timeout())
+                    job = self._next_job()
+                self._start(job)
+
+            deferred: JobDeferred | None = None
+            try:
+                job.func()
+                job.state = JobState.DONE
+            except JobDeferred as e:
+                deferred = e
+                console.print(
+                    f"[yellow]Задача {job.kind} {job.key} отложена "
+                    f"на {e.delay:.0f} с: {e.reason}[/yellow]"
+                )
+            except Exception as e:
+                job.state = JobState.FAILED
+                job.error = str(e)
+                console.print(f"[red]Задача {job.kind} {job.key} упала: {e}[/red]")
+                console.print(f"[dim]{traceback.format_exc()}[/dim]")
+            finally:
+                with self._cond:
+                    del self._running[job.key]
+                    self._tenant(job.tenant).running -= 1
+                    if deferred and self._draining:
+                        job.state = JobState.CANCELLED
+                        job.finished_at = time.time()
+                        self._history.append(job)
+                    elif deferred:
+                        job.state = JobState.QUEUED
+                        job.started_at = None
+                        job.not_before = time.time() + deferred.delay
+                        # В начало, чтобы не обогнать более поздние задачи того же ключа
+                        self._pending.insert(0, job)
+                    else:
+                        job.finished_at = time.time()
+                        self._history.append(job)
+                    # Освободился ключ — задачи с ним могли стать доступны
+                    self._cond.notify_all()
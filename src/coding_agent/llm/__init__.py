@@ -1,4 +1,17 @@
 from coding_agent.llm.client import LLMClient
-from coding_agent.llm.schemas import CodeGenerationResult, FileChange, ReviewComment, ReviewResult
+from coding_agent.llm.schemas import (
+    CodeGenerationResult,
+    Edit,
+    FileChange,
+    ReviewComment,
+    ReviewResult,
+)
 
-__all__ = ["LLMClient", "CodeGenerationResult", "ReviewResult", "FileChange", "ReviewComment"]
+__all__ = [
+    "LLMClient",
+    "CodeGenerationResult",
+    "ReviewResult",
+    "FileChange",
+    "Edit",
+    "ReviewComment",
+]
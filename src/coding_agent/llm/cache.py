@@ -0,0 +1,103 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_MAX_SIZE = 200 * 1024**2
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class ResponseCache:
+    """Кеш ответов LLM на диске (SQLite), адресуемый по содержимому запроса.
+
+    Ключ — хеш модели, сообщений и схемы ответа. Записи старше `ttl` не
+    отдаются, при превышении `max_size` удаляются давно не читанные.
+    """
+
+    def __init__(
+        self, path: str | Path, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL
+    ):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], schema: str) -> str:
+        payload = json.dumps([model, messages, schema], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] + self.ttl > now:
+                db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            elif row:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode())
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(db, now)
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            entries, size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "size": size}
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        db.execute("DELETE FROM responses WHERE created_at + ? <= ?", (self.ttl, now))
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_size:
+            return
+
+        rows = db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            stale.append((key,))
+            total -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Своё соединение на операцию: кеш общий для потоков и процессов
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
@@ -1,19 +1,76 @@
+import asyncio
+import json
 import os
+import time
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
 from typing import TypeVar
 
 import litellm
 
 from coding_agent.config import Settings
-from coding_agent.llm.prompts import CODE_GENERATION_PROMPT, FIX_PROMPT, REVIEW_PROMPT
-from coding_agent.llm.schemas import CodeGenerationResult, ReviewResult
+from coding_agent.llm.cache import ResponseCache
+from coding_agent.llm.limits import RETRYABLE_ERRORS, backoff_delay, get_limiter, metrics
+from coding_agent.llm.prompts import (
+    CODE_GENERATION_PROMPT,
+    CODE_SYSTEM_PROMPT,
+    CONTEXT_PROMPT,
+    FIX_PROMPT,
+    JSON_INSTRUCTION,
+    REVIEW_PROMPT,
+    REVIEW_SYSTEM_PROMPT,
+)
+from coding_agent.llm.schemas import CodeGenerationResult, FileChange, ReviewResult
+from coding_agent.llm.streaming import FilesStreamParser
 
 T = TypeVar("T")
 
 
+@cache
+def _response_cache(path: Path, max_size: int, ttl: float) -> ResponseCache:
+    """Один объект кеша на файл в процессе, чтобы счётчики попаданий были общими."""
+    return ResponseCache(path, max_size=max_size, ttl=ttl)
+
+
+def response_cache(settings: Settings) -> ResponseCache | None:
+    """Кеш ответов LLM из настроек; None, если он выключен."""
+    if not settings.llm_cache_dir:
+        return None
+    return _response_cache(
+        Path(settings.llm_cache_dir) / "responses.sqlite",
+        settings.llm_cache_max_size,
+        settings.llm_cache_ttl,
+    )
+
+
+@cache
+def _system_message(system_prompt: str, schema: type) -> str:
+    """Системное сообщение со схемой ответа — считается один раз на схему."""
+    schema_json = json.dumps(schema.model_json_schema(), ensure_ascii=False)
+    return system_prompt + JSON_INSTRUCTION.format(schema=schema_json)
+
+
+@cache
+def _supports_cache_control(model: str) -> bool:
+    """Поддерживает ли провайдер явные метки кеширования промпта."""
+    try:
+        return bool(litellm.supports_prompt_caching(model=model))
+    except Exception:
+        return False
+
+
 class LLMClient:
     def __init__(self, settings: Settings):
         self.model = settings.llm_model
+        self.timeout = settings.llm_timeout
+        self.max_retries = settings.llm_max_retries
+        self.limiter = get_limiter(settings.llm_max_concurrency, settings.llm_provider_concurrency)
+        self.provider = self._provider(self.model)
         self._setup_api_keys(settings)
+        self.last_usage: dict | None = None
+        self.cache = response_cache(settings)
+        self.cache_kinds = set(settings.llm_cache_kinds)
 
     def _setup_api_keys(self, settings: Settings):
         if settings.gemini_api_key:
@@ -25,53 +82,302 @@ class LLMClient:
         if settings.xai_api_key:
             os.environ["XAI_API_KEY"] = settings.xai_api_key
 
+    @staticmethod
+    def _provider(model: str) -> str:
+        try:
+            return litellm.get_llm_provider(model)[1]
+        except Exception:
+            return model.split("/", 1)[0]
+
+    def count_tokens(self, text: str) -> int:
+        """Число токенов в тексте по токенизатору модели (локально, без запроса)."""
+        return litellm.token_counter(model=self.model, text=text)
+
     def generate_code(
         self, issue_title: str, issue_body: str, context: str
     ) -> CodeGenerationResult:
-        prompt = CODE_GENERATION_PROMPT.format(
-            issue_title=issue_title,
-            issue_body=issue_body,
-            context=context,
-        )
-        return self._generate_json(prompt, CodeGenerationResult)
+        messages = self._code_messages(issue_title, issue_body, context)
+        return self._generate_json(messages, CodeGenerationResult, kind="code")
 
     def generate_review(
         self, diff: str, issue_title: str, issue_body: str
     ) -> ReviewResult:
-        prompt = REVIEW_PROMPT.format(
-            diff=diff,
-            issue_title=issue_title,
-            issue_body=issue_body,
-        )
-        return self._generate_json(prompt, ReviewResult)
+        messages = self._review_messages(diff, issue_title, issue_body)
+        return self._generate_json(messages, ReviewResult, kind="review")
 
     def generate_fix(
         self, feedback: str, issue_title: str, issue_body: str, context: str
     ) -> CodeGenerationResult:
-        prompt = FIX_PROMPT.format(
-            feedback=feedback,
-            issue_title=issue_title,
-            issue_body=issue_body,
-            context=context,
-        )
-        return self._generate_json(prompt, CodeGenerationResult)
+        messages = self._fix_messages(feedback, issue_title, issue_body, context)
+        return self._generate_json(messages, CodeGenerationResult, kind="fix")
 
-    def _generate_json(self, prompt: str, schema: type[T]) -> T:
-        schema_json = schema.model_json_schema()
+    async def agenerate_code(
+        self,
+        issue_title: str,
+        issue_body: str,
+        context: str,
+        model: str | None = None,
+        temperature: float | None = None,
+        variant: int | None = None,
+    ) -> CodeGenerationResult:
+        """Генерация кода; model и temperature переопределяют настройки (для best-of-N).
 
-        system_msg = (
-            "Ты должен ответить ТОЛЬКО валидным JSON объектом по схеме.\n"
-            f"JSON Schema: {schema_json}"
+        `variant` — номер варианта: у каждого свой ответ в кеше, иначе
+        одинаковые запросы вариантов получили бы один и тот же ответ.
+        """
+        messages = self._code_messages(issue_title, issue_body, context)
+        return await self._agenerate_json(
+            messages,
+            CodeGenerationResult,
+            kind="code",
+            model=model,
+            temperature=temperature,
+            variant=variant,
         )
 
-        response = litellm.completion(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-        )
+    async def agenerate_review(
+        self, diff: str, issue_title: str, issue_body: str
+    ) -> ReviewResult:
+        messages = self._review_messages(diff, issue_title, issue_body)
+        return await self._agenerate_json(messages, ReviewResult, kind="review")
+
+    async def agenerate_fix(
+        self, feedback: str, issue_title: str, issue_body: str, context: str
+    ) -> CodeGenerationResult:
+        messages = self._fix_messages(feedback, issue_title, issue_body, context)
+        return await self._agenerate_json(messages, CodeGenerationResult, kind="fix")
+
+    def stream_code(
+        self,
+        issue_title: str,
+        issue_body: str,
+        context: str,
+        on_file: Callable[[FileChange], None],
+        on_progress: Callable[[int], None] | None = None,
+    ) -> CodeGenerationResult:
+        """Генерация с потоковым ответом: каждый файл отдаётся в on_file, как только пришёл."""
+        messages = self._code_messages(issue_title, issue_body, context)
+        return self._stream_json(messages, CodeGenerationResult, on_file, on_progress)
+
+    def stream_fix(
+        self,
+        feedback: str,
+        issue_title: str,
+        issue_body: str,
+        context: str,
+        on_file: Callable[[FileChange], None],
+        on_progress: Callable[[int], None] | None = None,
+    ) -> CodeGenerationResult:
+        messages = self._fix_messages(feedback, issue_title, issue_body, context)
+        return self._stream_json(messages, CodeGenerationResult, on_file, on_progress)
+
+    def _code_messages(self, issue_title: str, issue_body: str, context: str) -> list[dict]:
+        task = CODE_GENERATION_PROMPT.format(issue_title=issue_title, issue_body=issue_body)
+        return self._messages(CODE_SYSTEM_PROMPT, CodeGenerationResult, task, context)
+
+    def _review_messages(self, diff: str, issue_title: str, issue_body: str) -> list[dict]:
+        task = REVIEW_PROMPT.format(diff=diff, issue_title=issue_title, issue_body=issue_body)
+        return self._messages(REVIEW_SYSTEM_PROMPT, ReviewResult, task)
+
+    def _fix_messages(
+        self, feedback: str, issue_title: str, issue_body: str, context: str
+    ) -> list[dict]:
+        task = FIX_PROMPT.format(feedback=feedback, issue_title=issue_title, issue_body=issue_body)
+        return self._messages(CODE_SYSTEM_PROMPT, CodeGenerationResult, task, context)
+
+    def _messages(
+        self, system_prompt: str, schema: type, task: str, context: str | None = None
+    ) -> list[dict]:
+        """Сообщения от стабильных к изменчивым: система + схема, контекст, задача."""
+        messages = [{"role": "system", "content": _system_message(system_prompt, schema)}]
+        if context is not None:
+            text = CONTEXT_PROMPT.format(context=context)
+            if _supports_cache_control(self.model):
+                # Метка конца кешируемого префикса (система + контекст)
+                content = [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+            else:
+                content = text
+            messages.append({"role": "user", "content": content})
+        messages.append({"role": "user", "content": task})
+        return messages
+
+    def _cache_key(
+        self,
+        messages: list[dict],
+        schema: type,
+        kind: str,
+        model: str | None = None,
+        temperature: float | None = None,
+        variant: int | None = None,
+    ) -> str | None:
+        if self.cache and kind in self.cache_kinds:
+            model = model or self.model
+            if temperature is not None:
+                # Варианты с разной температурой не должны получать один ответ из кеша
+                model = f"{model}@{temperature}"
+            if variant is not None:
+                model = f"{model}#{variant}"
+            return ResponseCache.make_key(model, messages, schema.__name__)
+        return None
+
+    def _generate_json(self, messages: list[dict], schema: type[T], kind: str) -> T:
+        cache_key = self._cache_key(messages, schema, kind)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+
+        text = self._complete(messages)
+        result = schema.model_validate_json(text)
+        # В кеш попадают только ответы, прошедшие валидацию
+        if cache_key:
+            self.cache.put(cache_key, text)
+        return result
+
+    async def _agenerate_json(
+        self,
+        messages: list[dict],
+        schema: type[T],
+        kind: str,
+        model: str | None = None,
+        temperature: float | None = None,
+        variant: int | None = None,
+    ) -> T:
+        cache_key = self._cache_key(messages, schema, kind, model, temperature, variant)
+        if cache_key:
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+
+        text = await self._acomplete(messages, model, temperature)
+        result = schema.model_validate_json(text)
+        if cache_key:
+            await asyncio.to_thread(self.cache.put, cache_key, text)
+        return result
+
+    def _stream_json(
+        self,
+        messages: list[dict],
+        schema: type[T],
+        on_file: Callable[[FileChange], None],
+        on_progress: Callable[[int], None] | None = None,
+    ) -> T:
+        """Потоковый запрос к LLM с разбором массива files на лету.
+
+        Повтор возможен только пока ни один файл не отдан в on_file. Если
+        поток оборвался или ответ не проходит схему — исключение; откатывать
+        уже применённые файлы должен вызывающий код.
+        """
+        attempt = 0
+        while True:
+            parser = FilesStreamParser()
+            emitted = 0
+            try:
+                with self.limiter.acquire(self.provider):
+                    stream = litellm.completion(
+                        model=self.model,
+                        messages=messages,
+                        response_format={"type": "json_object"},
+                        timeout=self.timeout,
+                        stream=True,
+                    )
+                    for chunk in stream:
+                        if getattr(chunk, "usage", None):
+                            self._record_usage(chunk)
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        for item in parser.feed(delta):
+                            on_file(FileChange.model_validate(item))
+                            emitted += 1
+                        if on_progress:
+                            on_progress(len(parser.text))
+                result = schema.model_validate_json(parser.text)
+                metrics.record_call(attempt, failed=False)
+                return result
+            except RETRYABLE_ERRORS as e:
+                delay = backoff_delay(attempt, e)
+                if emitted or attempt >= self.max_retries or delay is None:
+                    metrics.record_call(attempt, failed=True)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+            except Exception:
+                metrics.record_call(attempt, failed=True)
+                raise
+
+    def _record_usage(self, response):
+        """Запомнить расход токенов, включая прочитанные из кеша провайдера."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or getattr(
+            usage, "cache_read_input_tokens", None
+        ) or 0
+        self.last_usage = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "cached_tokens": cached,
+        }
+        metrics.record_usage(**self.last_usage)
+
+    def _complete(self, messages: list[dict]) -> str:
+        """Запрос к LLM с лимитом параллельности, таймаутом и повторами."""
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.acquire(self.provider):
+                    response = litellm.completion(
+                        model=self.model,
+                        messages=messages,
+                        response_format={"type": "json_object"},
+                        timeout=self.timeout,
+                    )
+                metrics.record_call(attempt, failed=False)
+                self._record_usage(response)
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                delay = backoff_delay(attempt, e)
+                if attempt >= self.max_retries or delay is None:
+                    metrics.record_call(attempt, failed=True)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+            except Exception:
+                metrics.record_call(attempt, failed=True)
+                raise
 
-        text = response.choices[0].message.content
-        return schema.model_validate_json(text)
+    async def _acomplete(
+        self, messages: list[dict], model: str | None = None, temperature: float | None = None
+    ) -> str:
+        model = model or self.model
+        provider = self._provider(model) if model != self.model else self.provider
+        options = {} if temperature is None else {"temperature": temperature}
+        attempt = 0
+        while True:
+            try:
+                async with self.limiter.aacquire(provider):
+                    response = await asyncio.wait_for(
+                        litellm.acompletion(
+                            model=model,
+                            messages=messages,
+                            response_format={"type": "json_object"},
+                            timeout=self.timeout,
+                            **options,
+                        ),
+                        self.timeout,
+                    )
+                metrics.record_call(attempt, failed=False)
+                self._record_usage(response)
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                delay = backoff_delay(attempt, e)
+                if attempt >= self.max_retries or delay is None:
+                    metrics.record_call(attempt, failed=True)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+            except Exception:
+                metrics.record_call(attempt, failed=True)
+                raise
@@ -0,0 +1,208 @@
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+
+import litellm
+
+# Ошибки провайдера, после которых запрос имеет смысл повторить
+RETRYABLE_ERRORS = (
+    litellm.RateLimitError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+    TimeoutError,
+)
+
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Шаг опроса семафора из async-кода: семафоры общие с потоками
+ASYNC_POLL_INTERVAL = 0.05
+
+# Окно, за которое считается расход токенов установки для квот
+TENANT_USAGE_WINDOW = 3600.0
+
+# Чей расход токенов сейчас считаем (установка GitHub App задачи)
+usage_tenant: ContextVar[str | None] = ContextVar("usage_tenant", default=None)
+
+
+class LLMMetrics:
+    """Счётчики вызовов LLM на процесс."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self._tenant_usage: defaultdict[str, deque[tuple[float, int]]] = defaultdict(deque)
+
+    def record_usage(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int):
+        tenant = usage_tenant.get()
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+            if tenant:
+                self._tenant_usage[tenant].append(
+                    (time.monotonic(), prompt_tokens + completion_tokens)
+                )
+
+    def tenant_tokens(self, tenant: str) -> int:
+        """Токены установки за последний час."""
+        with self._lock:
+            return self._tenant_tokens(tenant)
+
+    def _tenant_tokens(self, tenant: str) -> int:
+        usage = self._tenant_usage.get(tenant)
+        if not usage:
+            return 0
+        horizon = time.monotonic() - TENANT_USAGE_WINDOW
+        while usage and usage[0][0] < horizon:
+            usage.popleft()
+        return sum(tokens for _, tokens in usage)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.queue_wait_total += seconds
+            self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def record_call(self, retries: int, failed: bool):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            if failed:
+                self.failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "queue_wait_total": round(self.queue_wait_total, 3),
+                "queue_wait_avg": round(self.queue_wait_total / self.calls, 3) if self.calls else 0,
+                "queue_wait_max": round(self.queue_wait_max, 3),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+                "tenant_tokens_last_hour": {
+                    tenant: self._tenant_tokens(tenant) for tenant in list(self._tenant_usage)
+                },
+            }
+
+
+metrics = LLMMetrics()
+
+
+class ConcurrencyLimiter:
+    """Ограничение одновременных запросов к LLM: общее и на провайдера.
+
+    Семафоры потоковые, поэтому лимит общий для синхронных вызовов из
+    рабочих потоков и для async-вызовов в любых event loop.
+    """
+
+    def __init__(self, total: int, per_provider: int):
+        self.per_provider = per_provider
+        self._total = threading.BoundedSemaphore(total)
+        self._providers: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphores(self, provider: str) -> list[threading.BoundedSemaphore]:
+        with self._lock:
+            sem = self._providers.setdefault(
+                provider, threading.BoundedSemaphore(self.per_provider)
+            )
+        # Всегда в одном порядке: провайдер, затем общий — без взаимоблокировок
+        return [sem, self._total]
+
+    @contextmanager
+    def acquire(self, provider: str) -> Iterator[None]:
+        semaphores = self._semaphores(provider)
+        start = time.monotonic()
+        acquired = []
+        try:
+            for sem in semaphores:
+                sem.acquire()
+                acquired.append(sem)
+            metrics.record_wait(time.monotonic() - start)
+            yield
+        finally:
+            for sem in reversed(acquired):
+                sem.release()
+
+    @asynccontextmanager
+    async def aacquire(self, provider: str) -> AsyncIterator[None]:
+        semaphores = self._semaphores(provider)
+        start = time.monotonic()
+        acquired = []
+        try:
+            for sem in semaphores:
+                while not sem.acquire(blocking=False):
+                    await asyncio.sleep(ASYNC_POLL_INTERVAL)
+                acquired.append(sem)
+            metrics.record_wait(time.monotonic() - start)
+            yield
+        finally:
+            for sem in reversed(acquired):
+                sem.release()
+
+
+_limiter: ConcurrencyLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter(total: int, per_provider: int) -> ConcurrencyLimiter:
+    """Общий на процесс ограничитель (создаётся с настройками первого клиента)."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = ConcurrencyLimiter(total, per_provider)
+        return _limiter
+
+
+def retry_after(error: Exception) -> float | None:
+    """Значение заголовка Retry-After из ответа провайдера, в секундах."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(
+        error, "litellm_response_headers", None
+    )
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, error: Exception) -> float | None:
+    """Экспоненциальная задержка с полным джиттером, не меньше Retry-After.
+
+    None — провайдер просит ждать дольше BACKOFF_MAX: повтор не имеет смысла,
+    иначе поток задачи простоял бы, например, час.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        if server_delay > BACKOFF_MAX:
+            return None
+        delay = max(delay, server_delay)
+    return delay
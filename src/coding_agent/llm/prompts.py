@@ -1,38 +1,62 @@
-CODE_GENERATION_PROMPT = """Ты - опытный программист. Тебе нужно реализовать задачу из GitHub Issue.
+# Промпты разбиты на части от стабильных к изменчивым: системная инструкция
+# со схемой, затем контекст репозитория, затем конкретная задача. Так
+# провайдер может переиспользовать закешированный префикс между запусками
+# и итерациями исправлений в одном репозитории.
+
+CODE_SYSTEM_PROMPT = """Ты - опытный программист. Ты реализуешь задачи из GitHub Issue и исправляешь код по замечаниям из ревью.
+
+## Правила
+- Пиши чистый, простой код
+- Следуй стилю проекта
+- Не добавляй лишнего - только то, что просят
+- Если добавляешь/меняешь функциональность - обнови или добавь тесты
+- Для каждого файла указывай полный путь от корня репозитория
+- action: "edit" для точечных правок существующего файла, "create" для новых файлов, "modify" для полной перезаписи, "delete" для удаления
+- Для "edit" заполни edits: search — точный фрагмент текущего файла (с отступами), который встречается в нём ровно один раз, replace — чем его заменить; content оставь пустым
+- Для "create" и "modify" в content пиши полное содержимое файла (не diff)
+- Предпочитай "edit": переписывай файл целиком, только если меняется большая его часть
+- В analysis пиши на русском языке
+- В validation_commands укажи команды проверки изменений из корня репозитория (линтер, тесты), которые есть в проекте; если проверять нечем — оставь пустым
+"""
+
+CONTEXT_PROMPT = """## Контекст репозитория
+{context}
+"""
+
+CODE_GENERATION_PROMPT = """Тебе нужно реализовать задачу из GitHub Issue.
 
 ## Задача
 Заголовок: {issue_title}
 Описание:
 {issue_body}
 
-## Контекст репозитория
-{context}
-
 ## Что нужно сделать
 1. Проанализируй задачу
 2. Определи какие файлы нужно создать или изменить
 3. Напиши код
-
-## Правила
-- Пиши чистый, простой код
-- Следуй стилю проекта
-- Не добавляй лишнего - только то, что просят
-- Если добавляешь/меняешь функциональность - обнови или добавь тесты
-- Для каждого файла указывай полный путь от корня репозитория
-- action: "create" для новых файлов, "modify" для изменения существующих
-- В content пиши полное содержимое файла (не diff)
-- В analysis пиши на русском языке
 """
 
-REVIEW_PROMPT = """Ты - опытный ревьюер кода. Проверь PR на соответствие задаче.
+FIX_PROMPT = """Нужно исправить код по замечаниям из ревью. Контекст репозитория выше — текущий код.
 
 ## Задача из Issue
 Заголовок: {issue_title}
 Описание:
 {issue_body}
 
-## Изменения в PR (diff)
-{diff}
+## Замечания из ревью
+{feedback}
+
+## Что нужно сделать
+1. Проанализируй замечания
+2. Исправь указанные проблемы
+3. Верни исправленные файлы
+
+## Правила
+- Исправляй только то, что указано в замечаниях
+- Не ломай то, что работало
+"""
+
+REVIEW_SYSTEM_PROMPT = """Ты - опытный ревьюер кода. Ты проверяешь PR на соответствие задаче.
 
 ## Что проверить
 1. Код решает задачу из Issue?
@@ -47,28 +71,33 @@ REVIEW_PROMPT = """Ты - опытный ревьюер кода. Проверь
 - Пиши на русском языке
 """
 
-FIX_PROMPT = """Ты - опытный программист. Нужно исправить код по замечаниям из ревью.
-
-## Задача из Issue
+REVIEW_PROMPT = """## Задача из Issue
 Заголовок: {issue_title}
 Описание:
 {issue_body}
 
-## Замечания из ревью
-{feedback}
+## Изменения в PR (diff)
+{diff}
+"""
 
-## Текущий код
-{context}
+REVIEW_INCREMENTAL_NOTE = """Это повторное ревью: ниже только изменения после коммита {base}, до которого PR уже проверен.
 
-## Что нужно сделать
-1. Проанализируй замечания
-2. Исправь указанные проблемы
-3. Верни исправленные файлы
+Замечания прошлого ревью:
+{comments}
 
-## Правила
-- Исправляй только то, что указано в замечаниях
-- Не ломай то, что работало
-- Если нужны тесты — добавь или обнови их
-- В content пиши полное содержимое файла
-- В analysis пиши на русском языке
+Проверь, исправлены ли прошлые замечания и нет ли проблем в новых изменениях.
+approved=true только если прошлые замечания исправлены и новых проблем нет.
+
+"""
+
+REVIEW_CHUNK_NOTE = """Это часть {part} из {total} diff большого PR, остальные части проверяются отдельно.
+Замечания пиши только по коду из этой части; не считай проблемой то, что может быть в других файлах PR.
+Файлы PR:
+{files}
+
+"""
+
+JSON_INSTRUCTION = """
+Ты должен ответить ТОЛЬКО валидным JSON объектом по схеме.
+JSON Schema: {schema}
 """
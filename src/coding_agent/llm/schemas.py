@@ -1,12 +1,24 @@
 from pydantic import BaseModel
 
 
+class Edit(BaseModel):
+    """Точечная правка: фрагмент `search` заменяется на `replace`."""
+
+    search: str
+    replace: str
+
+
 class FileChange(BaseModel):
-    """Изменение одного файла."""
+    """Изменение одного файла.
+
+    Для create/modify в `content` полное содержимое файла, для edit —
+    список правок в `edits`.
+    """
 
     path: str
     action: str
     content: str = ""
+    edits: list[Edit] = []
 
 
 class CodeGenerationResult(BaseModel):
@@ -15,6 +27,8 @@ class CodeGenerationResult(BaseModel):
     analysis: str
     files: list[FileChange]
     commit_message: str
+    # Команды проверки из корня репозитория (линтер, тесты)
+    validation_commands: list[str] = []
 
 
 class ReviewComment(BaseModel):
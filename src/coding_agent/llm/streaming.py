@@ -0,0 +1,62 @@
+import json
+
+
+class FilesStreamParser:
+    """Инкрементальный разбор массива `files` из потока JSON-ответа.
+
+    Текст подаётся кусками по мере генерации; `feed` возвращает элементы
+    массива `files` верхнего уровня, которые уже пришли целиком. Остальной
+    ответ не разбирается — его целиком проверяет схема в конце потока.
+    """
+
+    def __init__(self, key: str = "files"):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._in_array = False
+        self._item_start: int | None = None
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.text += chunk
+        text = self.text
+        items = []
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # Последняя строка перед значением на верхнем уровне — его ключ
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._depth == 2 and self._last_string == self.key:
+                    self._in_array = True
+                elif ch == "{" and self._in_array and self._depth == 3:
+                    self._item_start = i
+            elif ch in "}]":
+                closes_item = self._in_array and self._depth == 3 and self._item_start is not None
+                if ch == "}" and closes_item:
+                    items.append(json.loads(text[self._item_start:i + 1]))
+                    self._item_start = None
+                elif ch == "]" and self._in_array and self._depth == 2:
+                    self._in_array = False
+                self._depth -= 1
+
+        self._pos = len(text)
+        return items
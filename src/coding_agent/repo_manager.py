@@ -1,17 +1,245 @@
+import fcntl
+import hashlib
+import os
+import re
 import shutil
 import tempfile
+import threading
 from pathlib import Path
 
 from git import Repo
 
+# Refspec для обновления зеркала: только ветки и теги, без refs/pull/*
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+DEFAULT_CACHE_SIZE = 5 * 1024**3
+
+# Порог `git gc --auto` для зеркал (как у git по умолчанию): в самих зеркалах
+# gc.auto=0, gc запускаем сами, когда зеркало никем не используется
+MIRROR_GC_AUTO = 6700
+
+# Рабочие копии и worktree кандидатов: <вид>-<pid>-<случайный суффикс>
+WORKDIR_RE = re.compile(r"(agent|candidate)-(\d+)-")
+
 
 class RepoManager:
-    def clone(self, repo_url: str, token: str) -> Path:
-        tmpdir = tempfile.mkdtemp(prefix="agent-")
+    """Выдаёт рабочие копии репозиториев.
+
+    Без `cache_dir` каждая задача клонирует репозиторий заново (depth=1).
+    С `cache_dir` на каждый репозиторий держится bare-зеркало, которое
+    обновляется инкрементальным fetch, а задача получает `git clone --shared`
+    поверх его объектов — без повторного скачивания истории.
+    """
+
+    def __init__(
+        self, cache_dir: str | Path | None = None, max_cache_size: int = DEFAULT_CACHE_SIZE
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_cache_size = max_cache_size
+        # Рабочая копия -> открытый use-lock её зеркала
+        self._leases: dict[Path, int] = {}
+        self._leases_lock = threading.Lock()
+        # Выданные и ещё не удалённые рабочие копии -> поток, который с ней работает
+        self._workdirs: dict[Path, threading.Thread] = {}
+
+    def clone(self, repo_url: str, token: str, ref: str | None = None) -> Path:
         auth_url = repo_url.replace("https://", f"https://x-access-token:{token}@")
-        Repo.clone_from(auth_url, tmpdir, depth=1)
-        return Path(tmpdir)
+        if self.cache_dir is None:
+            path = self._make_workdir()
+            kwargs = {"branch": ref} if ref else {}
+            try:
+                Repo.clone_from(auth_url, str(path), depth=1, **kwargs)
+            except Exception:
+                self.cleanup(path)
+                raise
+            return path
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        mirror = self._mirror_path(repo_url)
+
+        # Пока задача держит shared-lock, зеркало не будет вытеснено.
+        # Эксклюзивный lock удался — зеркалом сейчас никто не пользуется
+        use_fd = self._open_lock(mirror, "use")
+        try:
+            fcntl.flock(use_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            idle = True
+        except BlockingIOError:
+            fcntl.flock(use_fd, fcntl.LOCK_SH)
+            idle = False
+        path = None
+        try:
+            self._update_mirror(mirror, repo_url, auth_url, use_fd if idle else None)
+            path = self._make_workdir()
+            kwargs = {"branch": ref} if ref else {}
+            Repo.clone_from(str(mirror), str(path), shared=True, **kwargs)
+        except Exception:
+            os.close(use_fd)
+            if path is not None:
+                self.cleanup(path)
+            raise
+
+        with self._leases_lock:
+            self._leases[path] = use_fd
+        self._evict()
+        return path
 
     def cleanup(self, path: Path):
         if path.exists():
             shutil.rmtree(path)
+        with self._leases_lock:
+            self._workdirs.pop(path, None)
+            use_fd = self._leases.pop(path, None)
+        if use_fd is not None:
+            os.close(use_fd)
+
+    def cleanup_all(self) -> int:
+        """Удалить оставшиеся рабочие копии (при остановке сервера). Возвращает их число.
+
+        Копии потоков, которые ещё работают (задача не завершилась до остановки),
+        не трогаем: их удалит сама задача.
+        """
+        with self._leases_lock:
+            paths = [path for path, owner in self._workdirs.items() if not owner.is_alive()]
+        for path in paths:
+            self.cleanup(path)
+        return len(paths)
+
+    def sweep_stale(self) -> int:
+        """Удалить рабочие копии, оставшиеся от упавших процессов (при старте сервера).
+
+        Возвращает их число. Каталог чужой, если процесс из его имени уже
+        не существует; копии живых процессов, в том числе своего, не трогаем.
+        """
+        removed = 0
+        for path in Path(tempfile.gettempdir()).iterdir():
+            match = WORKDIR_RE.match(path.name)
+            if not match or not path.is_dir():
+                continue
+            pid = int(match.group(2))
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def _make_workdir(self) -> Path:
+        path = Path(tempfile.mkdtemp(prefix=workdir_prefix("agent")))
+        with self._leases_lock:
+            self._workdirs[path] = threading.current_thread()
+        return path
+
+    def _mirror_path(self, repo_url: str) -> Path:
+        match = re.search(r"github\.com[/:](.+?)(?:\.git)?/?$", repo_url)
+        name = match.group(1) if match else repo_url
+        slug = re.sub(r"[^\w.-]", "__", name)
+        digest = hashlib.sha256(repo_url.encode()).hexdigest()[:8]
+        return self.cache_dir / f"{slug}-{digest}.git"
+
+    def _open_lock(self, mirror: Path, kind: str) -> int:
+        lock_path = mirror.with_name(f"{mirror.name}.{kind}")
+        return os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _update_mirror(
+        self, mirror: Path, repo_url: str, auth_url: str, idle_fd: int | None = None
+    ):
+        """Создать зеркало или догнать его до remote. Один fetch на зеркало за раз.
+
+        `idle_fd` — эксклюзивный use-lock: зеркалом никто не пользуется, и после
+        fetch можно упаковать объекты. Под fetch-lock он понижается до shared,
+        так что вытеснение не вклинится между ними.
+        """
+        fetch_fd = self._open_lock(mirror, "lock")
+        try:
+            fcntl.flock(fetch_fd, fcntl.LOCK_EX)
+            if not (mirror / "HEAD").exists():
+                shutil.rmtree(mirror, ignore_errors=True)
+                repo = Repo.clone_from(auth_url, str(mirror), bare=True)
+                # Токен не храним в конфиге зеркала
+                repo.git.remote("set-url", "origin", repo_url)
+                # Объекты зеркала используются рабочими копиями через alternates:
+                # gc после fetch мог бы удалить нужные им объекты
+                repo.git.config("gc.auto", "0")
+            else:
+                repo = Repo(str(mirror))
+                repo.git.fetch(auth_url, *MIRROR_REFSPECS, prune=True)
+                if idle_fd is not None:
+                    # Иначе каждый fetch копит loose-объекты и пачки без предела
+                    repo.git.execute(
+                        ["git", "-c", f"gc.auto={MIRROR_GC_AUTO}", "gc", "--auto", "--quiet"]
+                    )
+            if idle_fd is not None:
+                fcntl.flock(idle_fd, fcntl.LOCK_SH)
+            os.utime(mirror)
+            _size_path(mirror).write_text(str(_dir_size(mirror)))
+        finally:
+            os.close(fetch_fd)
+
+    def _evict(self):
+        """Удалять давно не использованные зеркала, пока кеш больше лимита.
+
+        Размер зеркала записывается после каждого обновления, поэтому здесь
+        дерево каталогов не обходится.
+        """
+        mirrors = [p for p in self.cache_dir.glob("*.git") if p.is_dir()]
+        sizes = {p: _mirror_size(p) for p in mirrors}
+        total = sum(sizes.values())
+        if total <= self.max_cache_size:
+            return
+
+        for mirror in sorted(mirrors, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_cache_size:
+                break
+            use_fd = self._open_lock(mirror, "use")
+            fetch_fd = self._open_lock(mirror, "lock")
+            try:
+                # Зеркало занято задачей или fetch — пропускаем
+                fcntl.flock(use_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fetch_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            else:
+                shutil.rmtree(mirror, ignore_errors=True)
+                _size_path(mirror).unlink(missing_ok=True)
+                total -= sizes[mirror]
+            finally:
+                os.close(fetch_fd)
+                os.close(use_fd)
+
+
+def workdir_prefix(kind: str) -> str:
+    """Префикс временного каталога с PID: по нему `sweep_stale` узнаёт брошенные копии."""
+    return f"{kind}-{os.getpid()}-"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def _size_path(mirror: Path) -> Path:
+    return mirror.with_name(f"{mirror.name}.size")
+
+
+def _mirror_size(mirror: Path) -> int:
+    """Записанный размер зеркала; без записи (старый кеш) — посчитать."""
+    try:
+        return int(_size_path(mirror).read_text())
+    except (OSError, ValueError):
+        return _dir_size(mirror)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
@@ -1,15 +1,24 @@
+import asyncio
 import hashlib
 import hmac
 import os
+import signal
+import threading
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from rich.console import Console
 
 from coding_agent.agents.code_agent import CodeAgent
 from coding_agent.agents.reviewer import ReviewerAgent
 from coding_agent.config import Settings
-from coding_agent.github.app_auth import GitHubAppAuth
+from coding_agent.github import transport
+from coding_agent.github.app_auth import GitHubAppAuth, installation_key
+from coding_agent.jobs import JobDeferred, JobQueue, JobRejected
+from coding_agent.llm.client import response_cache
+from coding_agent.llm.limits import metrics as llm_metrics
+from coding_agent.llm.limits import usage_tenant
 from coding_agent.repo_manager import RepoManager
 
 console = Console()
@@ -19,13 +28,67 @@ app_auth = GitHubAppAuth(
     app_id=os.getenv("GITHUB_APP_ID", ""),
     private_key=os.getenv("GITHUB_PRIVATE_KEY", "").replace("\\n", "\n"),
 )
-repo_manager = RepoManager()
+repo_manager = RepoManager(settings.repo_cache_dir, settings.repo_cache_max_size)
+job_queue = JobQueue(
+    workers=settings.worker_count,
+    tenant_concurrency=settings.tenant_max_concurrency,
+    tenant_weights=settings.tenant_weights,
+    token_quota=settings.tenant_token_quota,
+    token_usage=llm_metrics.tenant_tokens,
+    max_pending=settings.max_queued_jobs,
+)
+
+# Примерное число запросов к GitHub API на задачу: с меньшим остатком квоты
+# задача откладывается до сброса, а не падает посреди работы
+JOB_REQUEST_COST = {"issue": 30, "review": 15, "fix": 30}
+
+
+def install_drain_handlers(delay: float):
+    """Сначала закрыть очередь, а остановку uvicorn передать ему через `delay` секунд.
+
+    Пока uvicorn не остановился, /health отвечает draining и балансировщик
+    успевает убрать сервер. Повторный сигнал останавливает сразу.
+    """
+    # Обработчики сигналов ставятся только из главного потока
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        original = signal.getsignal(sig)
+        if not callable(original):
+            continue
+
+        def handle(signum, frame, original=original):
+            if job_queue.load()["draining"] or delay <= 0:
+                original(signum, frame)
+                return
+            console.print("[yellow]Сигнал остановки: новые задачи не принимаются[/yellow]")
+            job_queue.begin_drain()
+            timer = threading.Timer(delay, original, (signum, None))
+            timer.daemon = True
+            timer.start()
+
+        signal.signal(sig, handle)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    stale = await asyncio.to_thread(repo_manager.sweep_stale)
+    if stale:
+        console.print(f"[yellow]Удалено брошенных рабочих копий: {stale}[/yellow]")
+    job_queue.start()
+    install_drain_handlers(settings.shutdown_delay)
     console.print("[green]Сервер запущен[/green]")
     yield
+    console.print("[yellow]Остановка: ждём выполняющиеся задачи[/yellow]")
+    # drain блокирует на время ожидания задач — не в цикле событий
+    unfinished = await asyncio.to_thread(job_queue.drain, settings.shutdown_timeout)
+    for job in unfinished:
+        console.print(f"[red]Задача {job.kind} {job.key} не завершилась до остановки[/red]")
+    # Рабочие копии незавершённых задач остаются: их поток ещё может пушить
+    removed = await asyncio.to_thread(repo_manager.cleanup_all)
+    if removed:
+        console.print(f"[yellow]Удалено рабочих копий: {removed}[/yellow]")
+    transport.close()
     console.print("[yellow]Сервер остановлен[/yellow]")
 
 
@@ -49,23 +112,73 @@ async def webhook(request: Request):
         raise HTTPException(status_code=401, detail="Invalid signature")
 
     event = request.headers.get("X-GitHub-Event")
+    # GitHub повторяет доставку с тем же ID — задачу второй раз не ставим
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    duplicate = job_queue.get_delivery(delivery_id)
+    if duplicate:
+        return {"status": "duplicate", "job_id": duplicate.id}
+
     data = await request.json()
+    repo_full_name = data.get("repository", {}).get("full_name", "")
 
+    kind = handler = None
     if event == "issues" and data.get("action") == "labeled":
         if data["label"]["name"] == "agent":
-            await handle_issue(data)
+            kind, handler, number = "issue", handle_issue, data["issue"]["number"]
 
     if event == "pull_request" and data.get("action") in ["opened", "synchronize"]:
-        await handle_pr_review(data)
+        kind, handler, number = "review", handle_pr_review, data["pull_request"]["number"]
 
     if event == "pull_request_review":
         if data["review"]["state"] == "changes_requested":
-            await handle_fix(data)
+            kind, handler, number = "fix", handle_fix, data["pull_request"]["number"]
+
+    if kind is None:
+        return {"status": "ignored"}
+
+    tenant = str(data["installation"]["id"])
+    # Серия push'ей в один PR схлопывается: ревью получит только последний head
+    try:
+        job = job_queue.submit(
+            kind,
+            f"{repo_full_name}#{number}",
+            lambda: run_for_tenant(tenant, handler, data),
+            delivery_id=delivery_id,
+            coalesce=settings.webhook_coalesce_window,
+            tenant=tenant,
+        )
+    except JobRejected as e:
+        # GitHub повторит доставку позже; отказ сейчас лучше, чем бесконечная очередь
+        console.print(f"[yellow]Событие отклонено: {e}[/yellow]")
+        return JSONResponse(
+            status_code=503,
+            content={"status": "rejected", "reason": str(e)},
+            headers={"Retry-After": str(settings.webhook_retry_after)},
+        )
+    return JSONResponse(status_code=202, content={"status": "queued", "job_id": job.id})
+
+
+def run_for_tenant(tenant: str, handler, data: dict):
+    """Выполнить обработчик, относя расход токенов LLM к установке."""
+    token = usage_tenant.set(tenant)
+    try:
+        handler(data)
+    finally:
+        usage_tenant.reset(token)
+
 
-    return {"status": "ok"}
+def get_job_token(installation_id: int, kind: str) -> str:
+    """Токен установки; если квоты API на задачу не хватит — отложить её до клона и LLM."""
+    token = app_auth.get_installation_token(installation_id)
+    delay = transport.get_rate_limiter().job_delay(
+        installation_key(installation_id), JOB_REQUEST_COST[kind]
+    )
+    if delay:
+        raise JobDeferred(delay, "мало квоты GitHub API")
+    return token
 
 
-async def handle_issue(data: dict):
+def handle_issue(data: dict):
     installation_id = data["installation"]["id"]
     repo_full_name = data["repository"]["full_name"]
     repo_url = data["repository"]["clone_url"]
@@ -73,7 +186,7 @@ async def handle_issue(data: dict):
 
     console.print(f"[blue]Issue #{issue_number} в {repo_full_name}[/blue]")
 
-    token = app_auth.get_installation_token(installation_id)
+    token = get_job_token(installation_id, "issue")
     repo_path = repo_manager.clone(repo_url, token)
 
     try:
@@ -88,25 +201,27 @@ async def handle_issue(data: dict):
         repo_manager.cleanup(repo_path)
 
 
-async def handle_pr_review(data: dict):
+def handle_pr_review(data: dict):
     installation_id = data["installation"]["id"]
     repo_full_name = data["repository"]["full_name"]
     pr_number = data["pull_request"]["number"]
 
     console.print(f"[blue]Ревью PR #{pr_number} в {repo_full_name}[/blue]")
 
-    token = app_auth.get_installation_token(installation_id)
+    token = get_job_token(installation_id, "review")
 
     agent_settings = Settings()
     agent_settings.github_token = token
     agent_settings.github_repository = repo_full_name
+    # Токен установки не может прочитать /user — логин бота берём у App
+    agent_settings.github_bot_login = settings.github_bot_login or app_auth.get_bot_login()
 
     reviewer = ReviewerAgent(agent_settings)
-    result = reviewer.review(pr_number)
-    console.print(f"[green]Ревью: {'approved' if result.approved else 'changes requested'}[/green]")
+    approved = reviewer.review(pr_number)
+    console.print(f"[green]Ревью: {'approved' if approved else 'changes requested'}[/green]")
 
 
-async def handle_fix(data: dict):
+def handle_fix(data: dict):
     installation_id = data["installation"]["id"]
     repo_full_name = data["repository"]["full_name"]
     repo_url = data["repository"]["clone_url"]
@@ -114,7 +229,7 @@ async def handle_fix(data: dict):
 
     console.print(f"[blue]Fix PR #{pr_number} в {repo_full_name}[/blue]")
 
-    token = app_auth.get_installation_token(installation_id)
+    token = get_job_token(installation_id, "fix")
     repo_path = repo_manager.clone(repo_url, token)
 
     try:
@@ -128,6 +243,30 @@ async def handle_fix(data: dict):
         repo_manager.cleanup(repo_path)
 
 
+@app.get("/jobs")
+async def jobs():
+    return job_queue.snapshot()
+
+
+@app.get("/metrics")
+async def metrics():
+    llm_cache = response_cache(settings)
+    return {
+        "llm": llm_metrics.snapshot(),
+        "github_cache": transport.cache_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else {},
+        "github_rate_limit": transport.rate_limit_stats(),
+        "tenants": job_queue.snapshot()["tenants"],
+    }
+
+
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    load = job_queue.load()
+    if load["draining"]:
+        status = "draining"
+    elif load["saturated"]:
+        status = "saturated"
+    else:
+        return {"status": "healthy", **load}
+    return JSONResponse(status_code=503, content={"status": status, **load})
@@ -0,0 +1,8 @@
+from coding_agent.validation.runner import (
+    CommandResult,
+    ValidationReport,
+    ValidationRunner,
+    allowed_suggestions,
+)
+
+__all__ = ["ValidationRunner", "ValidationReport", "CommandResult", "allowed_suggestions"]
@@ -0,0 +1,306 @@
+"""Проверка изменений командами проекта (линтер, тесты) до пуша.
+
+Команды запускаются параллельно в отдельных процессах с лимитами CPU,
+памяти и времени и с очищенным окружением (без токенов GitHub и ключей
+LLM). Вывод печатается по мере выполнения. Результат запоминается по
+хешу рабочего дерева и команде: неизменённое дерево не проверяется повторно.
+"""
+
+import hashlib
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from rich.console import Console
+from rich.markup import escape
+
+console = Console()
+
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_MEMORY_LIMIT = 2 * 1024**3
+
+# Переменные окружения, которые видят команды проверки; остальные (токены, ключи) — нет
+ENV_ALLOWLIST = ("PATH", "HOME", "LANG", "LC_ALL", "TERM", "TMPDIR", "VIRTUAL_ENV")
+
+# Сколько результатов проверок помнить в процессе
+CACHE_SIZE = 1000
+
+# Команды, которые можно взять из ответа LLM: произвольную строку оттуда
+# выполнять нельзя — её текст может подсказать содержимое Issue
+SUGGESTED_COMMANDS_ALLOWLIST = frozenset({
+    "ruff check .",
+    "pytest",
+    "pytest -q",
+    "python -m pytest",
+    "python -m pytest -q",
+    "npm test",
+})
+
+
+def allowed_suggestions(commands: list[str]) -> list[str]:
+    """Предложенные LLM команды из списка разрешённых, без повторов."""
+    allowed = []
+    for command in commands:
+        command = " ".join(command.split())
+        if command not in SUGGESTED_COMMANDS_ALLOWLIST:
+            console.print(f"[yellow]Пропускаю команду LLM: {escape(command)}[/yellow]")
+        elif command not in allowed:
+            allowed.append(command)
+    return allowed
+
+
+@dataclass
+class CommandResult:
+    command: str
+    returncode: int
+    output: str
+    duration: float
+    timed_out: bool = False
+    cancelled: bool = False
+    cached: bool = False
+
+    @property
+    def passed(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+
+@dataclass
+class ValidationReport:
+    results: list[CommandResult]
+
+    @property
+    def passed(self) -> bool:
+        return all(r.passed for r in self.results)
+
+    @property
+    def failed(self) -> list[CommandResult]:
+        return [r for r in self.results if not r.passed]
+
+    def feedback(self, budget: int) -> str:
+        """Вывод упавших команд для LLM, не длиннее `budget` символов.
+
+        Бюджет делится поровну между упавшими командами; от вывода каждой
+        остаётся конец — там обычно итог и сами ошибки.
+        """
+        failed = self.failed
+        if not failed:
+            return ""
+        share = budget // len(failed)
+        sections = []
+        for r in failed:
+            status = f"таймаут {r.duration:.0f} с" if r.timed_out else f"код {r.returncode}"
+            output = r.output
+            if len(output) > share:
+                output = "...\n" + output[-share:]
+            sections.append(f"### `{r.command}` ({status})\n```\n{output}\n```")
+        return "## Проверки не прошли\n\n" + "\n\n".join(sections)
+
+
+class ResultCache:
+    """LRU результатов проверок: (хеш дерева, команда) -> результат."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CommandResult] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tree: str, command: str) -> str:
+        return hashlib.sha256(f"{tree}\0{command}".encode()).hexdigest()
+
+    def get(self, key: str) -> CommandResult | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: CommandResult):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Общий на процесс: между итерациями исправлений в сервере дерево часто не меняется
+_cache = ResultCache()
+
+
+class ValidationRunner:
+    def __init__(
+        self,
+        repo_path: str | Path,
+        timeout: float = DEFAULT_TIMEOUT,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        cache: ResultCache | None = None,
+    ):
+        self.repo_path = Path(repo_path)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cache = cache if cache is not None else _cache
+        self._processes: set[subprocess.Popen] = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Остановить выполняющиеся команды и не запускать новые."""
+        with self._lock:
+            self._cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            _kill_group(process)
+
+    def run(self, commands: list[str]) -> ValidationReport:
+        """Выполнить команды параллельно; результаты в порядке команд."""
+        if not commands:
+            return ValidationReport([])
+        tree = tree_hash(self.repo_path)
+        with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+            results = list(pool.map(lambda c: self._run_cached(tree, c), commands))
+        return ValidationReport(results)
+
+    def _run_cached(self, tree: str | None, command: str) -> CommandResult:
+        key = ResultCache.make_key(tree, command) if tree else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                mark = "[green]ok[/green]" if cached.passed else "[red]ошибка[/red]"
+                console.print(f"[dim]{escape(command)}: из кеша[/dim] {mark}")
+                return replace(cached, cached=True)
+
+        result = self._run(command)
+        # Таймаут мог быть случайным (нагрузка) — такой результат не запоминаем
+        if key and not result.timed_out and not result.cancelled:
+            self.cache.put(key, result)
+        return result
+
+    def _run(self, command: str) -> CommandResult:
+        start = time.monotonic()
+        with self._lock:
+            if self._cancelled:
+                return CommandResult(command, -1, "", 0.0, cancelled=True)
+            console.print(f"[blue]$ {escape(command)}[/blue]")
+            process = self._spawn(command)
+            self._processes.add(process)
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            _kill_group(process)
+
+        timer = threading.Timer(self.timeout, kill)
+        timer.start()
+        lines = []
+        try:
+            for raw in process.stdout:
+                line = raw.decode("utf-8", errors="replace").rstrip("\n")
+                lines.append(line)
+                console.print(f"[dim]{escape(command)} | {escape(line)}[/dim]")
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+            with self._lock:
+                self._processes.discard(process)
+
+        result = CommandResult(
+            command=command,
+            returncode=returncode,
+            output="\n".join(lines),
+            duration=time.monotonic() - start,
+            timed_out=timed_out.is_set(),
+            cancelled=self._cancelled,
+        )
+        mark = "[green]ok[/green]" if result.passed else "[red]ошибка[/red]"
+        console.print(f"[dim]{escape(command)}: {result.duration:.1f} с[/dim] {mark}")
+        return result
+
+    def _spawn(self, command: str) -> subprocess.Popen:
+        return subprocess.Popen(
+            self._limited(command),
+            shell=os.name != "posix",
+            cwd=self.repo_path,
+            env=_scrubbed_env(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            # Своя группа процессов: по таймауту убиваем и всех потомков
+            start_new_session=True,
+        )
+
+    def _limited(self, command: str) -> str | list[str]:
+        """Команда под лимитами CPU и памяти.
+
+        Лимиты ставит оболочка-обёртка через ulimit, а не preexec_fn: тот
+        выполняется между fork и exec и небезопасен в процессе с потоками.
+        """
+        if os.name != "posix":  # Windows: без лимитов ресурсов
+            return command
+        limits = [f"ulimit -t {int(self.timeout) + 1}"]
+        if self.memory_limit:
+            limits.append(f"ulimit -v {self.memory_limit // 1024}")
+        # Команда передаётся аргументом, а не подставляется в текст скрипта
+        script = " && ".join(limits) + ' && exec /bin/sh -c "$1"'
+        return ["/bin/sh", "-c", script, "sh", command]
+
+
+def tree_hash(repo_path: str | Path) -> str | None:
+    """Хеш рабочего дерева вместе с незакоммиченными изменениями и новыми файлами.
+
+    Файлы из .gitignore не учитываются. Считается через временную копию
+    индекса, настоящий индекс не меняется.
+    """
+    repo_path = Path(repo_path)
+    # В worktree .git — файл-ссылка, индекс лежит в каталоге, который назовёт git
+    if not (repo_path / ".git").exists():
+        return None
+    ceiling = {"GIT_CEILING_DIRECTORIES": str(repo_path.resolve().parent)}
+    try:
+        rev_parse = subprocess.run(
+            ["git", "rev-parse", "--absolute-git-dir"],
+            cwd=repo_path,
+            env={**os.environ, **ceiling},
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    git_dir = Path(rev_parse.stdout.decode().strip())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        index = Path(tmpdir) / "index"
+        if (git_dir / "index").exists():
+            shutil.copyfile(git_dir / "index", index)
+        env = {**os.environ, **ceiling, "GIT_INDEX_FILE": str(index)}
+        try:
+            subprocess.run(
+                ["git", "add", "-A"], cwd=repo_path, env=env, capture_output=True, check=True
+            )
+            result = subprocess.run(
+                ["git", "write-tree"], cwd=repo_path, env=env, capture_output=True, check=True
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return result.stdout.decode().strip()
+
+
+def _kill_group(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _scrubbed_env() -> dict[str, str]:
+    env = {name: os.environ[name] for name in ENV_ALLOWLIST if name in os.environ}
+    env["CI"] = "true"
+    return env
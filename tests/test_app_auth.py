@@ -0,0 +1,72 @@
+import threading
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from coding_agent.github import app_auth
+from coding_agent.github.app_auth import TOKEN_REFRESH_MARGIN, GitHubAppAuth
+
+
+def make_auth(lifetimes: list[float]) -> tuple[GitHubAppAuth, list[int]]:
+    """Авторизация с подменённым запросом токена: i-й токен живёт lifetimes[i] секунд."""
+    auth = GitHubAppAuth("123", "")
+    calls = []
+
+    def fetch(installation_id):
+        calls.append(installation_id)
+        time.sleep(0.05)
+        return f"token-{len(calls)}", time.time() + lifetimes[len(calls) - 1]
+
+    auth._fetch_installation_token = fetch
+    return auth, calls
+
+
+class TestInstallationTokens:
+    def test_token_cached(self):
+        auth, calls = make_auth([3600])
+        assert auth.get_installation_token(1) == "token-1"
+        assert auth.get_installation_token(1) == "token-1"
+        assert calls == [1]
+
+    def test_refreshed_before_expiry(self):
+        # Токен ещё действителен, но истечёт раньше запаса — берём новый
+        auth, calls = make_auth([TOKEN_REFRESH_MARGIN - 10, 3600])
+        assert auth.get_installation_token(1) == "token-1"
+        assert auth.get_installation_token(1) == "token-2"
+        assert calls == [1, 1]
+
+    def test_concurrent_requests_share_one_fetch(self):
+        auth, calls = make_auth([3600, 3600])
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(auth.get_installation_token(1)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert tokens == ["token-1"] * 5
+        assert calls == [1]
+
+
+class TestJWT:
+    def test_jwt_reused_until_refresh_margin(self, monkeypatch):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        auth = GitHubAppAuth("123", pem)
+
+        token = auth.get_jwt()
+        assert auth.get_jwt() == token
+        claims = jwt.decode(token, key.public_key(), algorithms=["RS256"])
+        assert claims["iss"] == "123"
+
+        now = time.time()
+        monkeypatch.setattr(app_auth.time, "time", lambda: now + app_auth.JWT_LIFETIME - 30)
+        assert auth.get_jwt() != token
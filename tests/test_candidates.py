@@ -0,0 +1,120 @@
+import asyncio
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+from git import Repo
+
+from coding_agent.agents.code_agent import CodeAgent
+from coding_agent.config import Settings
+from coding_agent.llm import CodeGenerationResult, FileChange
+from coding_agent.validation import ValidationRunner
+
+
+class FakeLLM:
+    """Варианты по моделям: (задержка, файл, который создаёт вариант)."""
+
+    def __init__(self, candidates: dict[str, tuple[float, str]]):
+        self.candidates = candidates
+        self.temperatures = []
+        self.variants = []
+
+    async def agenerate_code(self, issue_title, issue_body, context, model, temperature, variant):
+        self.temperatures.append(temperature)
+        self.variants.append(variant)
+        delay, path = self.candidates[model]
+        await asyncio.sleep(delay)
+        return CodeGenerationResult(
+            analysis=model,
+            files=[FileChange(path=path, action="create", content="x\n")],
+            commit_message=f"feat: {model}",
+        )
+
+
+@pytest.fixture
+def repo():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir)
+        subprocess.run(["git", "init", "-q"], cwd=path, check=True)
+        (path / "README.md").write_text("readme\n")
+        git_repo = Repo(path)
+        git_repo.index.add(["README.md"])
+        git_repo.index.commit("init")
+        yield path
+
+
+def make_agent(repo: Path, candidates: dict[str, tuple[float, str]]) -> CodeAgent:
+    agent = CodeAgent.__new__(CodeAgent)
+    agent.settings = Settings(
+        candidate_count=len(candidates),
+        candidate_models=list(candidates),
+        validation=True,
+        validation_commands=["test -f ok.txt"],
+    )
+    agent.repo_path = repo
+    agent.git_repo = Repo(repo)
+    agent.llm = FakeLLM(candidates)
+    return agent
+
+
+class TestBestCandidate:
+    def test_first_passing_wins_and_rest_cancelled(self, repo):
+        candidates = {
+            "fast-bad": (0.0, "bad.txt"),
+            "good": (0.2, "ok.txt"),
+            "slow": (10.0, "ok.txt"),
+        }
+        agent = make_agent(repo, candidates)
+        start = time.monotonic()
+        result = agent._best_candidate("title", "body", "context")
+        assert result.analysis == "good"
+        assert time.monotonic() - start < 5
+        # Рабочая копия не тронута, временные worktree удалены
+        assert not (repo / "ok.txt").exists()
+        assert len(agent.git_repo.git.worktree("list").splitlines()) == 1
+
+    def test_least_failing_when_none_pass(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt"), "b": (0.1, "b.txt")})
+        result = agent._best_candidate("title", "body", "context")
+        assert result.analysis == "a"
+
+    def test_temperature_not_sent_unless_configured(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt"), "b": (0.0, "ok.txt")})
+        agent._best_candidate("title", "body", "context")
+        assert agent.llm.temperatures == [None, None]
+
+    def test_configured_temperatures_cycled(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt"), "b": (0.1, "b.txt")})
+        agent.settings.candidate_temperatures = [0.3]
+        agent._best_candidate("title", "body", "context")
+        assert agent.llm.temperatures == [0.3, 0.3]
+
+    def test_single_generation_without_validation(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt"), "b": (0.0, "b.txt")})
+        assert agent._use_candidates()
+        agent.settings.validation = False
+        assert not agent._use_candidates()
+
+    def test_single_generation_when_candidates_identical(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt")})
+        agent.settings.candidate_count = 3
+        assert not agent._use_candidates()
+        agent.settings.candidate_temperatures = [0.2, 0.8]
+        assert agent._use_candidates()
+
+    def test_each_candidate_has_own_cache_variant(self, repo):
+        agent = make_agent(repo, {"a": (0.0, "a.txt"), "b": (0.1, "b.txt")})
+        agent._best_candidate("title", "body", "context")
+        assert sorted(agent.llm.variants) == [0, 1]
+
+    def test_winner_validation_reused(self, repo):
+        agent = make_agent(repo, {"bad": (0.0, "bad.txt"), "good": (0.1, "ok.txt")})
+        result = agent._best_candidate("title", "body", "context")
+        for file_change in result.files:
+            agent._apply_file_change(file_change)
+        # Дерево победителя уже проверено в его worktree
+        report = ValidationRunner(repo).run(["test -f ok.txt"])
+        assert report.passed
+        assert report.results[0].cached
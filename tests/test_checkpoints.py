@@ -0,0 +1,178 @@
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from git import Repo
+
+from coding_agent.agents.code_agent import CodeAgent
+from coding_agent.checkpoints import Checkpoint, CheckpointStore, IterationState
+from coding_agent.config import Settings
+from coding_agent.github.client import PRContext
+from coding_agent.llm import CodeGenerationResult, FileChange
+
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield CheckpointStore(Path(tmpdir) / "checkpoints.sqlite")
+
+
+def make_result():
+    return CodeGenerationResult(
+        analysis="Добавил функцию",
+        files=[FileChange(path="a.py", action="create", content="x = 1\n")],
+        commit_message="feat: a",
+    )
+
+
+class TestCheckpointStore:
+    def test_roundtrip(self, store):
+        assert store.load("o/r", "issue#1", 1, "abc") is None
+        checkpoint = Checkpoint("o/r", "issue#1", "abc", 1, "digest", make_result())
+        store.save(checkpoint)
+
+        loaded = store.load("o/r", "issue#1", 1, "abc")
+        assert loaded.result == checkpoint.result
+        assert loaded.context_digest == "digest"
+        assert loaded.commit_sha is None
+        assert store.load("o/r", "issue#1", 1, "def") is None
+        assert store.load("o/r", "issue#1", 2, "abc") is None
+
+    def test_found_by_pushed_commit(self, store):
+        store.save(Checkpoint("o/r", "pr#7", "abc", 2, "d", make_result(), commit_sha="fff"))
+        loaded = store.load("o/r", "pr#7", 2, "fff")
+        assert loaded.head_sha == "abc"
+        assert loaded.commit_sha == "fff"
+
+    def test_stages_overwrite(self, store):
+        checkpoint = Checkpoint("o/r", "issue#1", "abc", 1, "d", make_result())
+        store.save(checkpoint)
+        checkpoint.commit_sha = "fff"
+        checkpoint.pr_url = "https://github.com/o/r/pull/2"
+        store.save(checkpoint)
+        assert store.load("o/r", "issue#1", 1, "abc").pr_url == checkpoint.pr_url
+
+    def test_iteration_state(self, store):
+        assert store.get_iteration("o/r", 2) is None
+        store.set_iteration("o/r", 2, IterationState(issue=1, iteration=1, max_iterations=3))
+        store.set_iteration("o/r", 2, IterationState(issue=1, iteration=2, max_iterations=3))
+        assert store.get_iteration("o/r", 2) == IterationState(1, 2, 3)
+        assert store.get_iteration("other/r", 2) is None
+
+
+class TestResume:
+    def test_stored_result_applied_without_llm(self, store):
+        with tempfile.TemporaryDirectory() as repo:
+            agent = CodeAgent.__new__(CodeAgent)
+            agent.settings = Settings(llm_stream=False)
+            agent.repo_path = Path(repo)
+            agent.checkpoints = store
+            checkpoint = Checkpoint("o/r", "issue#1", "abc", 1, "d", make_result())
+
+            def generate():
+                raise AssertionError("LLM не должен вызываться")
+
+            result, changed = agent._generate_and_apply(generate, generate, checkpoint, "d")
+            assert changed == ["a.py"]
+            assert (Path(repo) / "a.py").read_text() == "x = 1\n"
+            assert store.load("o/r", "issue#1", 1, "abc").result == result
+
+
+class Regenerated(Exception):
+    pass
+
+
+class FakeLLM:
+    def generate_code(self, *args, **kwargs):
+        raise Regenerated()
+
+    stream_code = generate_code
+    generate_fix = generate_code
+    stream_fix = generate_code
+
+
+class FakeGitHub:
+    def __init__(self, pr_state: str = "open", pr: PRContext | None = None):
+        self.pr_state = pr_state
+        self.pr = pr
+        self.created = []
+        self.edited = []
+
+    def get_issue(self, number):
+        return SimpleNamespace(title="Логин", body="")
+
+    def get_pr(self, number):
+        return SimpleNamespace(state=self.pr_state, edit=lambda body: self.edited.append(body))
+
+    def create_pr(self, title, body, branch):
+        self.created.append(branch)
+        return SimpleNamespace(number=9, html_url="https://github.com/o/r/pull/9")
+
+    def load_pr_context(self, number):
+        return self.pr
+
+
+@pytest.fixture
+def agent(store, tmp_path):
+    repo = Repo.init(tmp_path)
+    (tmp_path / "README.md").write_text("v1\n")
+    repo.index.add(["README.md"])
+    repo.index.commit("init")
+
+    agent = CodeAgent.__new__(CodeAgent)
+    agent.settings = Settings(github_repository="o/r", llm_stream=False, max_iterations=3)
+    agent.repo_path = tmp_path
+    agent.git_repo = repo
+    agent.checkpoints = store
+    agent.llm = FakeLLM()
+    agent.github = FakeGitHub()
+    agent.context_collector = SimpleNamespace(collect=lambda text: "", last_report=None)
+    return agent
+
+
+class TestRunResume:
+    def head(self, agent):
+        return agent.git_repo.head.commit.hexsha
+
+    def test_returns_open_pr_without_work(self, agent, store):
+        url = "https://github.com/o/r/pull/2"
+        store.save(Checkpoint("o/r", "issue#1", self.head(agent), 1, commit_sha="f", pr_url=url))
+        assert agent.run(1) == url
+        assert agent.github.created == []
+
+    def test_closed_pr_starts_over(self, agent, store):
+        url = "https://github.com/o/r/pull/2"
+        store.save(Checkpoint("o/r", "issue#1", self.head(agent), 1, commit_sha="f", pr_url=url))
+        agent.github.pr_state = "closed"
+        with pytest.raises(Regenerated):
+            agent.run(1)
+
+    def test_pushed_commit_skips_generation(self, agent, store):
+        head = self.head(agent)
+        store.save(Checkpoint("o/r", "issue#1", head, 1, "d", make_result(), commit_sha="f"))
+        assert agent.run(1) == "https://github.com/o/r/pull/9"
+        assert agent.github.created == ["agent/issue-1"]
+        assert store.load("o/r", "issue#1", 1, head).pr_url == "https://github.com/o/r/pull/9"
+        assert store.get_iteration("o/r", 9) == IterationState(1, 1, 3)
+
+
+class TestFixResume:
+    def pr(self, head_sha):
+        body = "Closes #1\n<!-- AGENT: iteration=1, max=3, issue=1 -->"
+        return PRContext(7, "PR", body, head_sha, "agent/issue-1")
+
+    def test_pushed_fix_found_by_commit_sha(self, agent, store):
+        # Исправления запушены: head PR — уже наш коммит, записанный в контрольной точке
+        store.save(Checkpoint("o/r", "pr#7", "start", 2, "d", make_result(), commit_sha="fff"))
+        agent.github.pr = self.pr("fff")
+        assert agent.fix(7)
+        assert agent.github.edited == ["Closes #1\n<!-- AGENT: iteration=2, max=3, issue=1 -->"]
+        assert store.get_iteration("o/r", 7) == IterationState(1, 2, 3)
+
+    def test_new_head_generates_fix(self, agent, store):
+        store.save(Checkpoint("o/r", "pr#7", "start", 2, "d", make_result(), commit_sha="fff"))
+        agent.github.pr = self.pr("other")
+        agent._checkout_branch = lambda branch: None
+        with pytest.raises(Regenerated):
+            agent.fix(7)
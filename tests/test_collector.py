@@ -48,3 +48,35 @@ class TestContextCollector:
         collector = ContextCollector(temp_repo)
         context = collector.collect("test")
         assert "secret" not in context
+
+    def test_finds_files_by_content(self, temp_repo):
+        (temp_repo / "src" / "services.ts").write_text("export class UserService {}")
+
+        collector = ContextCollector(temp_repo)
+        context = collector.collect("UserService падает при пустом имени")
+        assert "export class UserService" in context
+
+    def test_reports_dropped_files(self, temp_repo):
+        (temp_repo / "README.md").write_text("# Test Project\n" + "docs " * 5000)
+
+        collector = ContextCollector(temp_repo, token_budget=500)
+        context = collector.collect("fix helper")
+        assert "def helper(): pass" in context
+        assert "README.md" in collector.last_report.dropped
+        assert collector.last_report.used <= 500
+
+    def test_skips_files_over_size_cap(self, temp_repo):
+        (temp_repo / "data.py").write_text("hello = 1\n" * 200_000)
+
+        collector = ContextCollector(temp_repo)
+        collector.collect("hello")
+        assert "data.py" not in collector.last_report.dropped
+        assert "data.py" not in [p.path for p in collector.last_report.included]
+
+    def test_tree_larger_than_budget(self, temp_repo):
+        for i in range(50):
+            (temp_repo / f"module_{i}.py").write_text("x = 1")
+
+        collector = ContextCollector(temp_repo, token_budget=10)
+        collector.collect("hello")
+        assert collector.last_report.included == []
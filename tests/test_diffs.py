@@ -0,0 +1,76 @@
+from coding_agent.diffs import parse_diff, split_diff
+
+
+def count_lines(text):
+    return len(text.splitlines())
+
+
+GITHUB_DIFF = """--- a.py
++++ a.py
+@@ -1,3 +1,3 @@
+ x
+--- y
++++ z
+ w
+--- b.py
++++ b.py
+@@ -1 +1 @@
+-a
++b"""
+
+GIT_DIFF = """diff --git a/x.py b/x.py
+index 1111111..2222222 100644
+--- a/x.py
++++ b/x.py
+@@ -1 +1 @@
+-a
++b
+diff --git a/new.py b/new.py
+new file mode 100644
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++c
+"""
+
+
+def big_file_diff(hunks: int) -> str:
+    parts = ["--- big.py\n+++ big.py\n"]
+    for i in range(hunks):
+        parts.append(f"@@ -{i * 10 + 1},2 +{i * 10 + 1},2 @@\n-old {i}\n+new {i}\n ctx\n")
+    return "".join(parts)
+
+
+class TestParseDiff:
+    def test_github_format(self):
+        files = parse_diff(GITHUB_DIFF)
+        assert [f.path for f in files] == ["a.py", "b.py"]
+        # Строки внутри ханка, похожие на заголовки, не начинают новый файл
+        assert "--- y" in files[0].hunks[0]
+
+    def test_git_format(self):
+        files = parse_diff(GIT_DIFF)
+        assert [f.path for f in files] == ["x.py", "new.py"]
+        assert files[1].header.startswith("diff --git")
+        assert "+++ b/new.py" in files[1].header
+
+    def test_roundtrip(self):
+        assert "".join(f.text for f in parse_diff(GIT_DIFF)) == GIT_DIFF
+
+
+class TestSplitDiff:
+    def test_small_diff_single_chunk(self):
+        assert split_diff(GIT_DIFF, 100, count_lines) == [GIT_DIFF]
+
+    def test_splits_by_file(self):
+        chunks = split_diff(GIT_DIFF, 8, count_lines)
+        assert len(chunks) == 2
+        assert chunks[0].startswith("diff --git a/x.py")
+        assert chunks[1].startswith("diff --git a/new.py")
+
+    def test_large_file_split_by_hunks_with_header(self):
+        chunks = split_diff(big_file_diff(6), 10, count_lines)
+        assert len(chunks) > 1
+        assert all(chunk.startswith("--- big.py\n+++ big.py\n") for chunk in chunks)
+        assert all(count_lines(chunk) <= 10 for chunk in chunks)
+        assert sum(chunk.count("@@ -") for chunk in chunks) == 6
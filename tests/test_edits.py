@@ -0,0 +1,44 @@
+import pytest
+
+from coding_agent.edits import EditError, apply_edits
+from coding_agent.llm.schemas import Edit
+
+
+SOURCE = """def add(a, b):
+    return a + b
+
+
+def sub(a, b):
+    return a - b
+"""
+
+
+class TestApplyEdits:
+    def test_replaces_unique_fragment(self):
+        result = apply_edits(SOURCE, [Edit(search="return a - b", replace="return b - a")])
+        assert "return b - a" in result
+        assert "return a + b" in result
+
+    def test_edits_applied_in_order(self):
+        edits = [
+            Edit(search="def add(a, b):", replace="def add(a, b, c=0):"),
+            Edit(search="return a + b", replace="return a + b + c"),
+        ]
+        result = apply_edits(SOURCE, edits)
+        assert "def add(a, b, c=0):\n    return a + b + c" in result
+
+    def test_missing_fragment_rejected(self):
+        with pytest.raises(EditError, match="не найден"):
+            apply_edits(SOURCE, [Edit(search="return a * b", replace="")])
+
+    def test_whitespace_must_match_exactly(self):
+        with pytest.raises(EditError):
+            apply_edits(SOURCE, [Edit(search="return  a + b", replace="")])
+
+    def test_ambiguous_fragment_rejected(self):
+        with pytest.raises(EditError, match="2 раз"):
+            apply_edits(SOURCE, [Edit(search="(a, b):", replace="(x, y):")])
+
+    def test_empty_search_rejected(self):
+        with pytest.raises(EditError):
+            apply_edits(SOURCE, [Edit(search="", replace="x")])
@@ -0,0 +1,175 @@
+import httpx
+import pytest
+from github import GithubException
+
+from coding_agent.github import transport
+from coding_agent.github.client import DIFF_MEDIA_TYPE, GitHubClient, _ci_status
+
+PR_DATA = {
+    "repository": {
+        "pullRequest": {
+            "number": 5,
+            "title": "[#3] Добавить логин",
+            "body": "Closes #3\n<!-- AGENT: iteration=1, max=2, issue=3 -->",
+            "headRefName": "agent/issue-3",
+            "headRefOid": "abc123",
+            "closingIssuesReferences": {
+                "nodes": [{"number": 3, "title": "Логин", "body": None}]
+            },
+            "reviews": {
+                "nodes": [
+                    {
+                        "state": "CHANGES_REQUESTED",
+                        "body": "Есть проблемы",
+                        "author": {"login": "coding-agent"},
+                        "commit": {"oid": "abc123"},
+                        "comments": {
+                            "nodes": [
+                                {"path": "app.py", "line": 10, "body": "нет проверки"},
+                                {"path": "README.md", "line": None, "body": "опиши"},
+                            ]
+                        },
+                    }
+                ]
+            },
+            "commits": {
+                "nodes": [
+                    {
+                        "commit": {
+                            "checkSuites": {
+                                "nodes": [
+                                    {
+                                        "checkRuns": {
+                                            "nodes": [
+                                                {"name": "tests", "conclusion": "FAILURE"},
+                                                {"name": "lint", "conclusion": "SUCCESS"},
+                                            ]
+                                        }
+                                    }
+                                ]
+                            }
+                        }
+                    }
+                ]
+            },
+        }
+    }
+}
+
+
+class TestLoadPRContextGraphQL:
+    def load(self, monkeypatch):
+        client = GitHubClient("token", "owner/repo", graphql=True)
+        calls = []
+
+        def fake_graphql(query, **variables):
+            calls.append(variables)
+            return PR_DATA
+
+        monkeypatch.setattr(client, "_graphql", fake_graphql)
+        return client.load_pr_context(5), calls
+
+    def test_single_query(self, monkeypatch):
+        _, calls = self.load(monkeypatch)
+        assert calls == [{"owner": "owner", "name": "repo", "number": 5}]
+
+    def test_pr_and_issue(self, monkeypatch):
+        pr, _ = self.load(monkeypatch)
+        assert pr.head_sha == "abc123"
+        assert pr.head_ref == "agent/issue-3"
+        assert pr.issue.number == 3
+        assert pr.issue.body == ""
+
+    def test_reviews_with_inline_comments(self, monkeypatch):
+        pr, _ = self.load(monkeypatch)
+        review = pr.reviews[0]
+        assert review.state == "CHANGES_REQUESTED"
+        assert review.author == "coding-agent"
+        assert review.comments == ["app.py:10: нет проверки", "README.md: опиши"]
+
+    def test_ci_status(self, monkeypatch):
+        pr, _ = self.load(monkeypatch)
+        assert pr.check_runs == [("tests", "failure"), ("lint", "success")]
+        assert not pr.ci_status.success
+        assert "tests" in pr.ci_status.summary
+
+
+class TestCIStatus:
+    def test_no_checks(self):
+        assert _ci_status([]).success
+
+    def test_all_passed(self):
+        status = _ci_status([("a", "success"), ("b", "success")])
+        assert status.success
+        assert status.summary == "2/2 прошло"
+
+
+PR_JSON = {"number": 7, "title": "PR", "body": "", "head": {"sha": "abc", "ref": "b"}}
+
+
+@pytest.fixture
+def github_api(monkeypatch):
+    """GitHub за MockTransport; diff_status — ответ на запрос diff целиком."""
+    api = {"requests": [], "diff_status": 200, "graphql": httpx.Response(200, json={})}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        api["requests"].append(request)
+        path = request.url.path
+        if path == "/repos/o/r/pulls/7":
+            if request.headers.get("accept") == DIFF_MEDIA_TYPE:
+                if api["diff_status"] == 200:
+                    return httpx.Response(200, text="diff --git a/a.py b/a.py\n")
+                return httpx.Response(api["diff_status"], json={"message": "too large"})
+            return httpx.Response(200, json=PR_JSON)
+        if path == "/repos/o/r/pulls/7/files":
+            return httpx.Response(200, json=[{"filename": "a.py", "patch": "@@ -1 +1 @@"}])
+        if path == "/graphql":
+            return api["graphql"]
+        if path == "/repos/o/r/issues/3":
+            return httpx.Response(200, json={"number": 3, "title": "bug"})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    monkeypatch.setattr(transport, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    yield api
+
+
+class TestRESTRequests:
+    def test_diff_in_one_request(self, github_api):
+        client = GitHubClient("token", "o/r")
+        assert client.get_pr_diff(7) == "diff --git a/a.py b/a.py\n"
+        assert len(github_api["requests"]) == 1
+
+    @pytest.mark.parametrize("status", [406, 422])
+    def test_diff_falls_back_to_files(self, github_api, status):
+        github_api["diff_status"] = status
+        client = GitHubClient("token", "o/r")
+        assert client.get_pr_diff(7) == "--- a.py\n+++ a.py\n@@ -1 +1 @@"
+
+    def test_diff_other_errors_raised(self, github_api):
+        github_api["diff_status"] = 500
+        with pytest.raises(httpx.HTTPStatusError):
+            GitHubClient("token", "o/r").get_pr_diff(7)
+
+    def test_pr_and_issue_fetched_once(self, github_api):
+        client = GitHubClient("token", "o/r")
+        assert client.get_pr(7).title == client.get_pr(7).title == "PR"
+        assert client.get_issue(3).title == client.get_issue(3).title == "bug"
+        paths = [r.url.path for r in github_api["requests"]]
+        assert paths == ["/repos/o/r/pulls/7", "/repos/o/r/issues/3"]
+
+
+class TestGraphQLErrors:
+    def test_http_error_before_parsing_body(self, github_api):
+        github_api["graphql"] = httpx.Response(502, text="<html>Bad Gateway</html>")
+        with pytest.raises(httpx.HTTPStatusError):
+            GitHubClient("token", "o/r")._graphql("query { viewer { login } }")
+
+    def test_graphql_errors_raised(self, github_api):
+        github_api["graphql"] = httpx.Response(200, json={"errors": [{"message": "bad"}]})
+        with pytest.raises(GithubException):
+            GitHubClient("token", "o/r")._graphql("query { viewer { login } }")
+
+    def test_data_returned(self, github_api):
+        github_api["graphql"] = httpx.Response(200, json={"data": {"viewer": {"login": "a"}}})
+        data = GitHubClient("token", "o/r")._graphql("query { viewer { login } }")
+        assert data == {"viewer": {"login": "a"}}
@@ -0,0 +1,95 @@
+import httpx
+
+from coding_agent.github.http_cache import CachedResponse, CachingTransport, ConditionalCache
+from coding_agent.github.rate_limit import RateLimiter
+
+
+def make_client(cache, calls, key_for=None):
+    def handler(request):
+        calls.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"x-ratelimit-remaining": "4999"})
+        return httpx.Response(
+            200,
+            headers={"etag": '"v1"', "x-ratelimit-remaining": "5000"},
+            json={"number": 1},
+        )
+
+    return httpx.Client(
+        transport=CachingTransport(httpx.MockTransport(handler), cache, key_for)
+    )
+
+
+class TestCachingTransport:
+    def test_not_modified_served_from_cache(self):
+        cache = ConditionalCache()
+        calls = []
+        client = make_client(cache, calls)
+
+        first = client.get("https://api.github.com/repos/o/r/pulls/1")
+        second = client.get("https://api.github.com/repos/o/r/pulls/1")
+
+        assert first.json() == second.json() == {"number": 1}
+        assert second.status_code == 200
+        assert calls[1].headers["if-none-match"] == '"v1"'
+        assert second.headers["x-ratelimit-remaining"] == "4999"
+        assert cache.stats()["hits"] == 1
+
+    def test_key_depends_on_token(self):
+        cache = ConditionalCache()
+        calls = []
+        client = make_client(cache, calls)
+        client.get("https://api.github.com/x", headers={"Authorization": "token a"})
+        client.get("https://api.github.com/x", headers={"Authorization": "token b"})
+        assert "if-none-match" not in calls[1].headers
+
+    def test_key_survives_installation_token_rotation(self):
+        limiter = RateLimiter()
+        limiter.register("old", "installation:1")
+        limiter.register("new", "installation:1")
+        cache = ConditionalCache()
+        calls = []
+        client = make_client(cache, calls, limiter.key_for)
+        client.get("https://api.github.com/x", headers={"Authorization": "token old"})
+        client.get("https://api.github.com/x", headers={"Authorization": "token new"})
+        assert calls[1].headers["if-none-match"] == '"v1"'
+        assert cache.stats()["hits"] == 1
+
+    def test_installations_do_not_share_entries(self):
+        limiter = RateLimiter()
+        limiter.register("a", "installation:1")
+        limiter.register("b", "installation:2")
+        calls = []
+        client = make_client(ConditionalCache(), calls, limiter.key_for)
+        client.get("https://api.github.com/x", headers={"Authorization": "token a"})
+        client.get("https://api.github.com/x", headers={"Authorization": "token b"})
+        assert "if-none-match" not in calls[1].headers
+
+    def test_post_not_cached(self):
+        cache = ConditionalCache()
+        calls = []
+        client = make_client(cache, calls)
+        client.post("https://api.github.com/x")
+        client.post("https://api.github.com/x")
+        assert cache.stats()["entries"] == 0
+
+
+class TestConditionalCache:
+    def entry(self, size):
+        return CachedResponse('"e"', None, [], b"x" * size)
+
+    def test_lru_eviction(self):
+        cache = ConditionalCache(max_size=25)
+        cache.put("a", self.entry(10))
+        cache.put("b", self.entry(10))
+        cache.get("a")
+        cache.put("c", self.entry(10))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["size"] == 20
+
+    def test_persists_on_disk(self, tmp_path):
+        ConditionalCache(cache_dir=tmp_path).put("k", self.entry(3))
+        entry = ConditionalCache(cache_dir=tmp_path).get("k")
+        assert entry.content == b"xxx"
+        assert entry.etag == '"e"'
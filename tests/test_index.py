@@ -0,0 +1,61 @@
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from coding_agent.context.index import FileIndex
+
+
+@pytest.fixture
+def temp_repo():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        (root / "README.md").write_text("# Test Project")
+        (root / "src").mkdir()
+        (root / "src" / "main.py").write_text("def hello(): pass")
+        (root / "src" / "user_service.py").write_text("class UserService: pass")
+        (root / "pkg.egg-info").mkdir()
+        (root / "pkg.egg-info" / "PKG-INFO").write_text("Name: pkg")
+        yield root
+
+
+def git(root, *args):
+    subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+
+class TestFileIndex:
+    def test_walk_ignores_egg_info(self, temp_repo):
+        index = FileIndex.build(temp_repo)
+        assert "src/main.py" in index
+        assert "pkg.egg-info/PKG-INFO" not in index
+
+    def test_git_respects_gitignore(self, temp_repo):
+        (temp_repo / ".gitignore").write_text("secret.txt\n")
+        (temp_repo / "secret.txt").write_text("token")
+        git(temp_repo, "init", "-q")
+        git(temp_repo, "add", "README.md", "src/main.py")
+
+        index = FileIndex.build(temp_repo)
+        assert "src/main.py" in index
+        assert "src/user_service.py" in index  # неотслеживаемый, но не игнорируемый
+        assert "secret.txt" not in index
+        assert index.read("secret.txt") is None
+
+    def test_render_tree_dirs_first(self, temp_repo):
+        tree = FileIndex.build(temp_repo).render_tree()
+        assert tree.splitlines() == [
+            "├── src",
+            "│   ├── main.py",
+            "│   └── user_service.py",
+            "└── README.md",
+        ]
+
+    def test_render_tree_max_depth(self):
+        index = FileIndex("/nonexistent", ["a/b/c/d.py"])
+        assert index.render_tree(max_depth=2).splitlines() == ["└── a", "    └── b"]
+
+    def test_find_by_path(self, temp_repo):
+        index = FileIndex.build(temp_repo)
+        assert index.find(["user_service"]) == [Path("src/user_service.py")]
+        assert index.find([]) == []
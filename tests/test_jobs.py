@@ -0,0 +1,211 @@
+import threading
+import time
+
+import pytest
+
+from coding_agent.jobs import JobDeferred, JobQueue, JobRejected, JobState
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestJobQueue:
+    def test_same_key_runs_in_order(self):
+        queue = JobQueue(workers=2)
+        order = []
+        queue.submit("review", "o/r#1", lambda: (time.sleep(0.05), order.append(1)))
+        last = queue.submit("review", "o/r#1", lambda: order.append(2))
+        queue.start()
+        try:
+            assert wait_for(lambda: last.state == JobState.DONE)
+            assert order == [1, 2]
+        finally:
+            queue.stop(1)
+
+    def test_different_keys_run_in_parallel(self):
+        queue = JobQueue(workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+        first = queue.submit("review", "o/r#1", barrier.wait)
+        second = queue.submit("review", "o/r#2", barrier.wait)
+        queue.start()
+        try:
+            # Барьер пройдёт только если обе задачи выполняются одновременно
+            assert wait_for(lambda: first.state == second.state == JobState.DONE)
+        finally:
+            queue.stop(1)
+
+    def test_failure_recorded_and_worker_survives(self):
+        queue = JobQueue(workers=1)
+
+        def fail():
+            raise RuntimeError("boom")
+
+        failed = queue.submit("issue", "o/r#1", fail)
+        after = queue.submit("issue", "o/r#1", lambda: None)
+        queue.start()
+        try:
+            assert wait_for(lambda: after.state == JobState.DONE)
+            assert failed.state == JobState.FAILED
+            assert failed.error == "boom"
+            history = queue.snapshot()["history"]
+            assert [j["id"] for j in history] == [after.id, failed.id]
+        finally:
+            queue.stop(1)
+
+    def test_deferred_job_requeued(self):
+        queue = JobQueue(workers=1)
+        attempts = []
+        done = threading.Event()
+
+        def func():
+            attempts.append(time.time())
+            if len(attempts) == 1:
+                raise JobDeferred(0.1, "мало квоты")
+            done.set()
+
+        job = queue.submit("review", "o/r#1", func)
+        queue.start()
+        try:
+            assert done.wait(5)
+            assert wait_for(lambda: job.state == JobState.DONE)
+            assert attempts[1] - attempts[0] >= 0.1
+            assert job.error is None
+        finally:
+            queue.stop(1)
+
+    def test_deferred_job_blocks_later_jobs_of_same_key(self):
+        queue = JobQueue(workers=2)
+        order = []
+
+        def first():
+            order.append("first")
+            if order.count("first") == 1:
+                raise JobDeferred(0.2, "мало квоты")
+
+        queue.submit("fix", "o/r#1", first)
+        last = queue.submit("review", "o/r#1", lambda: order.append("second"))
+        queue.start()
+        try:
+            assert wait_for(lambda: last.state == JobState.DONE)
+            assert order == ["first", "first", "second"]
+        finally:
+            queue.stop(1)
+
+    def test_duplicate_delivery_returns_same_job(self):
+        queue = JobQueue(workers=1)
+        first = queue.submit("review", "o/r#1", lambda: None, delivery_id="d-1")
+        second = queue.submit("review", "o/r#1", lambda: None, delivery_id="d-1")
+        assert first is second
+        assert queue.get_delivery("d-1") is first
+        assert queue.snapshot()["queued"] == 1
+
+    def test_coalescing_keeps_latest_pending_job(self):
+        queue = JobQueue(workers=1)
+        ran = []
+        old = queue.submit("review", "o/r#1", lambda: ran.append("old"), coalesce=0.05)
+        fix = queue.submit("fix", "o/r#1", lambda: ran.append("fix"), coalesce=0.05)
+        new = queue.submit("review", "o/r#1", lambda: ran.append("new"), coalesce=0.05)
+
+        assert old.state == JobState.SUPERSEDED
+        assert old.superseded_by == new.id
+        queue.start()
+        try:
+            assert wait_for(lambda: new.state == JobState.DONE)
+            assert sorted(ran) == ["fix", "new"]
+            assert fix.state == JobState.DONE
+        finally:
+            queue.stop(1)
+
+    def test_full_queue_rejects(self):
+        queue = JobQueue(workers=1, max_pending=2)
+        queue.submit("review", "o/r#1", lambda: None, delivery_id="d-1")
+        queue.submit("review", "o/r#2", lambda: None)
+        with pytest.raises(JobRejected):
+            queue.submit("review", "o/r#3", lambda: None)
+        # Повтор доставки и схлопывание места в очереди не требуют
+        assert queue.submit("review", "o/r#1", lambda: None, delivery_id="d-1")
+        queue.submit("review", "o/r#2", lambda: None, coalesce=1.0)
+        assert queue.load()["saturated"]
+
+    def test_drain_cancels_pending_and_waits_running(self):
+        queue = JobQueue(workers=1)
+        started = threading.Event()
+        running = queue.submit("review", "o/r#1", lambda: (started.set(), time.sleep(0.2)))
+        pending = queue.submit("review", "o/r#2", lambda: None)
+        queue.start()
+        assert started.wait(5)
+
+        assert queue.drain(5) == []
+        assert running.state == JobState.DONE
+        assert pending.state == JobState.CANCELLED
+        assert queue.load()["draining"]
+        with pytest.raises(JobRejected):
+            queue.submit("review", "o/r#3", lambda: None)
+
+    def test_begin_drain_rejects_new_but_runs_queued(self):
+        queue = JobQueue(workers=1)
+        gate = threading.Event()
+        queue.start()
+        try:
+            queue.submit("review", "o/r#1", lambda: gate.wait(5))
+            queued = queue.submit("review", "o/r#2", lambda: None)
+            queue.begin_drain()
+            assert queue.load()["draining"]
+            with pytest.raises(JobRejected):
+                queue.submit("review", "o/r#3", lambda: None)
+            gate.set()
+            assert wait_for(lambda: queued.state == JobState.DONE)
+        finally:
+            queue.stop(1)
+
+
+class TestFairScheduling:
+    def run_all(self, queue, jobs):
+        order = []
+        for kind, key, tenant in jobs:
+            queue.submit(kind, key, lambda k=key: order.append(k), tenant=tenant)
+        queue.start()
+        try:
+            assert wait_for(lambda: len(order) == len(jobs))
+        finally:
+            queue.stop(1)
+        return order
+
+    def test_tenants_interleaved(self):
+        queue = JobQueue(workers=1)
+        jobs = [("issue", f"a/r#{i}", "1") for i in range(4)] + [("issue", "b/r#1", "2")]
+        order = self.run_all(queue, jobs)
+        assert order.index("b/r#1") <= 1
+
+    def test_review_before_generation(self):
+        queue = JobQueue(workers=1)
+        order = self.run_all(queue, [("issue", "a/r#1", "1"), ("review", "a/r#2", "1")])
+        assert order == ["a/r#2", "a/r#1"]
+
+    def test_weights(self):
+        queue = JobQueue(workers=1, tenant_weights={"1": 3.0})
+        jobs = [("issue", f"a/r#{i}", "1") for i in range(4)]
+        jobs += [("issue", f"b/r#{i}", "2") for i in range(2)]
+        order = self.run_all(queue, jobs)
+        # Вес 3: установка 1 получает три задачи на одну у установки 2
+        assert order[:4].count("b/r#0") + order[:4].count("b/r#1") == 1
+
+    def test_token_quota_blocks_tenant(self):
+        usage = {"1": 1000, "2": 0}
+        queue = JobQueue(workers=1, token_quota=500, token_usage=usage.get)
+        ran = []
+        blocked = queue.submit("review", "a/r#1", lambda: ran.append("a"), tenant="1")
+        queue.submit("review", "b/r#1", lambda: ran.append("b"), tenant="2")
+        queue.start()
+        try:
+            assert wait_for(lambda: ran == ["b"])
+            assert blocked.state == JobState.QUEUED
+            assert queue.snapshot()["tenants"]["1"]["queued"] == 1
+        finally:
+            queue.stop(1)
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+
+import httpx
+import litellm
+import pytest
+
+from coding_agent.config import Settings
+from coding_agent.llm import client as llm_client
+from coding_agent.llm import limits
+from coding_agent.llm.limits import (
+    BACKOFF_MAX,
+    ConcurrencyLimiter,
+    backoff_delay,
+    metrics,
+    retry_after,
+)
+
+
+def rate_limit_error(headers: dict | None = None) -> litellm.RateLimitError:
+    response = httpx.Response(
+        429, headers=headers or {}, request=httpx.Request("POST", "https://api.example.com")
+    )
+    return litellm.RateLimitError("slow down", "openai", "gpt-4o", response=response)
+
+
+class TestRetryAfter:
+    def test_seconds(self):
+        assert retry_after(rate_limit_error({"retry-after": "7"})) == 7.0
+
+    def test_http_date(self):
+        value = retry_after(rate_limit_error({"retry-after": formatdate(time.time() + 30)}))
+        assert 25 <= value <= 31
+
+    def test_missing_or_invalid(self):
+        assert retry_after(rate_limit_error()) is None
+        assert retry_after(rate_limit_error({"retry-after": "soon"})) is None
+        assert retry_after(ValueError("no response")) is None
+
+
+class TestBackoff:
+    def test_capped(self):
+        delays = [backoff_delay(20, ValueError()) for _ in range(100)]
+        assert max(delays) <= BACKOFF_MAX
+
+    def test_not_less_than_retry_after(self):
+        error = rate_limit_error({"retry-after": str(BACKOFF_MAX)})
+        assert backoff_delay(0, error) == BACKOFF_MAX
+
+    def test_retry_after_beyond_cap_not_retried(self):
+        assert backoff_delay(0, rate_limit_error({"retry-after": "3600"})) is None
+
+
+class TestConcurrencyLimiter:
+    def test_per_provider_limit(self):
+        limiter = ConcurrencyLimiter(total=10, per_provider=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with limiter.acquire("openai"):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert max(peak) == 2
+
+    def test_async_shares_total_limit(self):
+        limiter = ConcurrencyLimiter(total=1, per_provider=5)
+        order = []
+
+        async def call(name):
+            async with limiter.aacquire(name):
+                order.append(f"{name}+")
+                await asyncio.sleep(0.02)
+                order.append(f"{name}-")
+
+        async def main():
+            await asyncio.gather(call("a"), call("b"))
+
+        asyncio.run(main())
+        # Общий лимит 1: вызовы разных провайдеров не пересекаются
+        assert order in (["a+", "a-", "b+", "b-"], ["b+", "b-", "a+", "a-"])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(limits, "_limiter", None)
+    sleeps = []
+    monkeypatch.setattr(llm_client.time, "sleep", sleeps.append)
+    client = llm_client.LLMClient(Settings(llm_model="openai/gpt-4o", llm_max_retries=2))
+    return client, sleeps
+
+
+class TestRetries:
+    def test_sync_retries_then_raises(self, llm, monkeypatch):
+        client, sleeps = llm
+        calls = []
+
+        def completion(**kwargs):
+            calls.append(kwargs)
+            raise rate_limit_error({"retry-after": "3"})
+
+        monkeypatch.setattr(litellm, "completion", completion)
+        before = metrics.snapshot()
+        with pytest.raises(litellm.RateLimitError):
+            client._complete([{"role": "user", "content": "hi"}])
+
+        assert len(calls) == 3
+        assert sleeps == [3.0, 3.0]
+        after = metrics.snapshot()
+        assert after["retries"] - before["retries"] == 2
+        assert after["failures"] - before["failures"] == 1
+
+    def test_long_retry_after_fails_fast(self, llm, monkeypatch):
+        client, sleeps = llm
+        calls = []
+
+        def completion(**kwargs):
+            calls.append(kwargs)
+            raise rate_limit_error({"retry-after": "3600"})
+
+        monkeypatch.setattr(litellm, "completion", completion)
+        with pytest.raises(litellm.RateLimitError):
+            client._complete([{"role": "user", "content": "hi"}])
+        assert len(calls) == 1
+        assert sleeps == []
+
+    def test_non_retryable_error_not_retried(self, llm, monkeypatch):
+        client, sleeps = llm
+        calls = []
+
+        def completion(**kwargs):
+            calls.append(kwargs)
+            raise ValueError("bad request")
+
+        monkeypatch.setattr(litellm, "completion", completion)
+        with pytest.raises(ValueError):
+            client._complete([{"role": "user", "content": "hi"}])
+        assert len(calls) == 1
+        assert sleeps == []
+
+    def test_async_retries(self, llm, monkeypatch):
+        client, _ = llm
+        calls = []
+
+        async def acompletion(**kwargs):
+            calls.append(kwargs)
+            raise rate_limit_error()
+
+        monkeypatch.setattr(litellm, "acompletion", acompletion)
+        monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, error: 0.0)
+        with pytest.raises(litellm.RateLimitError):
+            asyncio.run(client._acomplete([{"role": "user", "content": "hi"}]))
+        assert len(calls) == 3
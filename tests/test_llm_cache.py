@@ -0,0 +1,71 @@
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from coding_agent.config import Settings
+from coding_agent.llm import CodeGenerationResult
+from coding_agent.llm.cache import ResponseCache
+from coding_agent.llm.client import LLMClient, response_cache
+
+
+@pytest.fixture
+def cache_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir) / "responses.sqlite"
+
+
+class TestResponseCache:
+    def test_key_depends_on_all_inputs(self):
+        messages = [{"role": "user", "content": "hi"}]
+        key = ResponseCache.make_key("model-a", messages, "ReviewResult")
+        assert key == ResponseCache.make_key("model-a", messages, "ReviewResult")
+        assert key != ResponseCache.make_key("model-b", messages, "ReviewResult")
+        assert key != ResponseCache.make_key("model-a", messages, "CodeGenerationResult")
+
+    def test_hit_and_miss(self, cache_path):
+        cache = ResponseCache(cache_path)
+        assert cache.get("k") is None
+        cache.put("k", '{"approved": true}')
+        assert cache.get("k") == '{"approved": true}'
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_ttl(self, cache_path):
+        cache = ResponseCache(cache_path, ttl=0.01)
+        cache.put("k", "value")
+        time.sleep(0.02)
+        assert cache.get("k") is None
+
+    def test_evicts_least_recently_used(self, cache_path):
+        cache = ResponseCache(cache_path, max_size=25)
+        cache.put("a", "0123456789")
+        cache.put("b", "0123456789")
+        cache.get("a")
+        cache.put("c", "0123456789")
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["size"] <= 25
+
+
+class TestSharedCache:
+    def test_one_instance_per_settings(self, cache_path):
+        settings = Settings(llm_cache_dir=str(cache_path.parent))
+        cache = response_cache(settings)
+        cache.get("k")
+        # Счётчики, которые видит /metrics, — те же, что у клиентов задач
+        assert response_cache(Settings(llm_cache_dir=str(cache_path.parent))) is cache
+        assert cache.stats()["misses"] == 1
+
+    def test_disabled(self):
+        assert response_cache(Settings(llm_cache_dir=None)) is None
+
+    def test_candidate_variants_cached_separately(self, cache_path):
+        client = LLMClient(Settings(llm_cache_dir=str(cache_path.parent)))
+        messages = [{"role": "user", "content": "task"}]
+        keys = {
+            client._cache_key(messages, CodeGenerationResult, "code", variant=variant)
+            for variant in (None, 0, 1)
+        }
+        assert len(keys) == 3
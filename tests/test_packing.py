@@ -0,0 +1,66 @@
+from coding_agent.context.packing import Candidate, extract_spans, pack
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class TestExtractSpans:
+    def test_window_around_match(self):
+        content = "\n".join(f"line {i}" for i in range(20)) + "\ndef target(): pass\n"
+        spans = extract_spans(content, "target", window=1)
+        assert "def target(): pass" in spans
+        assert "line 19" in spans
+        assert "line 10" not in spans
+
+    def test_no_match(self):
+        assert extract_spans("x = 1", "target") is None
+
+
+class TestPack:
+    def test_everything_fits(self):
+        candidates = [Candidate("a.py", "a b c", 1.0), Candidate("b.py", "d e", 0.5)]
+        parts, report = pack(candidates, "a", budget=100, count_tokens=count_words)
+        assert [p.path for p in parts] == ["a.py", "b.py"]
+        assert not report.dropped
+        assert report.used == sum(p.tokens for p in parts)
+
+    def test_drops_least_relevant_per_token(self):
+        candidates = [
+            Candidate("small.py", "useful", 1.0),
+            Candidate("readme.md", "word " * 50, 0.3),
+        ]
+        parts, report = pack(candidates, "useful", budget=20, count_tokens=count_words)
+        assert [p.path for p in parts] == ["small.py"]
+        assert report.dropped == ["readme.md"]
+
+    def test_large_file_packed_as_spans(self):
+        body = "\n".join(f"filler {i}" for i in range(200))
+        content = f"{body}\ndef target(): pass\n{body}"
+        candidates = [Candidate("big.py", content, 1.0)]
+        parts, report = pack(candidates, "target", budget=100, count_tokens=count_words)
+        assert len(parts) == 1
+        assert parts[0].partial
+        assert "def target(): pass" in parts[0].text
+        assert report.partial == ["big.py"]
+        assert report.used <= 100
+
+    def test_oversized_text_not_tokenized(self):
+        counted = []
+
+        def count(text):
+            counted.append(text)
+            return count_words(text)
+
+        body = "filler\n" * 5000
+        candidates = [Candidate("huge.py", f"{body}def target(): pass\n{body}", 1.0)]
+        parts, report = pack(candidates, "target", budget=100, count_tokens=count)
+        # Целиком файл не токенизировался, но фрагмент вокруг совпадения вошёл
+        assert all(len(text) < 1000 for text in counted)
+        assert parts[0].partial
+
+    def test_negative_budget_packs_nothing(self):
+        candidates = [Candidate("a.py", "a b c", 1.0)]
+        parts, report = pack(candidates, "a", budget=-5, count_tokens=count_words)
+        assert parts == []
+        assert report.dropped == ["a.py"]
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+from coding_agent.config import Settings
+from coding_agent.llm import client as llm_client
+from coding_agent.llm.limits import metrics
+
+
+@pytest.fixture
+def client():
+    return llm_client.LLMClient(Settings(llm_model="anthropic/claude-sonnet-4-5"))
+
+
+def usage(prompt_tokens=100, completion_tokens=20, **extra):
+    return SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, **extra
+        )
+    )
+
+
+class TestMessages:
+    def test_stable_prefix_first(self, client, monkeypatch):
+        monkeypatch.setattr(llm_client, "_supports_cache_control", lambda model: False)
+        messages = client._code_messages("Логин", "Добавить логин", "files: a.py")
+        assert [m["role"] for m in messages] == ["system", "user", "user"]
+        assert "files: a.py" in messages[1]["content"]
+        assert "Логин" in messages[2]["content"]
+        assert "Логин" not in messages[0]["content"]
+
+    def test_same_prefix_for_different_tasks(self, client, monkeypatch):
+        monkeypatch.setattr(llm_client, "_supports_cache_control", lambda model: False)
+        first = client._code_messages("Логин", "", "files: a.py")
+        second = client._code_messages("Выход", "", "files: a.py")
+        assert first[:2] == second[:2]
+        assert first[2] != second[2]
+
+    def test_cache_control_only_if_supported(self, client, monkeypatch):
+        monkeypatch.setattr(llm_client, "_supports_cache_control", lambda model: True)
+        content = client._code_messages("Логин", "", "files: a.py")[1]["content"]
+        assert content[0]["cache_control"] == {"type": "ephemeral"}
+        assert "files: a.py" in content[0]["text"]
+
+        monkeypatch.setattr(llm_client, "_supports_cache_control", lambda model: False)
+        content = client._code_messages("Логин", "", "files: a.py")[1]["content"]
+        assert isinstance(content, str)
+
+    def test_review_without_context(self, client):
+        messages = client._review_messages("diff", "Логин", "")
+        assert [m["role"] for m in messages] == ["system", "user"]
+
+
+class TestUsage:
+    def test_openai_cached_tokens(self, client):
+        before = metrics.snapshot()["cached_tokens"]
+        details = SimpleNamespace(cached_tokens=64)
+        client._record_usage(usage(prompt_tokens_details=details))
+        assert client.last_usage == {
+            "prompt_tokens": 100,
+            "completion_tokens": 20,
+            "cached_tokens": 64,
+        }
+        assert metrics.snapshot()["cached_tokens"] - before == 64
+
+    def test_anthropic_cache_read_tokens(self, client):
+        before = metrics.snapshot()["cached_tokens"]
+        client._record_usage(usage(prompt_tokens_details=None, cache_read_input_tokens=80))
+        assert client.last_usage["cached_tokens"] == 80
+        assert metrics.snapshot()["cached_tokens"] - before == 80
+
+    def test_without_cache_fields(self, client):
+        client._record_usage(usage())
+        assert client.last_usage["cached_tokens"] == 0
+
+    def test_no_usage_ignored(self, client):
+        client._record_usage(SimpleNamespace(usage=None))
+        assert client.last_usage is None
@@ -0,0 +1,74 @@
+import time
+
+import httpx
+
+from coding_agent.github import rate_limit
+from coding_agent.github.rate_limit import Quota, RateLimitedTransport, RateLimiter
+
+
+def limit_headers(remaining, limit=5000, reset_in=600):
+    return {
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(int(time.time() + reset_in)),
+        "x-ratelimit-resource": "core",
+    }
+
+
+class TestQuota:
+    def test_plenty_of_quota_no_delay(self):
+        now = time.time()
+        quota = Quota(limit=5000, remaining=4000, reset=now + 600)
+        assert quota.delay(now, urgent=False, reserve=0.1) == 0
+
+    def test_low_quota_paces_reads_only(self):
+        now = time.time()
+        quota = Quota(limit=5000, remaining=100, reset=now + 600)
+        assert quota.delay(now, urgent=False, reserve=0.1) == 6.0
+        assert quota.delay(now, urgent=True, reserve=0.1) == 0
+
+    def test_exhausted_waits_for_reset(self):
+        now = time.time()
+        quota = Quota(limit=5000, remaining=0, reset=now + 30)
+        assert quota.delay(now, urgent=True, reserve=0.1) == 30
+
+
+class TestRateLimiter:
+    def test_installation_tokens_share_quota(self):
+        limiter = RateLimiter()
+        limiter.register("ghs_old", "installation:1")
+        limiter.register("ghs_new", "installation:1")
+        assert limiter.key_for("token ghs_old") == limiter.key_for("Bearer ghs_new")
+        assert limiter.key_for("token other").startswith("token:")
+
+    def test_job_delay_when_quota_short(self):
+        limiter = RateLimiter()
+        response = httpx.Response(200, headers=limit_headers(remaining=5))
+        limiter.update("installation:1", "core", response)
+        assert limiter.job_delay("installation:1", cost=15) > 500
+        assert limiter.job_delay("installation:1", cost=3) == 0
+        assert limiter.snapshot()["installation:1"]["core"]["remaining"] == 5
+
+    def test_plain_forbidden_is_not_a_limit(self):
+        limiter = RateLimiter()
+        response = httpx.Response(403, headers=limit_headers(remaining=4000))
+        assert limiter.update("k", "core", response) is None
+
+
+class TestRateLimitedTransport:
+    def test_retries_after_secondary_limit(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(rate_limit.time, "sleep", sleeps.append)
+        responses = [
+            httpx.Response(429, headers={"retry-after": "3"}),
+            httpx.Response(200, headers=limit_headers(remaining=10)),
+        ]
+        transport = RateLimitedTransport(
+            httpx.MockTransport(lambda request: responses.pop(0)), RateLimiter()
+        )
+        client = httpx.Client(transport=transport)
+
+        response = client.post("https://api.github.com/repos/o/r/pulls/1/reviews")
+
+        assert response.status_code == 200
+        assert len(sleeps) == 1 and 2 < sleeps[0] <= 3
@@ -0,0 +1,166 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+from git import Git, Repo
+
+from coding_agent.repo_manager import RepoManager
+
+
+def make_origin(root: Path, name: str) -> Repo:
+    repo = Repo.init(root / name)
+    commit(repo, "README.md", "v1\n")
+    return repo
+
+
+def commit(repo: Repo, path: str, content: str):
+    (Path(repo.working_dir) / path).write_text(content)
+    repo.index.add([path])
+    repo.index.commit(f"update {path}")
+
+
+@pytest.fixture
+def root():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+class TestRepoManager:
+    def test_clone_without_cache(self, root):
+        origin = make_origin(root, "origin")
+        manager = RepoManager()
+        path = manager.clone(origin.working_dir, "token")
+        assert (path / "README.md").read_text() == "v1\n"
+        manager.cleanup(path)
+        assert not path.exists()
+
+    def test_mirror_reused_and_updated(self, root):
+        origin = make_origin(root, "origin")
+        manager = RepoManager(root / "cache")
+        first = manager.clone(origin.working_dir, "token")
+        manager.cleanup(first)
+
+        commit(origin, "README.md", "v2\n")
+        second = manager.clone(origin.working_dir, "token")
+        try:
+            assert (second / "README.md").read_text() == "v2\n"
+            assert len(list((root / "cache").glob("*.git"))) == 1
+            # Рабочая копия берёт объекты из зеркала, а не копирует их
+            assert (second / ".git" / "objects" / "info" / "alternates").exists()
+        finally:
+            manager.cleanup(second)
+
+    def test_eviction_skips_mirrors_in_use(self, root):
+        first_origin = make_origin(root, "first")
+        second_origin = make_origin(root, "second")
+        manager = RepoManager(root / "cache", max_cache_size=0)
+
+        in_use = manager.clone(first_origin.working_dir, "token")
+        other = manager.clone(second_origin.working_dir, "token")
+        try:
+            # Оба зеркала заняты задачами — вытеснять нечего
+            assert len(list((root / "cache").glob("*.git"))) == 2
+        finally:
+            manager.cleanup(other)
+
+        manager.cleanup(in_use)
+        third = manager.clone(first_origin.working_dir, "token")
+        try:
+            # Освобождённое зеркало second вытеснено, занятое first осталось
+            mirrors = list((root / "cache").glob("*.git"))
+            assert mirrors == [manager._mirror_path(first_origin.working_dir)]
+        finally:
+            manager.cleanup(third)
+
+    def test_cleanup_all_skips_workdirs_of_running_threads(self, root):
+        origin = make_origin(root, "origin")
+        manager = RepoManager()
+        cloned = threading.Event()
+        release = threading.Event()
+        paths = []
+
+        def job():
+            # Задача не удаляет копию сама — как прерванная остановкой
+            paths.append(manager.clone(origin.working_dir, "token"))
+            cloned.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=job)
+        worker.start()
+        try:
+            assert cloned.wait(5)
+            assert manager.cleanup_all() == 0
+            assert paths[0].exists()
+        finally:
+            release.set()
+            worker.join()
+        assert manager.cleanup_all() == 1
+        assert not paths[0].exists()
+
+    def test_sweep_stale_removes_workdirs_of_dead_processes(self, root, monkeypatch):
+        monkeypatch.setattr(tempfile, "tempdir", str(root / "tmp"))
+        (root / "tmp").mkdir()
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        stale = [root / "tmp" / f"agent-{dead.pid}-x", root / "tmp" / f"candidate-{dead.pid}-y"]
+        kept = [
+            root / "tmp" / f"agent-{os.getpid()}-z",
+            root / "tmp" / f"candidate-{os.getppid()}-w",
+            root / "tmp" / "agent-manual",
+        ]
+        for path in stale + kept:
+            (path / "repo").mkdir(parents=True)
+
+        assert RepoManager().sweep_stale() == 2
+        assert not any(path.exists() for path in stale)
+        assert all(path.exists() for path in kept)
+
+    def test_workdir_named_by_pid(self, root, monkeypatch):
+        origin = make_origin(root, "origin")
+        monkeypatch.setattr(tempfile, "tempdir", str(root))
+        manager = RepoManager()
+        path = manager.clone(origin.working_dir, "token")
+        try:
+            assert path.name.startswith(f"agent-{os.getpid()}-")
+            assert manager.sweep_stale() == 0
+            assert path.exists()
+        finally:
+            manager.cleanup(path)
+
+    def test_gc_only_when_mirror_idle(self, root, monkeypatch):
+        origin = make_origin(root, "origin")
+        manager = RepoManager(root / "cache")
+        gc_calls = []
+        execute = Git.execute
+
+        def spy(self, command, *args, **kwargs):
+            if isinstance(command, list) and "gc" in command:
+                gc_calls.append(command)
+            return execute(self, command, *args, **kwargs)
+
+        monkeypatch.setattr(Git, "execute", spy)
+        manager.cleanup(manager.clone(origin.working_dir, "token"))
+        commit(origin, "README.md", "v2\n")
+
+        first = manager.clone(origin.working_dir, "token")
+        assert len(gc_calls) == 1
+        # Зеркалом пользуется first — упаковывать объекты нельзя
+        second = manager.clone(origin.working_dir, "token")
+        assert len(gc_calls) == 1
+        manager.cleanup(second)
+        manager.cleanup(first)
+
+    def test_mirror_size_recorded(self, root):
+        origin = make_origin(root, "origin")
+        manager = RepoManager(root / "cache")
+        path = manager.clone(origin.working_dir, "token")
+        try:
+            mirror = manager._mirror_path(origin.working_dir)
+            size = int(mirror.with_name(f"{mirror.name}.size").read_text())
+            assert size > 0
+        finally:
+            manager.cleanup(path)
@@ -0,0 +1,141 @@
+from coding_agent.agents.reviewer import (
+    REVIEWED_HEAD_PATTERN,
+    ReviewerAgent,
+    _previous_comments,
+    merge_reviews,
+)
+from coding_agent.config import Settings
+from coding_agent.github.client import IssueInfo, PRContext, ReviewInfo
+from coding_agent.llm.schemas import ReviewComment, ReviewResult
+
+
+class TestMergeReviews:
+    def test_approved_only_if_all_parts_approved(self):
+        merged = merge_reviews([
+            ReviewResult(approved=True, summary="ок"),
+            ReviewResult(approved=False, summary="баг"),
+        ])
+        assert not merged.approved
+        assert "ок" in merged.summary and "баг" in merged.summary
+
+    def test_deduplicates_comments(self):
+        comment = ReviewComment(file="a.py", line=3, problem="Нет  проверки", suggestion="добавь")
+        same = ReviewComment(file="a.py", line=3, problem="нет проверки", suggestion="иначе")
+        other = ReviewComment(file="b.py", line=3, problem="нет проверки", suggestion="добавь")
+        merged = merge_reviews([
+            ReviewResult(approved=False, summary="1", comments=[comment]),
+            ReviewResult(approved=False, summary="2", comments=[same, other]),
+        ])
+        assert merged.comments == [comment, other]
+
+
+class TestPreviousReview:
+    BODY = (
+        "## Результат проверки\n\nЕсть проблемы\n\n"
+        "## Замечания\n\n- **a.py:3**: баг\n  - исправь\n\n"
+        "<!-- REVIEWER: head=0123456789abcdef0123456789abcdef01234567 -->\n"
+    )
+
+    def test_head_marker(self):
+        match = REVIEWED_HEAD_PATTERN.search(self.BODY)
+        assert match.group(1) == "0123456789abcdef0123456789abcdef01234567"
+
+    def test_previous_comments_without_marker(self):
+        comments = _previous_comments(self.BODY)
+        assert comments.startswith("- **a.py:3**: баг")
+        assert "REVIEWER" not in comments
+
+    def test_no_previous_comments(self):
+        assert _previous_comments("## Результат проверки\n\nВсё хорошо\n") == "нет"
+
+
+class FakeGitHub:
+    def __init__(self, login: str | None = None, pr: PRContext | None = None):
+        self.login = login
+        self.pr = pr
+        self.issues_fetched = []
+
+    def get_login(self) -> str | None:
+        return self.login
+
+    def load_pr_context(self, pr_number: int) -> PRContext:
+        return self.pr
+
+    def get_issue(self, number: int) -> IssueInfo:
+        self.issues_fetched.append(number)
+        return IssueInfo(number, f"Issue {number}", "")
+
+    def get_pr_diff(self, pr_number: int) -> str:
+        return "diff"
+
+    def create_review(self, pr_number: int, body: str, approve: bool):
+        pass
+
+
+class FakeLLM:
+    def __init__(self):
+        self.issue_titles = []
+
+    def count_tokens(self, text: str) -> int:
+        return len(text)
+
+    def generate_review(self, diff: str, issue_title: str, issue_body: str) -> ReviewResult:
+        self.issue_titles.append(issue_title)
+        return ReviewResult(approved=True, summary="ок")
+
+
+class TestLinkedIssue:
+    def review(self, pr: PRContext) -> tuple[FakeGitHub, FakeLLM]:
+        reviewer = ReviewerAgent.__new__(ReviewerAgent)
+        reviewer.settings = Settings(github_bot_login="agent")
+        reviewer.github = FakeGitHub(pr=pr)
+        reviewer.llm = FakeLLM()
+        reviewer.review(pr.number)
+        return reviewer.github, reviewer.llm
+
+    def test_uses_preloaded_issue_with_same_number(self):
+        pr = PRContext(1, "PR", "Closes #3", "abc", "b", issue=IssueInfo(3, "Логин", ""))
+        github, llm = self.review(pr)
+        assert github.issues_fetched == []
+        assert llm.issue_titles == ["Логин"]
+
+    def test_fetches_issue_from_body_if_preloaded_differs(self):
+        pr = PRContext(1, "PR", "Closes #4", "abc", "b", issue=IssueInfo(3, "Логин", ""))
+        github, llm = self.review(pr)
+        assert github.issues_fetched == [4]
+        assert llm.issue_titles == ["Issue 4"]
+
+
+class TestLastReview:
+    OWN = "<!-- REVIEWER: head=1111111 -->"
+    FOREIGN = "<!-- REVIEWER: head=2222222 -->"
+
+    def reviewer(self, bot_login: str | None = None, login: str | None = None) -> ReviewerAgent:
+        reviewer = ReviewerAgent.__new__(ReviewerAgent)
+        reviewer.settings = Settings(github_bot_login=bot_login)
+        reviewer.github = FakeGitHub(login)
+        return reviewer
+
+    def pr(self, *reviews: ReviewInfo) -> PRContext:
+        return PRContext(1, "PR", "", "abc", "branch", reviews=list(reviews))
+
+    def test_ignores_marker_from_other_authors(self):
+        pr = self.pr(
+            ReviewInfo("CHANGES_REQUESTED", self.OWN, author="agent"),
+            ReviewInfo("COMMENTED", self.FOREIGN, author="someone"),
+        )
+        assert self.reviewer(login="agent")._last_review(pr) == ("1111111", self.OWN)
+
+    def test_app_login_with_and_without_bot_suffix(self):
+        # REST отдаёт "slug[bot]", GraphQL — "slug"
+        pr = self.pr(ReviewInfo("COMMENTED", self.OWN, author="coding-agent"))
+        reviewer = self.reviewer(bot_login="coding-agent[bot]")
+        assert reviewer._last_review(pr) == ("1111111", self.OWN)
+
+    def test_unknown_login_means_full_review(self):
+        pr = self.pr(ReviewInfo("COMMENTED", self.OWN, author="agent"))
+        assert self.reviewer()._last_review(pr) is None
+
+    def test_review_without_author_ignored(self):
+        pr = self.pr(ReviewInfo("COMMENTED", self.OWN))
+        assert self.reviewer(login="agent")._last_review(pr) is None
@@ -44,3 +44,16 @@ class TestReviewResult:
         )
         assert len(review.comments) == 1
         assert review.comments[0].line == 10
+
+
+class TestEditFileChange:
+    def test_edits_default_empty(self):
+        fc = FileChange(path="a.py", action="modify", content="x=1")
+        assert fc.edits == []
+
+    def test_edit_action(self):
+        fc = FileChange.model_validate(
+            {"path": "a.py", "action": "edit", "edits": [{"search": "x=1", "replace": "x=2"}]}
+        )
+        assert fc.edits[0].replace == "x=2"
+        assert fc.content == ""
@@ -0,0 +1,73 @@
+from pathlib import Path
+
+from coding_agent.context.index import FileIndex
+from coding_agent.context.search import (
+    MAX_INDEX_FILE_SIZE,
+    SearchIndex,
+    split_identifier,
+    tokenize,
+)
+
+
+class TestTokenize:
+    def test_split_camel_case(self):
+        assert split_identifier("UserService") == ["user", "service"]
+        assert split_identifier("HTTPServer") == ["http", "server"]
+
+    def test_split_snake_case(self):
+        assert split_identifier("get_user_by_id") == ["get", "user", "by", "id"]
+
+    def test_keeps_whole_identifier(self):
+        tokens = tokenize("class UserService:")
+        assert "userservice" in tokens
+        assert "user" in tokens
+
+    def test_non_ascii(self):
+        assert tokenize("Добавить кеш") == ["добавить", "кеш"]
+
+
+class TestSearchIndex:
+    def make_index(self):
+        index = SearchIndex()
+        index.add("src/api.py", "from services import UserService\nUserService().get()")
+        index.add("src/services/users.ts", "export class UserService { find() {} }")
+        index.add("src/utils.py", "def helper(): return 1")
+        return index
+
+    def test_finds_by_content(self):
+        results = self.make_index().search("Ошибка в UserService при поиске")
+        paths = [path for path, _ in results]
+        assert set(paths) == {"src/api.py", "src/services/users.ts"}
+
+    def test_ranks_path_matches_higher(self):
+        results = self.make_index().search("helper utils")
+        assert results[0][0] == "src/utils.py"
+
+    def test_no_matches(self):
+        assert self.make_index().search("nothing relevant") == []
+
+    def test_remove(self):
+        index = self.make_index()
+        index.remove("src/utils.py")
+        assert index.search("helper") == []
+        assert "helper" not in index.postings
+        assert len(index) == 2
+
+    def test_large_file_indexed_by_path_only(self, tmp_path: Path, monkeypatch):
+        (tmp_path / "bundle.js").write_text("UserService " * (MAX_INDEX_FILE_SIZE // 12 + 1))
+        (tmp_path / "users.py").write_text("class UserService: pass\n")
+        reads = []
+
+        def read_text(path, *args, **kwargs):
+            reads.append(path.name)
+            return original(path, *args, **kwargs)
+
+        original = Path.read_text
+        monkeypatch.setattr(Path, "read_text", read_text)
+        files = FileIndex(tmp_path, ["bundle.js", "users.py"])
+        index = SearchIndex()
+        for path in files.paths:
+            index.add_file(files, path)
+        assert reads == ["users.py"]
+        assert [doc for doc, _ in index.search("UserService")] == ["users.py"]
+        assert "bundle.js" in index.doc_terms
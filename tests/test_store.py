@@ -0,0 +1,66 @@
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from coding_agent.context.store import IndexStore
+
+
+def git(root, *args):
+    result = subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=root, check=True, capture_output=True, text=True,
+    )
+    return result.stdout.strip()
+
+
+@pytest.fixture
+def repo():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "repo"
+        root.mkdir()
+        (root / "main.py").write_text("def hello(): pass")
+        (root / "utils.py").write_text("def helper(): pass")
+        git(root, "init", "-q")
+        git(root, "add", "-A")
+        git(root, "commit", "-q", "-m", "init")
+        yield root
+
+
+@pytest.fixture
+def cache_dir():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+class TestIndexStore:
+    def test_persists_by_commit(self, repo, cache_dir):
+        IndexStore(cache_dir).load_or_build("owner/repo", repo)
+        head = git(repo, "rev-parse", "HEAD")
+        assert (cache_dir / "owner__repo" / f"{head}.json.gz").exists()
+
+        index, search = IndexStore(cache_dir).load_or_build("owner/repo", repo)
+        assert "main.py" in index
+        assert search.search("hello")[0][0] == "main.py"
+
+    def test_incremental_update(self, repo, cache_dir):
+        store = IndexStore(cache_dir)
+        store.load_or_build("owner/repo", repo)
+
+        (repo / "utils.py").unlink()
+        (repo / "service.py").write_text("class UserService: pass")
+        git(repo, "add", "-A")
+        git(repo, "commit", "-q", "-m", "change")
+
+        index, search = store.load_or_build("owner/repo", repo)
+        assert "utils.py" not in index
+        assert search.search("helper") == []
+        assert search.search("UserService")[0][0] == "service.py"
+        assert search.search("hello")[0][0] == "main.py"
+
+    def test_dirty_tree_not_cached(self, repo, cache_dir):
+        (repo / "new.py").write_text("x = 1")
+        index, _ = IndexStore(cache_dir).load_or_build("owner/repo", repo)
+        assert "new.py" in index
+        assert not (cache_dir / "owner__repo").exists()
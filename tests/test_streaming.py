@@ -0,0 +1,143 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import litellm
+import pytest
+from pydantic import ValidationError
+
+from coding_agent.agents.code_agent import CodeAgent
+from coding_agent.config import Settings
+from coding_agent.llm import client as llm_client
+from coding_agent.llm import limits
+from coding_agent.llm.schemas import FileChange
+from coding_agent.llm.streaming import FilesStreamParser
+
+RESPONSE = json.dumps(
+    {
+        "analysis": "ok",
+        "files": [
+            {"path": "README.md", "action": "create", "content": "новый\n"},
+            {"path": "pkg/sub/a.py", "action": "create", "content": "x = 1\n"},
+            {"path": "pkg/b.py", "action": "create", "content": "y = 2\n"},
+        ],
+        "commit_message": "feat: x",
+    },
+    ensure_ascii=False,
+)
+# Обрыв посреди третьего файла: первые два уже отданы в on_file
+TRUNCATED = RESPONSE[: RESPONSE.index('"y = 2')]
+
+
+def feed_in_chunks(parser: FilesStreamParser, text: str, size: int) -> list[dict]:
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+class TestFilesStreamParser:
+    def test_yields_files_as_they_complete(self):
+        parser = FilesStreamParser()
+        head = '{"analysis": "ok", "files": [{"path": "a.py", "action": "create", '
+        assert parser.feed(head) == []
+        items = parser.feed('"content": "x"}, {"path": "b.py"')
+        assert items == [{"path": "a.py", "action": "create", "content": "x"}]
+
+    def test_small_chunks(self):
+        data = {
+            "analysis": "ключ \"files\": [{ в строке }]",
+            "files": [
+                {"path": "a.py", "action": "modify", "content": 'print("{}[]")\n'},
+                {"path": "b.py", "action": "delete", "content": "\\\"}"},
+            ],
+            "commit_message": "feat: x",
+        }
+        text = json.dumps(data, ensure_ascii=False)
+        items = feed_in_chunks(FilesStreamParser(), text, 3)
+        assert items == data["files"]
+
+    def test_ignores_nested_files_keys(self):
+        text = '{"meta": {"files": [{"path": "x"}]}, "files": [{"path": "y"}]}'
+        assert feed_in_chunks(FilesStreamParser(), text, 5) == [{"path": "y"}]
+
+    def test_truncated_stream_keeps_only_complete_items(self):
+        parser = FilesStreamParser()
+        items = parser.feed('{"files": [{"path": "a.py"}, {"path": "b.')
+        assert items == [{"path": "a.py"}]
+
+
+def chunk(text: str) -> SimpleNamespace:
+    delta = SimpleNamespace(content=text)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+@pytest.fixture
+def stream_llm(monkeypatch):
+    """LLMClient, которому litellm отдаёт `text` кусками по 7 символов."""
+    monkeypatch.setattr(limits, "_limiter", None)
+    calls = []
+
+    def use(text: str) -> llm_client.LLMClient:
+        def completion(**kwargs):
+            calls.append(kwargs)
+            return iter([chunk(text[i:i + 7]) for i in range(0, len(text), 7)])
+
+        monkeypatch.setattr(litellm, "completion", completion)
+        return llm_client.LLMClient(Settings(llm_model="openai/gpt-4o"))
+
+    use.calls = calls
+    return use
+
+
+class TestStreamJson:
+    def test_files_emitted_in_order(self, stream_llm):
+        client = stream_llm(RESPONSE)
+        files: list[FileChange] = []
+        progress: list[int] = []
+        result = client.stream_code("t", "b", "ctx", files.append, progress.append)
+        assert [f.path for f in files] == ["README.md", "pkg/sub/a.py", "pkg/b.py"]
+        assert result.commit_message == "feat: x"
+        assert progress[-1] == len(RESPONSE)
+        assert stream_llm.calls[0]["stream"] is True
+
+    def test_truncated_stream_raises_after_complete_files(self, stream_llm):
+        client = stream_llm(TRUNCATED)
+        files: list[FileChange] = []
+        with pytest.raises(ValidationError):
+            client.stream_code("t", "b", "ctx", files.append)
+        assert [f.path for f in files] == ["README.md", "pkg/sub/a.py"]
+        # Файлы уже отданы — повторять запрос нельзя
+        assert len(stream_llm.calls) == 1
+
+
+class TestStreamingRollback:
+    def test_truncated_stream_leaves_tree_unchanged(self, stream_llm, tmp_path: Path):
+        (tmp_path / "README.md").write_text("старый\n")
+        client = stream_llm(TRUNCATED)
+        agent = CodeAgent.__new__(CodeAgent)
+        agent.settings = Settings(llm_stream=True)
+        agent.repo_path = tmp_path
+        agent.llm = client
+
+        def generate():
+            raise AssertionError("без потока")
+
+        def stream(on_file, on_progress):
+            return client.stream_code("t", "b", "ctx", on_file, on_progress)
+
+        with pytest.raises(ValidationError):
+            agent._generate_and_apply(generate, stream)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["README.md"]
+        assert (tmp_path / "README.md").read_text() == "старый\n"
+
+    def test_rollback_keeps_directories_with_foreign_files(self, tmp_path: Path):
+        agent = CodeAgent.__new__(CodeAgent)
+        agent.repo_path = tmp_path
+        journal: dict[Path, bytes | None] = {}
+        agent._apply_file_change(
+            FileChange(path="pkg/a.py", action="create", content="x\n"), journal
+        )
+        (tmp_path / "pkg" / "local.txt").write_text("не наш\n")
+        agent._rollback(journal)
+        assert sorted(p.name for p in (tmp_path / "pkg").iterdir()) == ["local.txt"]
@@ -0,0 +1,51 @@
+import json
+
+import httpx
+import pytest
+from github import Auth, Github
+
+from coding_agent.github import transport
+
+# Не UTF-8: при декодировании в текст байты были бы испорчены
+BINARY = bytes(range(256)) * 10
+
+
+@pytest.fixture
+def github_api(monkeypatch):
+    """PyGithub через общий клиент, а вместо GitHub — MockTransport."""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path == "/repos/o/r":
+            return httpx.Response(200, json={"id": 1, "full_name": "o/r", "name": "r"})
+        if request.url.path == "/repos/o/r/issues":
+            return httpx.Response(201, json={"number": 5, "title": "bug"})
+        if request.url.path == "/repos/o/r/tarball/main":
+            return httpx.Response(200, content=BINARY)
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    monkeypatch.setattr(transport, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    transport.install()
+    yield requests
+
+
+class TestPooledConnection:
+    def test_pygithub_call_goes_through_shared_client(self, github_api):
+        repo = Github(auth=Auth.Token("secret")).get_repo("o/r")
+        assert repo.full_name == "o/r"
+        assert [str(r.url) for r in github_api] == ["https://api.github.com/repos/o/r"]
+        assert github_api[0].headers["authorization"] == "token secret"
+
+    def test_request_body_passed(self, github_api):
+        repo = Github(auth=Auth.Token("secret")).get_repo("o/r")
+        assert repo.create_issue(title="bug").number == 5
+        request = github_api[-1]
+        assert request.method == "POST"
+        assert json.loads(request.content) == {"title": "bug"}
+
+    def test_iter_content_returns_raw_bytes(self, github_api):
+        connection = transport.PooledConnection("api.github.com")
+        connection.request("GET", "/repos/o/r/tarball/main", None, {}, stream=True)
+        response = connection.getresponse()
+        assert b"".join(response.iter_content(chunk_size=100)) == BINARY